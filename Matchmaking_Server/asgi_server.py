@@ -0,0 +1,215 @@
+"""ASGI entry point for the matchmaking server.
+
+Run it with an ASGI server, for instance (from Matchmaking_Server/):
+
+    uvicorn asgi_server:app --host 0.0.0.0 --port 5000
+
+The long-lived routes, /events/poll and /events, are served natively on the
+event loop: an idle client is a coroutine waiting on its subscriber, not a
+thread, so one process can hold tens of thousands of them. Every other route
+is the Flask view from server.py run on a small thread pool, so the API, its
+validation and the storage layer (memory + journal or SQLite, chosen by the
+same environment variables) are exactly those of the Flask server.
+"""
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, unquote
+import asyncio
+import io
+import json
+import os
+import sys
+
+from server import app as flask_app, events, start_relay, touch
+
+# Flask views are short and CPU bound: a few threads are enough, more only add GIL contention
+WSGI_THREADS = int(os.environ.get("BATTLESHIP_WSGI_THREADS", "8"))
+SSE_KEEPALIVE = 15
+POLL_TIMEOUT_MAX = 60
+
+executor = ThreadPoolExecutor(max_workers=WSGI_THREADS, thread_name_prefix="wsgi")
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    if path == "/events/poll" and scope["method"] == "GET":
+        await poll_events(scope, send)
+    elif path == "/events" and scope["method"] == "GET":
+        await event_stream(scope, receive, send)
+    else:
+        await call_flask(scope, receive, send)
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_relay()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            executor.shutdown(wait=False)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+# === NATIVE ROUTES ===
+
+async def poll_events(scope, send):
+    """Same contract as the Flask /events/poll route."""
+    args = query_args(scope)
+    username = args.get("username")
+    since = to_number(args.get("since"), int)
+    timeout = min(to_number(args.get("timeout"), float, 25), POLL_TIMEOUT_MAX)
+    if username:
+        await asyncio.get_running_loop().run_in_executor(executor, touch, username)
+    result = await events.poll_async(since, username, timeout)
+    await send_json(send, result)
+
+
+async def event_stream(scope, receive, send):
+    """Same contract as the Flask /events route (SSE, Last-Event-ID resume, keepalives)."""
+    args = query_args(scope)
+    username = args.get("username")
+    since = header(scope, b"last-event-id") or args.get("since")
+    subscriber = events.subscribe(username, int(since) if since and since.isdigit() else None,
+                                  loop=asyncio.get_running_loop())
+    disconnected = asyncio.ensure_future(wait_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": b"retry: 3000\n\n", "more_body": True})
+        while not disconnected.done():
+            if username:
+                await asyncio.get_running_loop().run_in_executor(executor, touch, username)
+            batch = await subscriber.get_async(SSE_KEEPALIVE)
+            if disconnected.done():
+                break
+            if not batch:
+                chunk = ": keepalive\n\n"
+            else:
+                chunk = "".join(f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n" for event in batch)
+            await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+    finally:
+        events.unsubscribe(subscriber)
+        disconnected.cancel()
+
+
+async def wait_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+# === FLASK BRIDGE ===
+
+async def call_flask(scope, receive, send):
+    body = bytearray()
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+
+    environ = wsgi_environ(scope, bytes(body))
+    status, headers, chunks = await asyncio.get_running_loop().run_in_executor(executor, run_wsgi, environ)
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": b"".join(chunks)})
+
+
+def run_wsgi(environ):
+    """Run the Flask app on one request in a pool thread and collect the whole response."""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response["status"] = int(status.split(" ", 1)[0])
+        response["headers"] = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+    result = flask_app.wsgi_app(environ, start_response)
+    try:
+        chunks = list(result)
+    finally:
+        if hasattr(result, "close"):
+            result.close()
+    return response["status"], response["headers"], chunks
+
+
+def wsgi_environ(scope, body):
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", ""),
+        "PATH_INFO": unquote(scope["path"], encoding="latin-1") if "%" in scope["path"] else scope["path"],
+        "QUERY_STRING": scope["query_string"].decode("latin-1"),
+        "SERVER_NAME": server[0],
+        "SERVER_PORT": str(server[1]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "REMOTE_ADDR": client[0],
+        "REMOTE_PORT": str(client[1]),
+        "CONTENT_LENGTH": str(len(body)),
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope["headers"]:
+        key = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if key in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            if key == "CONTENT_TYPE":
+                environ[key] = value
+            continue
+        key = "HTTP_" + key
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+# === HELPERS ===
+
+def query_args(scope):
+    return {k: v[0] for k, v in parse_qs(scope["query_string"].decode("latin-1")).items()}
+
+
+def header(scope, name):
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+def to_number(value, kind, default=None):
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        return default
+
+
+async def send_json(send, payload, status=200):
+    body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+if __name__ == '__main__':
+    import uvicorn  # Only needed to run this file directly
+    uvicorn.run(app, host='0.0.0.0', port=5000, log_level="warning", backlog=4096)
@@ -0,0 +1,141 @@
+"""Flask (threaded dev server) vs ASGI (uvicorn) with many idle long-poll clients.
+
+For each server: open ``--idle`` long-polls on /events/poll, then run
+``--clients`` concurrent active clients posting results and reading the leaderboard
+while the long-polls stay open, then publish one event and time how long it
+takes to reach every long-poll. Server threads and memory, read from /proc, are
+sampled while the long-polls are open.
+
+Needs uvicorn. Run from Matchmaking_Server/:
+    python benchmarks/bench_asgi.py [--idle 2000] [--clients 50] [--requests 40]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+SERVERS = {
+    "flask": [sys.executable, "-c", "import sys, server; server.app.run(port=int(sys.argv[1]), threaded=True)"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi_server:app", "--log-level", "warning", "--backlog", "8192", "--port"],
+}
+
+
+def start_server(kind, port):
+    env = dict(os.environ, BATTLESHIP_DATA_DIR="", BATTLESHIP_RATE_LIMITS="off")  # Every client shares one address
+    proc = subprocess.Popen(SERVERS[kind] + [str(port)], cwd=HERE, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{kind} server did not start")
+
+
+def proc_status(pid):
+    """(threads, RSS in MB) of a running process."""
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            fields[key] = value.split()
+    return int(fields["Threads"][0]), int(fields["VmRSS"][0]) / 1024
+
+
+async def http(port, method, path, body=None):
+    """One HTTP/1.1 request on its own connection; returns (status, parsed JSON body)."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    head = f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nConnection: close\r\nContent-Length: {len(data)}\r\n"
+    if body is not None:
+        head += "Content-Type: application/json\r\n"
+    writer.write(head.encode() + b"\r\n" + data)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    header, _, payload = response.partition(b"\r\n\r\n")
+    return int(header.split(b" ", 2)[1]), json.loads(payload) if payload else None
+
+
+async def run(port, pid, idle, clients, requests):
+    # 1. Idle long-polls, opened in batches so the listen backlog is not overrun
+    polls = []
+    start = time.perf_counter()
+    for i in range(0, idle, 500):
+        polls += [asyncio.ensure_future(http(port, "GET", "/events/poll?since=0&timeout=60"))
+                  for _ in range(min(500, idle - i))]
+        await asyncio.sleep(0.2)
+    await asyncio.sleep(1)
+    opened_s = time.perf_counter() - start
+    failed_early = sum(p.done() for p in polls)
+    threads, rss = proc_status(pid)
+
+    # 2. Active clients while the long-polls are held
+    latencies = []
+
+    async def active(c):
+        for r in range(requests):
+            t = time.perf_counter()
+            if r % 2:
+                status, _ = await http(port, "GET", "/leaderboard?top=10")
+            else:
+                status, _ = await http(port, "POST", "/match_result", {"winner": f"C{c}", "loser": "X"})
+            assert status == 200
+            latencies.append(time.perf_counter() - t)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(active(c) for c in range(clients)))
+    active_s = time.perf_counter() - start
+
+    # 3. One event fanned out to every long-poll
+    start = time.perf_counter()
+    await http(port, "POST", "/auto_join", {"username": "Broadcast", "port": 1})
+    done = await asyncio.gather(*polls, return_exceptions=True)
+    fanout_s = time.perf_counter() - start
+    delivered = sum(1 for d in done if not isinstance(d, Exception) and d[0] == 200 and d[1]["events"])
+
+    latencies.sort()
+    return {
+        "open_s": opened_s,
+        "failed_early": failed_early,
+        "req_per_s": clients * requests / active_s,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "fanout_s": fanout_s,
+        "delivered": delivered,
+        "threads": threads,
+        "rss_mb": rss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flask vs ASGI benchmark")
+    parser.add_argument("--idle", type=int, default=2000, help="idle long-poll connections")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent active clients")
+    parser.add_argument("--requests", type=int, default=40, help="requests per active client")
+    parser.add_argument("--servers", default="flask,asgi")
+    args = parser.parse_args()
+
+    for port, kind in enumerate(args.servers.split(","), start=5101):
+        proc = start_server(kind, port)
+        try:
+            result = asyncio.run(run(port, proc.pid, args.idle, args.clients, args.requests))
+        finally:
+            proc.kill()
+            proc.wait()
+        print(f"{kind:6} {args.idle} idle polls: {result['delivered']} delivered in {result['fanout_s']:.2f}s, "
+              f"{result['failed_early']} failed early | active {result['req_per_s']:.0f} req/s, "
+              f"p50 {result['p50_ms']:.1f}ms p99 {result['p99_ms']:.1f}ms | "
+              f"while polls held: {result['threads']} threads, RSS {result['rss_mb']:.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Time and memory of bracket generation at increasing player counts.
+
+Run from Matchmaking_Server/:  python benchmarks/bench_bracket.py [--sizes 8 1024 ...]
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bracket_generator import Bracket
+
+DEFAULT_SIZES = [8, 1024, 65536, 1048576]
+
+
+def bench(size, seed=1):
+    players = [f"player{i}" for i in range(size)]
+
+    start = time.perf_counter()
+    bracket = Bracket.build(players, seed)
+    build_s = time.perf_counter() - start
+
+    tracemalloc.start()
+    Bracket.build(players, seed)
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Play the whole bracket: first slot always wins
+    start = time.perf_counter()
+    for index in range(len(bracket)):
+        p1, p2 = bracket.slots[2 * index], bracket.slots[2 * index + 1]
+        if not bracket.results[index]:
+            bracket.record_result(bracket.names[p1], bracket.names[p2])
+    play_s = time.perf_counter() - start
+
+    return {
+        "players": size,
+        "matches": len(bracket),
+        "build_ms": build_s * 1000,
+        "build_peak_mb": build_peak / 2 ** 20,
+        "result_us": play_s / max(len(bracket), 1) * 1e6,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bracket generation benchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    args = parser.parse_args()
+
+    print(f"{'players':>9} {'matches':>9} {'build ms':>10} {'peak MB':>9} {'us/result':>10}")
+    for size in args.sizes:
+        r = bench(size)
+        print(f"{r['players']:>9} {r['matches']:>9} {r['build_ms']:>10.1f} {r['build_peak_mb']:>9.2f} {r['result_us']:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""Mutation throughput with journaling on and off, and recovery time of a large journal.
+
+Run from Matchmaking_Server/:  python benchmarks/bench_journal.py [--ops 20000] [--events 1000000]
+"""
+import argparse
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["BATTLESHIP_DATA_DIR"] = ""
+os.environ["BATTLESHIP_RATE_LIMITS"] = "off"
+
+import server
+
+
+def fresh_server(data_dir=None):
+    srv = importlib.reload(server)
+    if data_dir:
+        srv.init_persistence(data_dir)
+    return srv
+
+
+def mutation_throughput(ops, data_dir=None):
+    """Requests per second for a join / create / join / result cycle through the test client."""
+    srv = fresh_server(data_dir)
+    client = srv.app.test_client()
+    start = time.perf_counter()
+    for i in range(ops // 4):
+        a, b = f"A{i}", f"B{i}"
+        client.post("/auto_join", json={"username": a, "port": 9000})
+        client.post("/create_match", json={"player_id": a, "code": f"C{i}"})
+        client.post("/join_match", json={"player_id": b, "code": f"C{i}"})
+        client.post("/match_result", json={"winner": a, "loser": b})
+    elapsed = time.perf_counter() - start
+    if srv.journal:
+        srv.journal.close()
+    return ops / elapsed
+
+
+def write_journal(data_dir, events, players=10000):
+    """A synthetic journal: ``players`` joins, then add_match / result pairs."""
+    with open(os.path.join(data_dir, "journal.log"), "w") as f:
+        n = 0
+
+        def write(op, **args):
+            nonlocal n
+            n += 1
+            f.write(json.dumps({"n": n, "op": op, "args": args}, separators=(",", ":")) + "\n")
+
+        for i in range(min(players, events)):
+            write("join", username=f"P{i}", ip="127.0.0.1", port=9000, joined="2025-01-01T10:00:00")
+        i = 0
+        while n < events:
+            p1, p2 = f"P{i % players}", f"P{(i + 1) % players}"
+            write("add_match", player1=p1, player2=p2, code=f"M{i}", timestamp="01/01/2025 10:00")
+            if n < events:
+                write("result", winner=p1, loser=p2, duration=None)
+            i += 1
+
+
+def recovery_time(events):
+    data_dir = tempfile.mkdtemp(prefix="bench_journal_")
+    try:
+        write_journal(data_dir, events)
+        size_mb = os.path.getsize(os.path.join(data_dir, "journal.log")) / 2 ** 20
+        srv = fresh_server()
+        start = time.perf_counter()
+        srv.init_persistence(data_dir)
+        replay_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        srv.journal.snapshot(srv.snapshot_state())
+        snapshot_s = time.perf_counter() - start
+
+        srv.journal.close()
+        srv = fresh_server()
+        start = time.perf_counter()
+        srv.init_persistence(data_dir)
+        from_snapshot_s = time.perf_counter() - start
+        srv.journal.close()
+        return size_mb, replay_s, snapshot_s, from_snapshot_s
+    finally:
+        shutil.rmtree(data_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Journal benchmark")
+    parser.add_argument("--ops", type=int, default=20000, help="mutating requests per throughput run")
+    parser.add_argument("--events", type=int, default=1000000, help="journal size for the recovery run")
+    args = parser.parse_args()
+
+    off = mutation_throughput(args.ops)
+    data_dir = tempfile.mkdtemp(prefix="bench_journal_")
+    try:
+        on = mutation_throughput(args.ops, data_dir)
+    finally:
+        shutil.rmtree(data_dir)
+    print(f"mutations/s  journal off: {off:,.0f}   journal on: {on:,.0f}   ({(1 - on / off) * 100:.1f}% slower)")
+
+    size_mb, replay_s, snapshot_s, from_snapshot_s = recovery_time(args.events)
+    print(f"recovery of {args.events:,} ops ({size_mb:.0f} MB journal): {replay_s:.2f}s")
+    print(f"snapshot write: {snapshot_s:.2f}s   recovery from that snapshot: {from_snapshot_s:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
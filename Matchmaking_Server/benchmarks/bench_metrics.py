@@ -0,0 +1,74 @@
+"""Per-request overhead of the /metrics request timing.
+
+Runs the same requests through the Flask test client with the timing
+wrapper and route labelling installed (as in production) and without them,
+alternating short rounds so drift affects both alike, and times
+RequestMetrics.observe() on its own and a /metrics scrape.
+
+Run from Matchmaking_Server/:  python benchmarks/bench_metrics.py [--requests 3000] [--rounds 10]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["BATTLESHIP_DATA_DIR"] = ""
+os.environ["BATTLESHIP_RATE_LIMITS"] = "off"
+
+import server
+from metrics import RequestMetrics
+
+
+def per_request(client, requests, routes):
+    start = time.perf_counter()
+    for i in range(requests):
+        method, path, body = routes[i % len(routes)]
+        client.open(path, method=method, json=body)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Request metrics overhead")
+    parser.add_argument("--requests", type=int, default=3000, help="requests per round")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    client = server.app.test_client()
+    for i in range(100):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    routes = [
+        ("GET", "/leaderboard?top=10", None),
+        ("GET", "/rank/P1", None),
+        ("POST", "/match_result", {"winner": "P1", "loser": "P2"}),
+    ]
+
+    hooks = server.app.after_request_funcs[None]
+    timed, bare = [], []
+    for _ in range(args.rounds):
+        server.app.wsgi_app = server.timed_wsgi_app
+        timed.append(per_request(client, args.requests, routes))
+        server.app.wsgi_app = server.untimed_wsgi_app
+        hooks.remove(server.label_route)
+        bare.append(per_request(client, args.requests, routes))
+        hooks.append(server.label_route)
+    server.app.wsgi_app = server.timed_wsgi_app
+    timed_s, bare_s = sorted(timed)[len(timed) // 2], sorted(bare)[len(bare) // 2]
+    print(f"{args.requests} requests x {args.rounds} rounds (leaderboard, rank, match_result), medians")
+    print(f"without timing {bare_s * 1e6:7.1f} us/request")
+    print(f"with timing    {timed_s * 1e6:7.1f} us/request  (+{(timed_s - bare_s) * 1e6:.1f} us, "
+          f"{(timed_s - bare_s) / bare_s * 100:+.1f}%)")
+
+    metrics = RequestMetrics()
+    start = time.perf_counter()
+    for i in range(200000):
+        metrics.observe("/rank/<username>", "GET", 200, (i % 100) / 1000)
+    print(f"observe()      {(time.perf_counter() - start) / 200000 * 1e9:7.0f} ns")
+
+    start = time.perf_counter()
+    size = len(client.get("/metrics").data)
+    print(f"/metrics scrape {(time.perf_counter() - start) * 1e3:6.2f} ms ({size / 1024:.1f} KiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Per-move latency: the legacy direct path against the move relay, by registered player count.
+
+- "direct" is what envoyer_coup did per move: GET /players over HTTP, find
+  the opponent, open a TCP connection to them, send the move, close.
+- "relay" sends the move as one frame on the persistent relay connection;
+  the time is until the opponent's connection has read it.
+
+The server runs in-process (werkzeug threaded server on loopback), so the
+numbers leave out the network but keep every per-move round trip.
+
+Run from Matchmaking_Server/:  python benchmarks/bench_relay.py [--players 10 1000 10000] [--moves 200]
+"""
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+import requests
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["BATTLESHIP_DATA_DIR"] = ""
+os.environ["BATTLESHIP_RATE_LIMITS"] = "off"
+
+import server
+from relay import recv_frame, send_frame
+
+
+def opponent_listener():
+    """A player's move socket as in start_socket_listener: one connection per move."""
+    listener = socket.create_server(("127.0.0.1", 0))
+
+    def loop():
+        while True:
+            conn, _ = listener.accept()
+            with conn:
+                conn.recv(1024)
+
+    threading.Thread(target=loop, daemon=True).start()
+    return listener.getsockname()[1]
+
+
+def direct_move(session, url, opponent):
+    players = session.get(f"{url}/players").json()
+    target = next(p for p in players if p["username"] == opponent)
+    with socket.create_connection(("127.0.0.1", target["port"])) as sock:
+        sock.sendall(json.dumps({"move": [1, 2]}).encode())
+
+
+def relay_pair(code):
+    socks = []
+    for name in ("Alice", "Bob"):
+        sock = socket.create_connection(("127.0.0.1", server.move_relay.port))
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        send_frame(sock, json.dumps({"username": name, "code": code}).encode())
+        recv_frame(sock)
+        socks.append(sock)
+    return socks
+
+
+def timed(func, moves):
+    samples = []
+    for _ in range(moves):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Move latency: direct vs relay")
+    parser.add_argument("--players", type=int, nargs="+", default=[10, 1000, 10000])
+    parser.add_argument("--moves", type=int, default=200)
+    args = parser.parse_args()
+
+    httpd = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_port}"
+    server.move_relay.start("127.0.0.1")
+    session = requests.Session()
+    port = opponent_listener()
+    session.post(f"{url}/auto_join", json={"username": "Bob", "port": port})
+
+    client = server.app.test_client()
+    registered = 1
+    print(f"{args.moves} moves per row, median / p99 in ms")
+    print(f"{'players':>8} {'direct p50':>11} {'direct p99':>11} {'relay p50':>10} {'relay p99':>10}")
+    for count in sorted(args.players):
+        client.post("/auto_join/batch", json=[{"username": f"P{i}", "port": 10000 + i % 50000}
+                                              for i in range(registered, count)])
+        registered = max(registered, count)
+        code = f"B{count}"
+        client.post("/create_match", json={"player_id": "Alice", "code": code})
+        client.post("/join_match", json={"player_id": "Bob", "code": code})
+        alice, bob = relay_pair(code)
+
+        def relay_move():
+            send_frame(alice, b'{"move": [1, 2]}')
+            recv_frame(bob)
+
+        direct = timed(lambda: direct_move(session, url, "Bob"), args.moves)
+        relayed = timed(relay_move, args.moves)
+        print(f"{count:>8} {direct[0] * 1e3:>11.2f} {direct[1] * 1e3:>11.2f} "
+              f"{relayed[0] * 1e3:>10.3f} {relayed[1] * 1e3:>10.3f}")
+        client.post("/match_result", json={"winner": "Alice", "loser": "Bob"})
+        alice.close()
+        bob.close()
+
+    print(f"relay: {server.move_relay.stats()}")
+    httpd.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Requests per second of the index.html polling pattern with and without the response cache.
+
+One refresh is what index.html fetches on every server event: /players,
+/scores_history, /stats, /pending_matches and /tournament_status. Each mode
+runs the same refreshes through the Flask test client against a prepopulated
+server; "revalidate" sends back the ETags like a browser does, and "churn"
+records a result every ``--churn`` refreshes so entries keep being rebuilt.
+
+Run from Matchmaking_Server/:  python benchmarks/bench_response_cache.py [--players 200] [--matches 2000] [--refreshes 500]
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["BATTLESHIP_DATA_DIR"] = ""
+os.environ["BATTLESHIP_RATE_LIMITS"] = "off"
+
+import server
+
+POLLED = ["/players", "/scores_history", "/stats", "/pending_matches", "/tournament_status"]
+
+
+def populate(srv, players, matches):
+    names = [f"P{i}" for i in range(players)]
+    srv.commit("batch", ops=[["join", {"username": n, "ip": "127.0.0.1", "port": 9000, "joined": "2024-01-01T00:00:00"}]
+                             for n in names])
+    for i in range(matches):
+        a, b = names[i % players], names[(i * 7 + 1) % players]
+        srv.commit("add_match", player1=a, player2=b, code=f"C{i}", timestamp="01/01/2024 10:00")
+        srv.commit("result", winner=a, loser=b, duration=30.0)
+    for i in range(players // 4):
+        srv.commit("create_waiting", code=f"W{i}", creator=names[i], created_at="2024-01-01T00:00:00+00:00")
+
+
+def run(srv, refreshes, cache, revalidate=False, churn=0):
+    srv.response_cache.enabled = cache
+    client = srv.app.test_client()
+    etags = {}
+    sent = 0
+    start = time.perf_counter()
+    for r in range(refreshes):
+        if churn and r % churn == 0:
+            srv.commit("result", winner="P0", loser="P1", duration=30.0)
+        for path in POLLED:
+            headers = {"If-None-Match": etags[path]} if revalidate and path in etags else {}
+            response = client.get(path, headers=headers)
+            sent += len(response.data)
+            if "ETag" in response.headers:
+                etags[path] = response.headers["ETag"]
+    elapsed = time.perf_counter() - start
+    return refreshes * len(POLLED) / elapsed, sent / refreshes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Response cache benchmark")
+    parser.add_argument("--players", type=int, default=200)
+    parser.add_argument("--matches", type=int, default=2000)
+    parser.add_argument("--refreshes", type=int, default=500)
+    parser.add_argument("--churn", type=int, default=10, help="refreshes per recorded result in the churn mode")
+    args = parser.parse_args()
+
+    srv = importlib.reload(server)
+    populate(srv, args.players, args.matches)
+    print(f"{args.players} players, {args.matches} matches, {args.refreshes} refreshes of {len(POLLED)} routes")
+    modes = [
+        ("no cache", dict(cache=False)),
+        ("cache", dict(cache=True)),
+        ("cache + revalidate (304)", dict(cache=True, revalidate=True)),
+        (f"no cache, result every {args.churn}", dict(cache=False, churn=args.churn)),
+        (f"cache, result every {args.churn}", dict(cache=True, churn=args.churn)),
+    ]
+    baseline = None
+    for name, options in modes:
+        rate, size = run(srv, args.refreshes, **options)
+        baseline = baseline or rate
+        print(f"{name:28} {rate:8.0f} req/s  x{rate / baseline:4.1f}  {size / 1024:7.1f} KiB per refresh")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""Microbenchmarks of the server and bracket hot paths, with JSON output to track regressions.
+
+For each size the server is reloaded and prepopulated with that many
+players and matches (every tenth match left active), then each operation is
+timed in-process: the routes through the Flask test client (response cache
+off unless --cache), the bracket through generate_bracket() directly. An
+operation repeats until --min-time seconds have passed and at least --reps
+times; disconnect removes a different player each time.
+
+The JSON (stdout, or --output) holds the environment and one record per
+(size, operation) with mean/p50/p95/min in microseconds. --compare takes an
+earlier JSON and exits with status 1 if any operation got slower by more
+than --tolerance.
+
+Run from Matchmaking_Server/:
+    python benchmarks/bench_suite.py [--sizes 100 1000 10000 100000 1000000] [--output before.json]
+    python benchmarks/bench_suite.py --output after.json --compare before.json
+"""
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+os.environ["BATTLESHIP_DATA_DIR"] = ""
+os.environ["BATTLESHIP_RATE_LIMITS"] = "off"
+
+import server
+from bracket_generator import generate_bracket
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]  # --sizes 1000000 takes ~10 minutes, mostly populating
+BATCH = 10000  # Operations per commit("batch") while populating
+
+
+def fresh_server(store, data_dir):
+    """The server reloaded with empty state; ``data_dir`` must be new for each call with --store sqlite."""
+    os.environ["BATTLESHIP_STORE"] = store
+    os.environ["BATTLESHIP_DATA_DIR"] = data_dir if store != "memory" else ""
+    if store != "memory":
+        os.makedirs(data_dir)
+    try:
+        return importlib.reload(server)
+    finally:
+        os.environ.pop("BATTLESHIP_STORE")
+        os.environ["BATTLESHIP_DATA_DIR"] = ""
+
+
+def populate(srv, size):
+    """``size`` players and ``size`` matches between them, every tenth one still active."""
+    names = [f"P{i}" for i in range(size)]
+    ops = [["join", {"username": n, "ip": "127.0.0.1", "port": 9000, "joined": "2024-01-01T00:00:00"}] for n in names]
+    for i in range(size):
+        a, b = names[i], names[(i * 7 + 1) % size]
+        ops.append(["add_match", {"player1": a, "player2": b, "code": f"C{i}", "timestamp": "01/01/2024 10:00"}])
+        if i % 10:
+            ops.append(["result", {"winner": a, "loser": b, "duration": 30.0}])
+    for start in range(0, len(ops), BATCH):
+        srv.commit("batch", ops=ops[start:start + BATCH])
+    return names
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def measure(call, min_time, reps, limit=None):
+    """Microseconds per call of ``call(i)``, i = 0, 1, ..."""
+    times = []
+    deadline = time.perf_counter() + min_time
+    while (len(times) < reps or time.perf_counter() < deadline) and (limit is None or len(times) < limit):
+        start = time.perf_counter()
+        call(len(times))
+        times.append((time.perf_counter() - start) * 1e6)
+    times.sort()
+    return {"reps": len(times), "mean_us": sum(times) / len(times), "p50_us": percentile(times, 0.5),
+            "p95_us": percentile(times, 0.95), "min_us": times[0]}
+
+
+def checked(response):
+    assert response.status_code == 200, (response.status_code, response.data[:200])
+    return response
+
+
+def bench_size(size, args, data_dir):
+    srv = fresh_server(args.store, os.path.join(data_dir, str(size)))
+    srv.response_cache.enabled = args.cache
+    start = time.perf_counter()
+    names = populate(srv, size)
+    populate_s = time.perf_counter() - start
+    client = srv.app.test_client()
+    active = [f"C{i}" for i in range(0, size, 10)]
+
+    operations = [
+        ("match_result", lambda i: checked(client.post("/match_result", json={
+            "winner": names[i % size], "loser": names[(i + 1) % size], "duration": 30.0})), None),
+        ("match_status", lambda i: checked(client.get(f"/match_status?code={active[i % len(active)]}")), None),
+        ("get_stats", lambda i: checked(client.get("/stats")), None),
+        ("get_admin_data", lambda i: checked(client.get("/admin_data")), None),
+        # From the end, so the players the other operations use stay
+        ("disconnect", lambda i: checked(client.post("/disconnect", json={"username": names[-1 - i]})), size // 2),
+        ("generate_bracket", lambda i: generate_bracket(names, seed=i), None),
+    ]
+    results = []
+    for name, call, limit in operations:
+        record = {"size": size, "op": name, **measure(call, args.min_time, args.reps, limit)}
+        results.append(record)
+        print(f"{size:>9} {name:<17} {record['reps']:>6} {record['mean_us']:>12.1f} {record['p50_us']:>12.1f} "
+              f"{record['p95_us']:>12.1f}", file=sys.stderr)
+    if srv.db is not None:
+        srv.db.close()
+    return {"size": size, "populate_s": populate_s}, results
+
+
+def environment(args):
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                  cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        revision = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "store": args.store,
+        "response_cache": args.cache,
+        "min_time": args.min_time,
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change of each (size, op) against ``baseline``; returns the regressions."""
+    before = {(r["size"], r["op"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        old = before.get((r["size"], r["op"]))
+        if old is None:
+            continue
+        ratio = r["p50_us"] / old["p50_us"]
+        flag = " REGRESSION" if ratio > 1 + tolerance else ""
+        print(f"{r['size']:>9} {r['op']:<17} {old['p50_us']:>12.1f} -> {r['p50_us']:>12.1f} us  x{ratio:.2f}{flag}",
+              file=sys.stderr)
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Server and bracket microbenchmarks")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="players (and matches) per run")
+    parser.add_argument("--store", default="memory", choices=["memory", "sqlite"])
+    parser.add_argument("--cache", action="store_true", help="leave the response cache on")
+    parser.add_argument("--min-time", type=float, default=0.5, help="seconds per operation")
+    parser.add_argument("--reps", type=int, default=5, help="minimum calls per operation")
+    parser.add_argument("--output", help="write the JSON here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON output to compare the p50s against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="slowdown counted as a regression")
+    args = parser.parse_args()
+
+    print(f"{'size':>9} {'operation':<17} {'reps':>6} {'mean us':>12} {'p50 us':>12} {'p95 us':>12}", file=sys.stderr)
+    report = {"environment": environment(args), "populate": [], "results": []}
+    with tempfile.TemporaryDirectory() as data_dir:
+        for size in args.sizes:
+            populated, results = bench_size(size, args, data_dir)
+            report["populate"].append(populated)
+            report["results"] += results
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(report["results"], baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
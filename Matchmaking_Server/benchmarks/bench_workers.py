@@ -0,0 +1,90 @@
+"""Throughput of the Flask app under gunicorn with 1, 2, 4... workers on the shared SQLite store.
+
+Every run starts from an empty data directory and drives ``--clients``
+concurrent clients, each posting results and reading the leaderboard and
+stats. After the run the leaderboard total is read several times (each read
+may land on any worker) and compared with the number of results posted.
+
+Needs gunicorn. Run from Matchmaking_Server/:
+    python benchmarks/bench_workers.py [--workers 1,2,4] [--clients 32] [--requests 50] [--store shared]
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_asgi import http
+
+HERE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+def start_gunicorn(workers, port, store, data_dir):
+    env = dict(os.environ, BATTLESHIP_STORE=store, BATTLESHIP_DATA_DIR=data_dir, BATTLESHIP_RATE_LIMITS="off")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "--threads", "4", "-b", f"127.0.0.1:{port}",
+         "--backlog", "2048", "server:app"],
+        cwd=HERE, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            time.sleep(0.5 * workers)  # Let every worker boot
+            return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("gunicorn did not start")
+
+
+async def load(port, clients, requests):
+    async def client(c):
+        await http(port, "POST", "/auto_join", {"username": f"C{c}", "port": 9000 + c})
+        for r in range(requests):
+            if r % 3 == 0:
+                status, _ = await http(port, "POST", "/match_result", {"winner": f"C{c}", "loser": "X"})
+            elif r % 3 == 1:
+                status, _ = await http(port, "GET", "/leaderboard?top=10")
+            else:
+                status, _ = await http(port, "GET", "/stats")
+            assert status == 200, status
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client(c) for c in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    totals = set()
+    for _ in range(20):
+        _, body = await http(port, "GET", "/leaderboard")
+        totals.add(sum(score for _, score in body["scores"]))
+    return clients * (requests + 1) / elapsed, totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker load test")
+    parser.add_argument("--workers", default="1,2,4")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=50, help="requests per client")
+    parser.add_argument("--store", default="shared", help="shared, or memory to see workers disagree")
+    args = parser.parse_args()
+
+    expected = args.clients * len(range(0, args.requests, 3))
+    print(f"{os.cpu_count()} CPU(s), {args.clients} clients x {args.requests} requests, store={args.store}")
+    for port, workers in enumerate((int(w) for w in args.workers.split(",")), start=5301):
+        data_dir = tempfile.mkdtemp(prefix="bench_workers_")
+        proc = start_gunicorn(workers, port, args.store, data_dir)
+        try:
+            rate, totals = asyncio.run(load(port, args.clients, args.requests))
+        finally:
+            proc.terminate()
+            proc.wait()
+            shutil.rmtree(data_dir)
+        verdict = "consistent" if totals == {expected} else f"INCONSISTENT totals {sorted(totals)}"
+        print(f"{workers} worker(s): {rate:,.0f} req/s, leaderboard total {expected} expected: {verdict}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Simulation of the rated /enqueue queue with 10k players, on a simulated clock.
+
+Players with N(1500, 300) ratings arrive at ``--rate`` per simulated second
+and are enqueued; each arrival is matched right away when a neighbour fits
+its window, and a sweep runs every simulated second like the server's.
+Reports time-to-match, rating gaps, queue depth and the real time spent.
+
+Run from Matchmaking_Server/:  python benchmarks/sim_matchmaking.py [--players 10000] [--rate 200] [--store memory|sqlite]
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from matchmaking import MatchQueue
+from sqlite_store import SqliteDatabase, SqliteMatchQueue
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)] if values else 0
+
+
+def simulate(queue, players, rate, seed=1):
+    rng = random.Random(seed)
+    ratings = {f"P{i}": rng.gauss(1500, 300) for i in range(players)}
+    arrivals = []
+    clock = 0.0
+    for name in ratings:
+        clock += rng.expovariate(rate)
+        arrivals.append((clock, name))
+
+    gaps, depths = [], []
+    enqueue_s = sweep_s = 0.0
+    next_sweep = 1.0
+    for at, name in arrivals:
+        while next_sweep <= at:
+            start = time.perf_counter()
+            pairs = queue.sweep(next_sweep)
+            sweep_s += time.perf_counter() - start
+            gaps += [abs(ratings[a] - ratings[b]) for a, b in pairs]
+            depths.append(len(queue))
+            next_sweep += 1.0
+        start = time.perf_counter()
+        queue.enqueue(name, ratings[name], at)
+        partner = queue.find_partner(name, at)
+        if partner:
+            queue.pop_pair(name, partner, at)
+            gaps.append(abs(ratings[name] - ratings[partner]))
+        enqueue_s += time.perf_counter() - start
+
+    # Drain: keep sweeping until the windows are at their cap
+    end = next_sweep + (queue.max_window - queue.base_window) / queue.widen_rate + 1
+    while next_sweep <= end:
+        pairs = queue.sweep(next_sweep)
+        gaps += [abs(ratings[a] - ratings[b]) for a, b in pairs]
+        next_sweep += 1.0
+    return gaps, depths, enqueue_s, sweep_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rated matchmaking simulation")
+    parser.add_argument("--players", type=int, default=10000)
+    parser.add_argument("--rate", type=float, default=200, help="arrivals per simulated second")
+    parser.add_argument("--store", default="memory", choices=["memory", "sqlite"])
+    args = parser.parse_args()
+
+    db = None
+    if args.store == "sqlite":
+        db = SqliteDatabase(":memory:")
+        queue = SqliteMatchQueue(db)
+    else:
+        queue = MatchQueue()
+    gaps, depths, enqueue_s, sweep_s = simulate(queue, args.players, args.rate)
+    stats = queue.snapshot()
+    waits = sorted(queue.stats.recent)
+
+    print(f"{args.players:,} players arriving at {args.rate:g}/s ({args.store} queue)")
+    print(f"matched {stats['matched_players']:,}, left unmatched {stats['queue_depth']}")
+    print(f"time to match (simulated s): avg {stats['avg_wait']:.2f}  p50 {stats['p50_wait']:.2f}  "
+          f"p95 {stats['p95_wait']:.2f}  max {stats['max_wait']:.2f}  (percentiles over the last {len(waits)})")
+    print(f"rating gap: avg {sum(gaps) / len(gaps):.1f}  p95 {percentile(gaps, 0.95):.1f}  max {max(gaps):.1f}")
+    print(f"queue depth at sweeps: avg {sum(depths) / len(depths):.1f}  max {max(depths)}")
+    print(f"real time: {enqueue_s / args.players * 1e6:.1f} us per enqueue+match, "
+          f"{sweep_s / max(len(depths), 1) * 1e3:.2f} ms per sweep")
+    if db:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
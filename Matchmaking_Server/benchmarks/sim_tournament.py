@@ -0,0 +1,118 @@
+"""Simulated tournaments: makespan and idle-player time with and without auto-dispatch.
+
+Each format is played out on a simulated clock with game durations drawn
+from a log-normal distribution (median --median seconds), the same for a
+given game under both policies, and the winner drawn at random.
+
+- "rounds" starts a round only once every game of the previous one is over,
+  like an admin launching the bracket with /start_tournament_match/batch.
+- "auto" is the server's auto_dispatch: after every result, ready() starts
+  every game whose two players are free.
+
+Makespan runs from the first game's start to the last game's end. A
+player's idle time is the time until their last game ends, minus the time
+they spent playing.
+
+Run from Matchmaking_Server/:  python benchmarks/sim_tournament.py [--players 512] [--median 300]
+"""
+import argparse
+import heapq
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tournament_formats import FORMATS, RoundRobin, build_format
+
+
+def game_draw(seed, tournament, index, median, sigma):
+    """(duration, opponent1 wins) of a game, fixed by the players it is between."""
+    rng = random.Random(f"{seed}:{':'.join(sorted(tournament.opponents(index)))}")
+    return rng.lognormvariate(math.log(median), sigma), rng.random() < 0.5
+
+
+def simulate(tournament, policy, median, sigma=0.4, seed=1):
+    names = tournament.names
+    free = set(names)
+    in_flight = []  # Heap of (end, game index, duration)
+    playing = dict.fromkeys(names, 0.0)
+    finished_at = dict.fromkeys(names, 0.0)
+    next_round = 0
+    now = 0.0
+    peak = 0
+
+    def dispatch():
+        nonlocal next_round, peak
+        if policy == "rounds":
+            if in_flight:
+                return
+            if isinstance(tournament, RoundRobin):
+                # Round robin rounds are the circle method rounds
+                if next_round == len(tournament.round_starts):
+                    return
+                end = tournament.round_starts[next_round + 1] if next_round + 1 < len(tournament.round_starts) else len(tournament)
+                games = range(tournament.round_starts[next_round], end)
+                next_round += 1
+            else:
+                games = tournament.ready(names)
+        else:
+            games = tournament.ready(free)
+        for index in games:
+            duration, _ = game_draw(seed, tournament, index, median, sigma)
+            heapq.heappush(in_flight, (now + duration, index, duration))
+            free.difference_update(tournament.opponents(index))
+        peak = max(peak, len(in_flight))
+
+    played = 0
+    dispatch()
+    while in_flight:
+        now, index, duration = heapq.heappop(in_flight)
+        p1, p2 = tournament.opponents(index)
+        _, first_wins = game_draw(seed, tournament, index, median, sigma)
+        tournament.record_result(*((p1, p2) if first_wins else (p2, p1)))
+        for name in (p1, p2):
+            free.add(name)
+            playing[name] += duration
+            finished_at[name] = now
+        played += 1
+        dispatch()
+
+    idle = [finished_at[n] - playing[n] for n in names]
+    return {
+        "games": played,
+        "makespan": now,
+        "idle_mean": sum(idle) / len(idle),
+        "idle_total": sum(idle),
+        "parallel_mean": sum(playing.values()) / 2 / now,
+        "parallel_peak": peak,
+        "bound": max(playing.values()),  # Nobody plays two games at once
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tournament scheduling simulation")
+    parser.add_argument("--players", type=int, default=512)
+    parser.add_argument("--median", type=float, default=300, help="median game duration in simulated seconds")
+    parser.add_argument("--sigma", type=float, default=0.4, help="log-normal shape of the game durations")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    players = [f"P{i}" for i in range(args.players)]
+    print(f"{args.players} players, games of {args.median:g} s median (sigma {args.sigma:g}); times in simulated hours")
+    print(f"{'format':<19} {'policy':<7} {'games':>7} {'makespan':>9} {'bound':>7} {'idle/player':>12} "
+          f"{'idle total':>11} {'parallel':>9} {'peak':>5} {'real s':>7}")
+    for kind in FORMATS:
+        for policy in ("rounds", "auto"):
+            start = time.perf_counter()
+            r = simulate(build_format(kind, players, seed=args.seed), policy, args.median, args.sigma, args.seed)
+            real = time.perf_counter() - start
+            print(f"{kind:<19} {policy:<7} {r['games']:>7} {r['makespan'] / 3600:>9.2f} {r['bound'] / 3600:>7.2f} "
+                  f"{r['idle_mean'] / 3600:>12.2f} {r['idle_total'] / 3600:>11.0f} {r['parallel_mean']:>9.1f} "
+                  f"{r['parallel_peak']:>5} {real:>7.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,239 @@
-from typing import List, Dict, Any
-import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from array import array
 import random
 
-def generate_bracket(players: List[str]) -> Dict[str, Any]:
-    """Generate a single elimination bracket from a list of player names."""
+EMPTY = -1  # Slot waiting for the winner of a previous match
+BYE = -2  # Slot with no opponent in the first round
+
+# Values of Bracket.results
+PENDING, OPPONENT1_WON, OPPONENT2_WON = 0, 1, 2
+
+SLOTS = ("opponent1", "opponent2")
+
+
+class Bracket:
+    """Compact single elimination bracket.
+
+    The bracket has ``size`` first-round slots (a power of two) and
+    ``size - 1`` matches numbered 1..size-1 round after round. Links between
+    matches are implied by that numbering, so a match only costs two slots in
+    ``slots`` (participant index, EMPTY or BYE) and one byte in ``results``.
+    Per-match dicts are only built by ``match()`` and ``to_dict()``.
+    """
+
+    __slots__ = ("seed", "names", "size", "rounds", "slots", "results", "_current", "_lookup")
+
+    kind = "single_elimination"
+
+    def __init__(self, names: List[str], seed: int):
+        self.seed = seed
+        self.names = names  # participant id - 1 -> name, in seeded order
+        n = len(names)
+        self.size = 1 << (n - 1).bit_length()
+        self.rounds = self.size.bit_length() - 1
+        self.slots = array("i", [EMPTY]) * (2 * (self.size - 1))
+        self.results = bytearray(self.size - 1)
+        self._current = array("i", [0]) * n  # participant -> index of the match they play next
+        self._lookup: Optional[Dict[str, int]] = None
+
+        # Byes go to the first-round matches in bit-reversed order, which spreads
+        # them evenly across the bracket. There are never more byes than
+        # first-round matches, so every bye faces a real player and resolves
+        # immediately.
+        half = self.size // 2
+        byes = self.size - n
+        has_bye = bytearray(half)
+        width = max(self.rounds - 1, 0)
+        for position in range(byes):
+            has_bye[int(format(position, f"0{width}b")[::-1], 2) if width else 0] = 1
+
+        participant = 0
+        for position in range(half):
+            self.slots[2 * position] = participant
+            self._current[participant] = position
+            participant += 1
+            if has_bye[position]:
+                self.slots[2 * position + 1] = BYE
+            else:
+                self.slots[2 * position + 1] = participant
+                self._current[participant] = position
+                participant += 1
+
+        for position in range(half):
+            if has_bye[position]:
+                self._set_result(position, OPPONENT1_WON)
+
+    @classmethod
+    def build(cls, players: List[str], seed: Optional[int] = None) -> "Bracket":
+        """Seed ``players`` deterministically: the same player set and seed give the same bracket."""
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        names = sorted(players)
+        random.Random(seed).shuffle(names)
+        return cls(names, seed)
+
+    def to_state(self) -> Dict[str, Any]:
+        """Minimal form for snapshots: seeded names plus the result of every match."""
+        return {"seed": self.seed, "names": self.names, "results": self.results.hex()}
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Bracket":
+        bracket = cls(state["names"], state["seed"])
+        # Matches are numbered round after round, so replaying results in order
+        # fills every slot before the match using it is decided.
+        for index, result in enumerate(bytes.fromhex(state["results"])):
+            if result and not bracket.results[index]:
+                bracket._set_result(index, result)
+        return bracket
+
+    # === NAVIGATION ===
+
+    def round_start(self, rnd: int) -> int:
+        """Index of the first match of round ``rnd`` (1-based)."""
+        return self.size - (self.size >> (rnd - 1))
+
+    def round_of(self, index: int) -> int:
+        return self.rounds + 1 - (self.size - index - 1).bit_length()
+
+    def next_of(self, index: int) -> Optional[int]:
+        rnd = self.round_of(index)
+        if rnd == self.rounds:
+            return None
+        return self.round_start(rnd + 1) + (index - self.round_start(rnd)) // 2
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    # === RESULTS ===
+
+    def current_match(self, name: str) -> Optional[int]:
+        """Index of the bracket match ``name`` has to play next, if still in."""
+        participant = self._participant(name)
+        if participant is None:
+            return None
+        index = self._current[participant]
+        if index < 0 or self.results[index]:
+            return None
+        return index
+
+    def opponents(self, index: int) -> Tuple[Optional[str], Optional[str]]:
+        """Names in the two slots of a match, None for a slot not decided yet or a bye."""
+        return tuple(self.names[p] if p >= 0 else None for p in self.slots[2 * index:2 * index + 2])
+
+    def ready(self, free: Iterable[str]) -> List[int]:
+        """Pending matches whose two players are known and both ``free``, for the scheduler."""
+        free = set(free)
+        matches = []
+        for name in free:
+            index = self.current_match(name)
+            if index is None:
+                continue
+            p1, p2 = self.slots[2 * index], self.slots[2 * index + 1]
+            # Found from both sides: keep it once, from opponent1
+            if p1 >= 0 and p2 >= 0 and self.names[p1] == name and self.names[p2] in free:
+                matches.append(index)
+        return sorted(matches)
+
+    def record_result(self, winner: str, loser: str) -> Optional[int]:
+        """Record ``winner`` beating ``loser`` in their current match.
+
+        Returns the index of the match ``winner`` moves into (-1 after the
+        final), or None when the two are not opponents in a pending match.
+        """
+        index = self.current_match(winner)
+        if index is None:
+            return None
+        p1, p2 = self.slots[2 * index], self.slots[2 * index + 1]
+        if p1 < 0 or p2 < 0:
+            return None
+        winner_id = self._participant(winner)
+        loser_id = self._participant(loser)
+        if {winner_id, loser_id} != {p1, p2}:
+            return None
+
+        self._current[loser_id] = -1
+        next_index = self._set_result(index, OPPONENT1_WON if p1 == winner_id else OPPONENT2_WON)
+        return -1 if next_index is None else next_index
+
+    def _set_result(self, index: int, result: int) -> Optional[int]:
+        self.results[index] = result
+        winner_id = self.slots[2 * index + result - 1]
+        next_index = self.next_of(index)
+        if next_index is None:
+            self._current[winner_id] = -1
+            return None
+        self.slots[2 * next_index + (index - self.round_start(self.round_of(index))) % 2] = winner_id
+        self._current[winner_id] = next_index
+        return next_index
+
+    def _participant(self, name: str) -> Optional[int]:
+        if self._lookup is None:
+            self._lookup = {n: i for i, n in enumerate(self.names)}
+        return self._lookup.get(name)
+
+    # === SERIALIZATION ===
+
+    def match(self, index: int) -> Dict[str, Any]:
+        """The brackets-viewer style dict for the match at ``index``."""
+        rnd = self.round_of(index)
+        position = index - self.round_start(rnd)
+        result = self.results[index]
+        opponents = []
+        for slot in (0, 1):
+            participant = self.slots[2 * index + slot]
+            if participant < 0:
+                opponents.append(None)
+                continue
+            opponent = {"id": participant + 1, "name": self.names[participant]}
+            if result:
+                opponent["result"] = "win" if result == slot + 1 else "loss"
+            opponents.append(opponent)
+
+        next_index = self.next_of(index)
+        if rnd == 1:
+            prev_ids = []
+        else:
+            first = self.round_start(rnd - 1) + 2 * position + 1
+            prev_ids = [first, first + 1]
+        known = sum(o is not None for o in opponents)
+        return {
+            "id": index + 1,
+            "stage_id": 1,
+            "round": rnd,
+            "group": 0,
+            "child_count": 1,
+            "status": 4 if result else known,  # brackets-viewer: 0 locked, 1 waiting, 2 ready, 4 completed
+            "position": position,
+            "opponent1": opponents[0],
+            "opponent2": opponents[1],
+            "prev_match_ids": prev_ids,
+            "next_match_id": None if next_index is None else next_index + 1,
+            "next_slot": None if next_index is None else SLOTS[position % 2]
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": [{
+                "id": 1,
+                "name": "Main",
+                "tournament_id": 0,
+                "type": "single_elimination",
+                "number": 1
+            }],
+            "matches": [self.match(i) for i in range(len(self.results))],
+            "participants": [{"id": i + 1, "name": name} for i, name in enumerate(self.names)],
+            "seed": self.seed
+        }
+
+
+def generate_bracket(players: List[str], seed: Optional[int] = None) -> Dict[str, Any]:
+    """Generate a single elimination bracket from a list of player names.
+
+    Each match carries its bracket links: ``next_match_id`` and ``next_slot``
+    point to the match (and the opponent slot) its winner moves into, and
+    ``prev_match_ids`` lists the matches feeding it. First-round byes are
+    already resolved. Passing the same ``seed`` reproduces the same bracket.
+    """
     if not players or len(players) < 2:
         return {
             "stages": [],
@@ -21,63 +251,4 @@ def generate_bracket(players: List[str]) -> Dict[str, Any]:
             "error": "Invalid player names."
         }
 
-    random.shuffle(players)
-    n = len(players)
-    next_power = 2 ** math.ceil(math.log2(n))
-    byes = next_power - n
-    full_players = players + [None] * byes
-
-    participants = []
-    participant_map = {}
-    for i, name in enumerate(full_players):
-        pid = i + 1
-        if name:
-            participants.append({"id": pid, "name": name})
-            participant_map[i] = {"id": pid, "name": name}
-        else:
-            participant_map[i] = None
-
-    matches = []
-    match_id = 1
-    stage_id = 1
-    round_number = 1
-
-    def build_round(pairs):
-        return [{"p1": pairs[i], "p2": pairs[i + 1] if i + 1 < len(pairs) else None}
-                for i in range(0, len(pairs), 2)]
-
-    current_round = build_round(list(participant_map.values()))
-
-    while current_round:
-        next_pairs = []
-        for match in current_round:
-            matches.append({
-                "id": match_id,
-                "stage_id": stage_id,
-                "round": round_number,
-                "group": 0,
-                "child_count": 1,
-                "status": 0,
-                "opponent1": match["p1"],
-                "opponent2": match["p2"]
-            })
-            match_id += 1
-            next_pairs.append(None)  # Placeholder for future winners
-
-        if len(next_pairs) <= 1:
-            break
-
-        current_round = build_round(next_pairs)
-        round_number += 1
-
-    return {
-        "stages": [{
-            "id": stage_id,
-            "name": "Main",
-            "tournament_id": 0,
-            "type": "single_elimination",
-            "number": 1
-        }],
-        "matches": matches,
-        "participants": participants
-    }
+    return Bracket.build(players, seed).to_dict()
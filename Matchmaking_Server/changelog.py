@@ -0,0 +1,45 @@
+from typing import Any, Dict, Hashable, Iterable, Optional
+from collections import deque
+import threading
+import time
+
+
+class ChangeLog:
+    """The most recent changes to matches, waiting codes and scores, numbered by version.
+
+    Every change gets the next version; a client that read everything up to
+    version ``v`` only needs the changes after ``v``. Only the last ``limit``
+    changes are kept, and versions start from the clock in microseconds so
+    they keep increasing across restarts: a version from before a restart,
+    or older than the log, gets ``None`` and the client reloads everything.
+    """
+
+    def __init__(self, limit: int = 10000):
+        self.version = time.time_ns() // 1000
+        self.first = self.version  # Oldest version the log can give the changes after
+        self.limit = limit
+        self._entries: deque = deque()  # (version, kind, key, value), value None once removed
+        self._lock = threading.Lock()  # Collections under different locks record concurrently
+
+    def record(self, kind: str, key: Hashable, value: Any) -> int:
+        """Log the new ``value`` of an item (None when it was removed) and return its version."""
+        with self._lock:
+            self.version += 1
+            self._entries.append((self.version, kind, key, value))
+            if len(self._entries) > self.limit:
+                self.first = self._entries.popleft()[0]
+            return self.version
+
+    def since(self, version: int, kinds: Iterable[str]) -> Optional[Dict[str, Dict[Hashable, Any]]]:
+        """{kind: {key: latest value}} for the items of ``kinds`` changed after ``version``; None if the log does not reach back to it."""
+        changed: Dict[str, Dict[Hashable, Any]] = {kind: {} for kind in kinds}
+        with self._lock:
+            if not self.first <= version <= self.version:
+                return None
+            for entry_version, kind, key, value in reversed(self._entries):
+                if entry_version <= version:
+                    break
+                if kind in changed and key not in changed[kind]:
+                    changed[kind][key] = value
+        # Walked newest first: restore the order the changes happened in
+        return {kind: dict(reversed(items.items())) for kind, items in changed.items()}
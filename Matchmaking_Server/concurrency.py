@@ -0,0 +1,87 @@
+from typing import Any, Dict, Iterable, Iterator
+from contextlib import contextmanager
+import threading
+import time
+
+
+class InstrumentedLock:
+    """Re-entrant lock that counts how often, and how long, threads waited for it.
+
+    The uncontended path is a single non-blocking acquire; the clock is only
+    read when another thread holds the lock. Counters are updated while the
+    lock is held, so they need no lock of their own.
+    """
+
+    __slots__ = ("name", "_lock", "acquisitions", "contended", "wait_total", "wait_max")
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.RLock()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def acquire(self) -> None:
+        if not self._lock.acquire(blocking=False):
+            start = time.perf_counter()
+            self._lock.acquire()
+            waited = time.perf_counter() - start
+            self.contended += 1
+            self.wait_total += waited
+            if waited > self.wait_max:
+                self.wait_max = waited
+        self.acquisitions += 1
+
+    def release(self) -> None:
+        self._lock.release()
+
+    def __enter__(self) -> "InstrumentedLock":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "wait_seconds_total": self.wait_total,
+            "wait_seconds_max": self.wait_max
+        }
+
+
+class LockSet:
+    """Named InstrumentedLocks, one per shared collection.
+
+    ``hold()`` always takes locks in the order the names were declared, so
+    two threads can never end up waiting on each other. A thread that already
+    holds some locks may only ask for a subset of them (or for locks that come
+    after them in that order).
+    """
+
+    def __init__(self, names: Iterable[str]):
+        self.locks = {name: InstrumentedLock(name) for name in names}
+        self._rank = {name: i for i, name in enumerate(self.locks)}
+
+    def __getitem__(self, name: str) -> InstrumentedLock:
+        return self.locks[name]
+
+    @contextmanager
+    def hold(self, *names: str) -> Iterator[None]:
+        acquired = []
+        try:
+            for name in sorted(set(names), key=self._rank.__getitem__):
+                self.locks[name].acquire()
+                acquired.append(self.locks[name])
+            yield
+        finally:
+            for lock in reversed(acquired):
+                lock.release()
+
+    def hold_all(self):
+        return self.hold(*self.locks)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {name: lock.stats() for name, lock in self.locks.items()}
@@ -0,0 +1,173 @@
+from typing import Dict, List, Optional, Iterable, Any
+from collections import deque
+import asyncio
+import threading
+import time
+
+
+class Subscriber:
+    """One listener: its own queue and wakeup, so publishing only wakes the subscribers concerned."""
+
+    def __init__(self, username: Optional[str]):
+        self.username = username
+        self.queue: deque = deque()
+        self.ready = threading.Event()
+        self.reset = False  # Set when the requested backlog was already dropped
+        self.start_seq = 0  # Last event seq when the subscriber registered
+
+    def get(self, timeout: float) -> List[Dict[str, Any]]:
+        """Wait up to ``timeout`` seconds for events and return all queued ones."""
+        if not self.queue:
+            self.ready.wait(timeout)
+        self.ready.clear()
+        return self.drain()
+
+    def push(self, event: Dict[str, Any]) -> None:
+        self.queue.append(event)
+        self.wake()
+
+    def wake(self) -> None:
+        self.ready.set()
+
+    def drain(self) -> List[Dict[str, Any]]:
+        events = []
+        while self.queue:
+            events.append(self.queue.popleft())
+        return events
+
+
+class AsyncSubscriber(Subscriber):
+    """Subscriber awaited from an asyncio event loop.
+
+    Events may be published from any thread: the loop is woken with
+    ``call_soon_threadsafe``, at most once per batch, so an idle subscriber
+    costs no thread and no timer beyond its ``wait_for``.
+    """
+
+    def __init__(self, username: Optional[str], loop: asyncio.AbstractEventLoop):
+        super().__init__(username)
+        self._loop = loop
+        self._async_ready = asyncio.Event()
+        self._wake_scheduled = False
+
+    async def get_async(self, timeout: float) -> List[Dict[str, Any]]:
+        if not self.queue:
+            try:
+                await asyncio.wait_for(self._async_ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        self._async_ready.clear()
+        return self.drain()
+
+    def wake(self) -> None:
+        if not self._wake_scheduled:
+            self._wake_scheduled = True
+            self._loop.call_soon_threadsafe(self._on_wake)
+
+    def _on_wake(self) -> None:
+        self._wake_scheduled = False
+        self._async_ready.set()
+
+
+class EventBroker:
+    """Fan-out of server events to SSE streams and long-poll requests.
+
+    Events are {"seq", "type", "data", "to"} dicts. Subscribers registered
+    without a username (dashboards) get every event, player subscribers only
+    get events listing them in ``to``. The last ``backlog`` events are kept
+    so a client can resume from the last ``seq`` it saw.
+    """
+
+    def __init__(self, backlog: int = 1000):
+        self._lock = threading.Lock()
+        self._events: deque = deque(maxlen=backlog)
+        self._seq = 0
+        self._subscribers: Dict[Optional[str], set] = {}  # {username or None: {Subscriber}}
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    def publish(self, kind: str, data: Dict[str, Any], to: Iterable[str] = ()) -> int:
+        with self._lock:
+            event = {"seq": self._seq + 1, "type": kind, "data": data, "to": list(to), "time": time.time()}
+            targets = self._record(event)
+        for subscriber in targets:
+            subscriber.push(event)
+        return event["seq"]
+
+    def deliver(self, event: Dict[str, Any]) -> None:
+        """Fan out an event numbered elsewhere; its seq must follow ``last_seq``."""
+        with self._lock:
+            targets = self._record(event)
+        for subscriber in targets:
+            subscriber.push(event)
+
+    def _record(self, event: Dict[str, Any]) -> List[Subscriber]:
+        self._seq = event["seq"]
+        self._events.append(event)
+        targets = list(self._subscribers.get(None, ()))
+        for username in event["to"]:
+            targets.extend(self._subscribers.get(username, ()))
+        return targets
+
+    def subscribe(self, username: Optional[str] = None, since: Optional[int] = None,
+                  loop: Optional[asyncio.AbstractEventLoop] = None) -> Subscriber:
+        """Register a subscriber, pre-filled with backlog events after ``since``.
+
+        Passing the running ``loop`` returns an AsyncSubscriber for asyncio handlers.
+        """
+        subscriber = AsyncSubscriber(username, loop) if loop else Subscriber(username)
+        with self._lock:
+            subscriber.start_seq = self._seq
+            if since is not None and since > self._seq:
+                subscriber.reset = True  # Client saw a previous server run
+            elif since is not None and since < self._seq:
+                if not self._events or self._events[0]["seq"] > since + 1:
+                    subscriber.reset = True
+                for event in self._events:
+                    if event["seq"] > since and self._wants(subscriber, event):
+                        subscriber.queue.append(event)
+            self._subscribers.setdefault(username, set()).add(subscriber)
+        if subscriber.queue:
+            subscriber.wake()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self._lock:
+            subs = self._subscribers.get(subscriber.username)
+            if subs is not None:
+                subs.discard(subscriber)
+                if not subs:
+                    del self._subscribers[subscriber.username]
+
+    def poll(self, since: Optional[int], username: Optional[str] = None, timeout: float = 25.0) -> Dict[str, Any]:
+        """Long-poll: return events after ``since`` as soon as there are any, or after ``timeout``."""
+        subscriber = self.subscribe(username, since)
+        try:
+            events = subscriber.get(timeout)
+        finally:
+            self.unsubscribe(subscriber)
+        return self._poll_result(subscriber, events)
+
+    async def poll_async(self, since: Optional[int], username: Optional[str] = None, timeout: float = 25.0) -> Dict[str, Any]:
+        """``poll`` for asyncio handlers: waiting holds no thread."""
+        subscriber = self.subscribe(username, since, loop=asyncio.get_running_loop())
+        try:
+            events = await subscriber.get_async(timeout)
+        finally:
+            self.unsubscribe(subscriber)
+        return self._poll_result(subscriber, events)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    @staticmethod
+    def _poll_result(subscriber: Subscriber, events: List[Dict[str, Any]]) -> Dict[str, Any]:
+        last_seq = max(events[-1]["seq"] if events else 0, subscriber.start_seq)
+        return {"events": events, "last_seq": last_seq, "reset": subscriber.reset}
+
+    @staticmethod
+    def _wants(subscriber: Subscriber, event: Dict[str, Any]) -> bool:
+        return subscriber.username is None or subscriber.username in event["to"]
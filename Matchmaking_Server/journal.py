@@ -0,0 +1,160 @@
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import json
+import os
+import threading
+import time
+
+
+class Journal:
+    """Append-only operation log with batched fsync and compacting snapshots.
+
+    Each line of ``journal.log`` is {"n": seq, "op": name, "args": {...}}.
+    ``snapshot.json`` holds {"n": seq, "state": {...}}, the full state after
+    operation ``n``; recovery loads it and replays the journal lines after it.
+
+    Appends go to the OS straight away but are only fsynced every
+    ``flush_interval`` seconds or ``batch_size`` operations, whichever comes
+    first, so a crash loses at most that window.
+    """
+
+    def __init__(self, data_dir: str, batch_size: int = 256, flush_interval: float = 0.05,
+                 snapshot_every: int = 50000):
+        self.data_dir = data_dir
+        self.journal_path = os.path.join(data_dir, "journal.log")
+        self.snapshot_path = os.path.join(data_dir, "snapshot.json")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.snapshot_every = snapshot_every
+
+        self.seq = 0  # Last operation number written
+        self.synced_seq = 0  # Last operation number known to be on disk
+        self.since_snapshot = 0
+        self._lock = threading.Lock()
+        self._dirty = threading.Event()
+        self._closed = False
+        self._file = None
+        self._flusher: Optional[threading.Thread] = None
+
+        os.makedirs(data_dir, exist_ok=True)
+
+    @property
+    def lag(self) -> int:
+        """Operations written but not yet fsynced."""
+        return self.seq - self.synced_seq
+
+    # === RECOVERY ===
+
+    def recover(self, restore: Callable[[Dict[str, Any]], None], apply: Callable[[str, Dict[str, Any]], Any]) -> Tuple[int, int]:
+        """Load the snapshot then replay the journal tail. Returns (snapshot seq, replayed ops)."""
+        snapshot_seq = 0
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path) as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot["n"]
+            restore(snapshot["state"])
+
+        replayed = 0
+        self.seq = snapshot_seq
+        for entry in self._entries():
+            if entry["n"] <= snapshot_seq:
+                continue
+            try:
+                apply(entry["op"], entry["args"])
+            except Exception as e:
+                print(f"[JOURNAL] Skipping op {entry['n']} ({entry['op']}): {e}")
+            self.seq = entry["n"]
+            replayed += 1
+
+        self.synced_seq = self.seq
+        self.since_snapshot = replayed
+        return snapshot_seq, replayed
+
+    def _entries(self) -> Iterator[Dict[str, Any]]:
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path) as f:
+            for line in f:
+                if not line.endswith("\n"):
+                    break  # Torn write from a crash: everything before it is valid
+                yield json.loads(line)
+
+    # === WRITES ===
+
+    def open(self) -> None:
+        """Start appending (after ``recover``) and start the background fsync thread."""
+        self._file = open(self.journal_path, "a")
+        self._flusher = threading.Thread(target=self._flush_loop, name="journal-fsync", daemon=True)
+        self._flusher.start()
+
+    def append(self, op: str, args: Dict[str, Any]) -> int:
+        with self._lock:
+            self.seq += 1
+            self.since_snapshot += 1
+            self._file.write(json.dumps({"n": self.seq, "op": op, "args": args}, separators=(",", ":")) + "\n")
+            if self.seq - self.synced_seq >= self.batch_size:
+                self._sync()
+            else:
+                self._dirty.set()
+            return self.seq
+
+    def should_snapshot(self) -> bool:
+        return self.since_snapshot >= self.snapshot_every
+
+    def snapshot(self, state: Dict[str, Any]) -> None:
+        """Write ``state`` as the snapshot at the current seq and truncate the journal.
+
+        ``state`` must reflect every operation appended so far.
+        """
+        with self._lock:
+            tmp_path = self.snapshot_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"n": self.seq, "state": state}, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # Lines up to self.seq are now covered by the snapshot
+            self._file.close()
+            self._file = open(self.journal_path, "w")
+            self._fsync_dir()
+            self.synced_seq = self.seq
+            self.since_snapshot = 0
+
+    def flush(self) -> None:
+        with self._lock:
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            if self._file:
+                self._sync()
+                self._file.close()
+                self._file = None
+        self._dirty.set()
+
+    def _sync(self) -> None:
+        if self.synced_seq == self.seq or self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.synced_seq = self.seq
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._dirty.wait()
+            if self._closed:
+                return
+            self._dirty.clear()
+            time.sleep(self.flush_interval)  # Let a batch accumulate
+            with self._lock:
+                if self._closed:
+                    return
+                self._sync()
+
+    def _fsync_dir(self) -> None:
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.data_dir, os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
@@ -0,0 +1,70 @@
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+import math
+
+
+class Leases:
+    """Expiry deadlines for (kind, key) pairs, kept in a hashed timer wheel.
+
+    The wheel has ``slots`` buckets of ``tick`` seconds each, and a lease waits
+    in the bucket of its deadline. Renewing a lease only moves its deadline in
+    a dict: when the bucket comes due, an entry whose deadline has moved on
+    (or lies more than one turn of the wheel away) is put in the bucket of its
+    new deadline instead of expiring. Renewals, expiries and these moves are
+    all O(1), and ``expire()`` only looks at the buckets that came due.
+    """
+
+    def __init__(self, tick: float = 1.0, slots: int = 512):
+        self.tick = tick
+        self._slots: List[Set[Tuple[str, Hashable]]] = [set() for _ in range(slots)]
+        self._deadlines: Dict[Tuple[str, Hashable], float] = {}  # {(kind, key): deadline}
+        self._cursor: Optional[int] = None  # First tick not swept yet
+        self._swept = False
+
+    def __len__(self) -> int:
+        return len(self._deadlines)
+
+    def renew(self, kind: str, key: Hashable, deadline: float) -> None:
+        """Set the deadline of a lease, creating it if needed."""
+        item = (kind, key)
+        previous = self._deadlines.get(item)
+        self._deadlines[item] = deadline
+        if previous is None or deadline < previous:
+            self._schedule(item, deadline)
+
+    def release(self, kind: str, key: Hashable) -> None:
+        """Drop a lease without expiring it (its wheel entry is discarded when its bucket comes due)."""
+        self._deadlines.pop((kind, key), None)
+
+    def deadline(self, kind: str, key: Hashable) -> Optional[float]:
+        return self._deadlines.get((kind, key))
+
+    def expire(self, now: float) -> List[Tuple[str, Hashable]]:
+        """Remove and return the leases whose deadline is at or before ``now``, up to one tick late."""
+        target = math.floor(now / self.tick)
+        if self._cursor is None or target < self._cursor:
+            self._cursor = target  # Nothing is due yet: later leases may come due sooner than the earliest one
+        self._swept = True
+        expired = []
+        for tick in range(self._cursor, min(target, self._cursor + len(self._slots))):
+            index = tick % len(self._slots)
+            due, self._slots[index] = self._slots[index], set()
+            for item in due:
+                deadline = self._deadlines.get(item)
+                if deadline is None:
+                    continue
+                if deadline <= now:
+                    del self._deadlines[item]
+                    expired.append(item)
+                else:
+                    self._schedule(item, deadline)
+        self._cursor = max(self._cursor, target)
+        return expired
+
+    def _schedule(self, item: Tuple[str, Hashable], deadline: float) -> None:
+        tick = math.floor(deadline / self.tick)
+        if self._cursor is None or tick < self._cursor:
+            if self._swept:
+                tick = self._cursor  # Already due: expires at the next sweep
+            else:
+                self._cursor = tick
+        self._slots[tick % len(self._slots)].add(item)
@@ -0,0 +1,184 @@
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+from collections.abc import MutableMapping
+from datetime import datetime
+from stats import MatchStats
+
+
+class MatchStore:
+    """Match history with indexes by code, by player and for active matches.
+
+    Matches are kept as plain dicts ({player1, player2, code, timestamp, winner})
+    so they serialize exactly like the old ``matches_history`` list entries.
+    Every index maps to internal match ids, which lets lookups, result
+    recording and removals touch only the matches involved. ``stats`` follows
+    every change so /stats never has to walk the history, and so does
+    ``changes`` (a ChangeLog, when set) for the ?since= delta feed.
+    """
+
+    def __init__(self):
+        self._matches: Dict[int, Dict[str, Any]] = {}  # {match_id: match}, insertion ordered
+        self._next_id = 1
+        self._by_code: Dict[str, Dict[int, None]] = {}  # {code: {match_id: None}}
+        self._by_player: Dict[str, Dict[int, None]] = {}  # {username: {match_id: None}}
+        self._active: Dict[int, Dict[str, Any]] = {}  # {match_id: match} without winner
+        self._active_by_player: Dict[str, Dict[int, None]] = {}
+        self._active_by_code: Dict[str, Dict[int, None]] = {}
+        self.stats = MatchStats()
+        self.changes = None
+
+    def __len__(self) -> int:
+        return len(self._matches)
+
+    # === WRITES ===
+
+    def add(self, player1: str, player2: str, code: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        """Record a new active match and return it."""
+        match = {
+            "player1": player1,
+            "player2": player2,
+            "timestamp": timestamp or datetime.now().strftime("%d/%m/%Y %H:%M"),
+            "winner": None,
+            "code": code
+        }
+        match_id = self._next_id
+        self._next_id += 1
+
+        self._matches[match_id] = match
+        self._active[match_id] = match
+        self._by_code.setdefault(code, {})[match_id] = None
+        self._active_by_code.setdefault(code, {})[match_id] = None
+        for username in self._players_of(match):
+            self._by_player.setdefault(username, {})[match_id] = None
+            self._active_by_player.setdefault(username, {})[match_id] = None
+        self.stats.on_add(match)
+        self._changed(match_id, match)
+        return match
+
+    def restore(self, match: Dict[str, Any]) -> Dict[str, Any]:
+        """Re-add a match from a snapshot, keeping its winner and duration."""
+        restored = self.add(match["player1"], match["player2"], match["code"], match["timestamp"])
+        if match.get("winner") is not None:
+            match_id = next(reversed(self._by_code[match["code"]]))
+            restored["winner"] = match["winner"]
+            if "duration" in match:
+                restored["duration"] = match["duration"]
+            self._deactivate(match_id, restored)
+            self.stats.on_result(restored)
+            self._changed(match_id, restored)
+        return restored
+
+    def record_result(self, winner: str, duration: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Set the winner of the most recent active match involving ``winner``."""
+        active_ids = self._active_by_player.get(winner)
+        if not active_ids:
+            return None
+
+        match_id = next(reversed(active_ids))
+        match = self._active[match_id]
+        match["winner"] = winner
+        if duration is not None:
+            match["duration"] = duration
+        self._deactivate(match_id, match)
+        self.stats.on_result(match)
+        self._changed(match_id, match)
+        return match
+
+    def remove_player(self, username: str) -> int:
+        """Drop every match involving ``username``. Returns the number removed."""
+        match_ids = self._by_player.pop(username, {})
+        self._active_by_player.pop(username, None)
+
+        for match_id in match_ids:
+            match = self._matches.pop(match_id)
+            self.stats.on_remove(match)
+            if match_id in self._active:
+                self._deactivate(match_id, match)
+            self._discard(self._by_code, match["code"], match_id)
+            for other in self._players_of(match):
+                if other != username:
+                    self._discard(self._by_player, other, match_id)
+            self._changed(match_id, None)
+        return len(match_ids)
+
+    # === READS ===
+
+    def find_active(self, code: str) -> Optional[Dict[str, Any]]:
+        """Return the oldest active match registered under ``code``."""
+        active_ids = self._active_by_code.get(code)
+        if not active_ids:
+            return None
+        return self._active[next(iter(active_ids))]
+
+    def find_by_code(self, code: str) -> List[Dict[str, Any]]:
+        return [self._matches[i] for i in self._by_code.get(code, {})]
+
+    def matches_of(self, username: str) -> List[Dict[str, Any]]:
+        return [self._matches[i] for i in self._by_player.get(username, {})]
+
+    def active(self) -> List[Dict[str, Any]]:
+        return list(self._active.values())
+
+    def history(self) -> List[Dict[str, Any]]:
+        return list(self._matches.values())
+
+    def items(self) -> List[Tuple[int, Dict[str, Any]]]:
+        """(match_id, match) pairs in history order."""
+        return list(self._matches.items())
+
+    # === INTERNALS ===
+
+    def _changed(self, match_id: int, match: Optional[Dict[str, Any]]) -> None:
+        if self.changes is not None:
+            self.changes.record("match", match_id, dict(match) if match else None)
+
+    @staticmethod
+    def _players_of(match: Dict[str, Any]) -> List[str]:
+        players = [match["player1"]]
+        if match["player2"] != match["player1"]:
+            players.append(match["player2"])
+        return players
+
+    @staticmethod
+    def _discard(index: Dict[str, Dict[int, None]], key: str, match_id: int) -> None:
+        ids = index.get(key)
+        if ids is None:
+            return
+        ids.pop(match_id, None)
+        if not ids:
+            del index[key]
+
+    def _deactivate(self, match_id: int, match: Dict[str, Any]) -> None:
+        del self._active[match_id]
+        self._discard(self._active_by_code, match["code"], match_id)
+        for username in self._players_of(match):
+            self._discard(self._active_by_player, username, match_id)
+
+
+class WaitingMatches(MutableMapping):
+    """Match codes waiting for a second player ({code: {'creator', 'created_at'}}), indexed by creator."""
+
+    def __init__(self):
+        self._codes: Dict[str, Dict[str, Any]] = {}
+        self._by_creator: Dict[str, Dict[str, None]] = {}  # {creator: {code: None}}
+
+    def __getitem__(self, code: str) -> Dict[str, Any]:
+        return self._codes[code]
+
+    def __setitem__(self, code: str, info: Dict[str, Any]) -> None:
+        if code in self._codes:
+            del self[code]
+        self._codes[code] = info
+        self._by_creator.setdefault(info["creator"], {})[code] = None
+
+    def __delitem__(self, code: str) -> None:
+        info = self._codes.pop(code)
+        MatchStore._discard(self._by_creator, info["creator"], code)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._codes)
+
+    def __len__(self) -> int:
+        return len(self._codes)
+
+    def codes_of(self, creator: str) -> List[str]:
+        return list(self._by_creator.get(creator, ()))
@@ -0,0 +1,209 @@
+from typing import Any, Dict, List, MutableMapping, Optional, Tuple
+from collections import deque
+import bisect
+
+
+class Ratings:
+    """Elo ratings updated from match results; unknown players start at ``initial``."""
+
+    def __init__(self, store: Optional[MutableMapping[str, float]] = None, k: float = 32, initial: float = 1500):
+        self._ratings = {} if store is None else store  # {username: rating}
+        self.k = k
+        self.initial = initial
+
+    def get(self, username: str) -> float:
+        return self._ratings.get(username, self.initial)
+
+    def record(self, winner: str, loser: str) -> Tuple[float, float]:
+        """Move both ratings by the Elo update and return the new (winner, loser) ratings."""
+        rw, rl = self.get(winner), self.get(loser)
+        expected = 1 / (1 + 10 ** ((rl - rw) / 400))  # Winner's expected score
+        delta = self.k * (1 - expected)
+        self._ratings[winner] = rw + delta
+        self._ratings[loser] = rl - delta
+        return rw + delta, rl - delta
+
+    def items(self) -> List[Tuple[str, float]]:
+        return list(self._ratings.items())
+
+
+class QueueStats:
+    """Time-to-match counters, with the most recent waits kept for percentiles."""
+
+    def __init__(self, recent: int = 1000):
+        self.matched = 0
+        self.wait_sum = 0.0
+        self.wait_max = 0.0
+        self.recent: deque = deque(maxlen=recent)
+
+    def on_match(self, waited: float) -> None:
+        self.matched += 1
+        self.wait_sum += waited
+        if waited > self.wait_max:
+            self.wait_max = waited
+        self.recent.append(waited)
+
+    def snapshot(self, depth: int) -> Dict[str, Any]:
+        recent = sorted(self.recent)
+        return {
+            "queue_depth": depth,
+            "matched_players": self.matched,
+            "avg_wait": self.wait_sum / self.matched if self.matched else 0,
+            "p50_wait": recent[len(recent) // 2] if recent else 0,
+            "p95_wait": recent[int(len(recent) * 0.95)] if recent else 0,
+            "max_wait": self.wait_max
+        }
+
+
+class SortedBuckets:
+    """A sorted collection of distinct items, split into sorted buckets of ``load`` to 2 * ``load`` items.
+
+    ``add()``, ``remove()`` and ``neighbours()`` bisect the buckets' last
+    items, then one bucket: O(log n + load), where one sorted list would
+    shift O(n) items on every change. Only splitting a full bucket and
+    dropping an empty one move the bucket list itself, O(n / load).
+    """
+
+    def __init__(self, load: int = 256):
+        self.load = load
+        self._buckets: List[list] = []
+        self._maxes: list = []  # Last item of each bucket
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def add(self, item: Any) -> None:
+        self._len += 1
+        if not self._buckets:
+            self._buckets.append([item])
+            self._maxes.append(item)
+            return
+        i = min(bisect.bisect_left(self._maxes, item), len(self._buckets) - 1)
+        bucket = self._buckets[i]
+        bisect.insort(bucket, item)
+        self._maxes[i] = bucket[-1]
+        if len(bucket) > 2 * self.load:
+            upper = bucket[self.load:]
+            del bucket[self.load:]
+            self._buckets.insert(i + 1, upper)
+            self._maxes[i] = bucket[-1]
+            self._maxes.insert(i + 1, upper[-1])
+
+    def remove(self, item: Any) -> None:
+        i, j = self._locate(item)
+        bucket = self._buckets[i]
+        del bucket[j]
+        self._len -= 1
+        if bucket:
+            self._maxes[i] = bucket[-1]
+        else:
+            del self._buckets[i], self._maxes[i]
+
+    def neighbours(self, item: Any) -> List[Any]:
+        """The items just below and just above ``item``, which must be in the collection."""
+        i, j = self._locate(item)
+        bucket = self._buckets[i]
+        below = bucket[j - 1] if j else self._buckets[i - 1][-1] if i else None
+        above = bucket[j + 1] if j + 1 < len(bucket) else \
+            self._buckets[i + 1][0] if i + 1 < len(self._buckets) else None
+        return [neighbour for neighbour in (below, above) if neighbour is not None]
+
+    def _locate(self, item: Any) -> Tuple[int, int]:
+        i = bisect.bisect_left(self._maxes, item)
+        if i < len(self._buckets):
+            j = bisect.bisect_left(self._buckets[i], item)
+            if self._buckets[i][j] == item:
+                return i, j
+        raise ValueError(f"{item!r} not in collection")
+
+
+class MatchQueue:
+    """Players waiting for an opponent, kept sorted by rating.
+
+    A player's nearest rated neighbours are found by bisection, in
+    SortedBuckets so that joining and leaving stay cheap in long queues. Two players
+    are paired when their rating gap fits the window of the one who has
+    waited longer: ``base_window`` points, widened by ``widen_rate`` points
+    per second of waiting up to ``max_window``.
+    """
+
+    def __init__(self, base_window: float = 50, widen_rate: float = 25, max_window: float = 400):
+        self.base_window = base_window
+        self.widen_rate = widen_rate
+        self.max_window = max_window
+        self.stats = QueueStats()
+        self._entries: Dict[str, Tuple[float, int, str, float]] = {}  # {username: (rating, seq, username, enqueued_at)}
+        self._order = SortedBuckets()  # (rating, seq, username)
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._entries
+
+    def enqueue(self, username: str, rating: float, now: float) -> None:
+        if username in self._entries:
+            return
+        self._seq += 1
+        self._entries[username] = (rating, self._seq, username, now)
+        self._order.add((rating, self._seq, username))
+
+    def remove(self, username: str) -> Optional[float]:
+        """Take ``username`` out of the queue; returns when they were enqueued, None if they were not queued."""
+        entry = self._entries.pop(username, None)
+        if entry is None:
+            return None
+        self._order.remove(entry[:3])
+        return entry[3]
+
+    def window(self, username: str, now: float) -> float:
+        waited = now - self._lookup(username)[1]
+        return min(self.base_window + self.widen_rate * waited, self.max_window)
+
+    def find_partner(self, username: str, now: float) -> Optional[str]:
+        """The closest rated queued player within the allowed window, if any."""
+        rating = self._lookup(username)[0]
+        best = min(((abs(r - rating), name) for r, name in self._neighbours(username)), default=None)
+        if best is None:
+            return None
+        gap, partner = best
+        if gap > max(self.window(username, now), self.window(partner, now)):
+            return None
+        return partner
+
+    def pop_pair(self, a: str, b: str, now: float) -> Tuple[str, str]:
+        """Dequeue a matched pair; returns it longest waiting first."""
+        since_a, since_b = self.remove(a), self.remove(b)
+        self.stats.on_match(now - since_a)
+        self.stats.on_match(now - since_b)
+        return (a, b) if since_a <= since_b else (b, a)
+
+    def sweep(self, now: float) -> List[Tuple[str, str]]:
+        """Pair every queued player whose window now fits a neighbour, longest waiting first."""
+        pairs = []
+        for username in self._waiting():
+            if username in self:
+                partner = self.find_partner(username, now)
+                if partner:
+                    pairs.append(self.pop_pair(username, partner, now))
+        return pairs
+
+    # Storage, overridden by SqliteMatchQueue
+
+    def _lookup(self, username: str) -> Tuple[float, float]:
+        """(rating, enqueued_at) of a queued player."""
+        entry = self._entries[username]
+        return entry[0], entry[3]
+
+    def _neighbours(self, username: str) -> List[Tuple[float, str]]:
+        """(rating, username) of the queued players just below and just above ``username``."""
+        return [item[::2] for item in self._order.neighbours(self._entries[username][:3])]
+
+    def _waiting(self) -> List[str]:
+        """Queued usernames, longest waiting first."""
+        return list(self._entries)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return self.stats.snapshot(len(self))
@@ -0,0 +1,83 @@
+from typing import Any, Dict, Iterable, List, Tuple
+import bisect
+import threading
+
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implied
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class RouteSeries:
+    """Latency histogram and error count of one (route, method)."""
+
+    __slots__ = ("buckets", "sum", "count", "errors")
+
+    def __init__(self, size: int):
+        self.buckets = [0] * (size + 1)  # Per bucket, not cumulative; the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.errors = 0
+
+
+class RequestMetrics:
+    """Request counts per status, 5xx counts and latency histograms per (route, method).
+
+    ``observe()`` is one bisect and a few increments under a lock, so it can
+    stay on in production; the text exposition is only built on a scrape.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self._series: Dict[Tuple[str, str], RouteSeries] = {}
+        self._statuses: Dict[Tuple[str, str, int], int] = {}  # {(route, method, status): count}
+        self._lock = threading.Lock()
+
+    def observe(self, route: str, method: str, status: int, seconds: float) -> None:
+        index = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            series = self._series.get((route, method))
+            if series is None:
+                series = self._series[(route, method)] = RouteSeries(len(self.buckets))
+            series.buckets[index] += 1
+            series.sum += seconds
+            series.count += 1
+            if status >= 500:
+                series.errors += 1
+            key = (route, method, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def render(self, prefix: str) -> List[str]:
+        with self._lock:
+            statuses = sorted(self._statuses.items())
+            series = sorted((key, list(s.buckets), s.sum, s.count, s.errors) for key, s in self._series.items())
+
+        lines = family(f"{prefix}_requests_total", "counter", "Requests served, by route, method and status.",
+                       [({"route": r, "method": m, "status": str(s)}, n) for (r, m, s), n in statuses])
+        lines += family(f"{prefix}_request_errors_total", "counter", "Requests answered with a 5xx status.",
+                        [({"route": r, "method": m}, errors) for (r, m), _, _, _, errors in series])
+        name = f"{prefix}_request_duration_seconds"
+        lines += [f"# HELP {name} Time to produce the response, by route and method.", f"# TYPE {name} histogram"]
+        for (route, method), counts, total, count, _ in series:
+            labels = {"route": route, "method": method}
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                lines.append(sample(f"{name}_bucket", {**labels, "le": "+Inf" if bound == float("inf") else repr(bound)}, cumulative))
+            lines.append(sample(f"{name}_sum", labels, total))
+            lines.append(sample(f"{name}_count", labels, count))
+        return lines
+
+
+def family(name: str, kind: str, help_text: str, samples: Iterable[Tuple[Dict[str, str], Any]]) -> List[str]:
+    """One metric family in the Prometheus text format: HELP, TYPE, then a line per (labels, value)."""
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"] + [sample(name, labels, value) for labels, value in samples]
+
+
+def sample(name: str, labels: Dict[str, str], value: Any) -> str:
+    if not labels:
+        return f"{name} {value}"
+    text = ",".join(f'{key}="{escape(str(label))}"' for key, label in labels.items())
+    return f"{name}{{{text}}} {value}"
+
+
+def escape(label: str) -> str:
+    return label.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
@@ -0,0 +1,193 @@
+from typing import Any, Callable, Counter, Dict, List, Optional
+import collections
+import cProfile
+import os
+import pstats
+import random
+import re
+import sys
+import threading
+import time
+
+MODES = ("collapsed", "pstats")
+
+
+class RequestProfiler:
+    """Profiles a sample of requests while switched on, grouped by route.
+
+    ``sample()`` picks the requests: each one with probability ``fraction``,
+    until ``duration`` seconds have passed (or until ``stop()``). ``run()``
+    profiles one request, then files the profile under the route it resolved
+    to. In "collapsed" mode a background thread samples the stack of every
+    profiled request each ``interval`` seconds and counts folded stacks
+    ("outer;inner;leaf count", for flamegraph.pl or speedscope). In "pstats"
+    mode each request runs under cProfile and adds to its route's Stats; one
+    request at a time, since cProfile cannot run in two threads at once on
+    Python 3.12+. ``stop()`` writes one file per route into a directory per
+    session.
+
+    Nothing here runs while the profiler is off: the server only routes
+    requests through it between start() and stop().
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.active = False
+        self.mode = "collapsed"
+        self.fraction = 1.0
+        self.interval = 0.005
+        self.until: Optional[float] = None  # time.monotonic() deadline, None without a window
+        self.session: Optional[str] = None  # Directory the running session writes to
+        self.profiled = 0
+        self.skipped = 0  # Sampled in pstats mode while another request held cProfile
+        self._stacks: Dict[str, Counter[str]] = {}  # {route: {folded stack: samples}}
+        self._stats: Dict[str, pstats.Stats] = {}  # {route: merged cProfile stats}
+        self._running: Dict[int, tuple] = {}  # {thread id: (frame profiling started in, {folded stack: samples})}
+        self._cprofile = threading.Lock()
+        self._lock = threading.Lock()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self, mode: str = "collapsed", fraction: float = 1.0, duration: Optional[float] = None,
+              interval: float = 0.005) -> None:
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if not 0 < fraction <= 1:
+            raise ValueError("fraction must be in (0, 1]")
+        if duration is not None and duration <= 0:
+            raise ValueError("duration must be positive")
+        if not 0.0005 <= interval <= 1:
+            raise ValueError("interval must be between 0.0005 and 1 second")
+        with self._lock:
+            if self.active:
+                raise RuntimeError("profiler already running")
+            self.mode, self.fraction, self.interval = mode, fraction, interval
+            self.until = time.monotonic() + duration if duration else None
+            self.session = os.path.join(self.directory, time.strftime("%Y%m%d-%H%M%S"))
+            self.profiled = self.skipped = 0
+            self._stacks, self._stats = {}, {}
+            self.active = True
+            if mode == "collapsed":
+                self._sampler = threading.Thread(target=self._sample_stacks, name="profiler", daemon=True)
+                self._sampler.start()
+
+    def stop(self) -> List[str]:
+        """Switch off and write the profiles; returns the files written (none if it was not running)."""
+        with self._lock:
+            if not self.active:
+                return []
+            self.active = False
+            sampler, self._sampler = self._sampler, None
+        if sampler is not None and sampler is not threading.current_thread():
+            sampler.join()
+        return self._write()
+
+    def sample(self) -> bool:
+        """Whether to profile the next request. Stops the profiler once its window is over."""
+        if not self.active or self._window_over():
+            return False
+        return self.fraction >= 1 or random.random() < self.fraction
+
+    def run(self, func: Callable[..., Any], route: Callable[[], str], *args: Any) -> Any:
+        """``func(*args)`` profiled, filed under ``route()`` once it returns."""
+        if self.mode == "pstats":
+            if not self._cprofile.acquire(blocking=False):
+                self.skipped += 1
+                return func(*args)
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+                try:
+                    return func(*args)
+                finally:
+                    profile.disable()
+                    self._add_stats(route(), profile)
+            finally:
+                self._cprofile.release()
+
+        thread = threading.get_ident()
+        stacks: Counter[str] = collections.Counter()
+        self._running[thread] = (sys._getframe(), stacks)
+        try:
+            return func(*args)
+        finally:
+            del self._running[thread]
+            with self._lock:
+                self._stacks.setdefault(route(), collections.Counter()).update(stacks)
+                self.profiled += 1
+
+    def status(self) -> Dict[str, Any]:
+        self._window_over()
+        with self._lock:
+            routes = sorted(self._stacks if self.mode == "collapsed" else self._stats)
+        return {
+            "active": self.active,
+            "mode": self.mode,
+            "fraction": self.fraction,
+            "interval": self.interval,
+            "remaining": max(0.0, round(self.until - time.monotonic(), 3)) if self.active and self.until else None,
+            "session": self.session,
+            "profiled": self.profiled,
+            "skipped": self.skipped,
+            "routes": routes,
+        }
+
+    def _window_over(self) -> bool:
+        """Stop (and write the profiles) if the time window has passed."""
+        if self.active and self.until is not None and time.monotonic() >= self.until:
+            self.stop()
+            return True
+        return False
+
+    def _add_stats(self, route: str, profile: cProfile.Profile) -> None:
+        with self._lock:
+            if route in self._stats:
+                self._stats[route].add(profile)
+            else:
+                self._stats[route] = pstats.Stats(profile)
+            self.profiled += 1
+
+    def _sample_stacks(self) -> None:
+        while self.active and not self._window_over():
+            frames = sys._current_frames()
+            for thread, (top, stacks) in list(self._running.items()):
+                frame = frames.get(thread)
+                names = []
+                # Walk up to the frame run() was called in: the server above it is the same for every sample
+                while frame is not None and frame is not top:
+                    code = frame.f_code
+                    names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if names:
+                    stacks[";".join(reversed(names))] += 1
+            del frames
+            time.sleep(self.interval)
+
+    def _write(self) -> List[str]:
+        with self._lock:
+            profiles = dict(self._stacks if self.mode == "collapsed" else self._stats)
+        if not profiles:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+        base, n = self.session, 1
+        while True:
+            try:
+                os.mkdir(self.session)
+                break
+            except FileExistsError:
+                n += 1  # Another session started in the same second
+                self.session = f"{base}-{n}"
+        paths = []
+        for route, profile in sorted(profiles.items()):
+            path = os.path.join(self.session, f"{route_tag(route)}.{self.mode}")
+            if self.mode == "collapsed":
+                with open(path, "w") as f:
+                    f.writelines(f"{stack} {count}\n" for stack, count in profile.most_common())
+            else:
+                profile.dump_stats(path)
+            paths.append(path)
+        return paths
+
+
+def route_tag(route: str) -> str:
+    """A file name for a URL rule: /rank/<username> -> rank_username."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", route).strip("_") or "root"
@@ -0,0 +1,88 @@
+from typing import Any, Dict, Hashable, Optional, Tuple
+from collections import OrderedDict
+import threading
+
+
+class RateLimiter:
+    """Token buckets per (route class, client), refilled at ``rate`` tokens per second up to ``burst``.
+
+    A request can also be charged to the bucket of its address, shared by
+    every client there and ``per_address`` times larger: clients that make
+    up a new name for each request still run out of tokens together.
+
+    Buckets are kept least recently used first. A bucket left alone long
+    enough to refill is the same as no bucket, so each call drops those at
+    the old end: memory follows the clients active in the last few seconds.
+    """
+
+    def __init__(self, classes: Dict[str, Tuple[float, float]], per_address: float = 10):
+        self.classes = dict(classes)  # {route class: (rate, burst)}
+        self.per_address = per_address
+        # {(class, "client" or "address", name): (tokens, updated)}
+        self._buckets: "OrderedDict[Tuple[str, str, Hashable], Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = {name: 0 for name in self.classes}
+        self.limited = {name: 0 for name in self.classes}
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def acquire(self, route_class: str, client: Optional[Hashable], now: float,
+                address: Optional[Hashable] = None) -> float:
+        """Take one token from the client's bucket and from the address's, if given.
+
+        Returns 0 when allowed, else the seconds until both have a token (no
+        token is taken then).
+        """
+        keys = [(route_class, kind, name) for kind, name in (("client", client), ("address", address))
+                if name is not None]
+        with self._lock:
+            self._prune(now)
+            buckets, wait = [], 0.0
+            for key in keys:
+                rate, burst = self._limits(key)
+                tokens, updated = self._buckets.pop(key, (burst, now))
+                tokens = min(burst, tokens + (now - updated) * rate)
+                buckets.append((key, tokens))
+                if tokens < 1:
+                    wait = max(wait, (1 - tokens) / rate)
+            for key, tokens in buckets:
+                self._buckets[key] = (tokens if wait else tokens - 1, now)
+            if wait:
+                self.limited[route_class] += 1
+            else:
+                self.allowed[route_class] += 1
+            return wait
+
+    def _limits(self, key: Tuple[str, str, Hashable]) -> Tuple[float, float]:
+        rate, burst = self.classes[key[0]]
+        scale = self.per_address if key[1] == "address" else 1
+        return rate * scale, burst * scale
+
+    def _prune(self, now: float) -> None:
+        while self._buckets:
+            key, (tokens, updated) = next(iter(self._buckets.items()))
+            rate, burst = self._limits(key)
+            if tokens + (now - updated) * rate < burst:
+                return
+            self._buckets.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._buckets),
+                "allowed": dict(self.allowed),
+                "limited": dict(self.limited)
+            }
+
+    @classmethod
+    def from_spec(cls, spec: str) -> Optional["RateLimiter"]:
+        """Parse ``"read=20/40,write=10/20"`` (class=rate/burst, comma separated); "off" or "" gives None."""
+        if spec.strip().lower() in ("", "off"):
+            return None
+        classes = {}
+        for part in spec.split(","):
+            name, _, limits = part.partition("=")
+            rate, _, burst = limits.partition("/")
+            classes[name.strip()] = (float(rate), float(burst or rate))
+        return cls(classes)
@@ -0,0 +1,201 @@
+from typing import Callable, Deque, Dict, Iterable, Optional, Tuple
+from collections import deque
+import json
+import socket
+import struct
+import threading
+
+HEADER = struct.Struct(">I")  # Every frame: payload length (4 bytes, big-endian), then the payload
+MAX_FRAME = 64 * 1024
+
+
+def send_frame(sock: socket.socket, payload: bytes) -> None:
+    sock.sendall(HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock: socket.socket) -> Optional[bytes]:
+    """The next frame's payload; None once the peer closed the connection."""
+    header = recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    (size,) = HEADER.unpack(header)
+    if size > MAX_FRAME:
+        raise ValueError(f"frame of {size} bytes (max {MAX_FRAME})")
+    return recv_exact(sock, size)
+
+
+def recv_exact(sock: socket.socket, size: int) -> Optional[bytes]:
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return bytes(data)
+
+
+class Peer:
+    """One player's relay connection; sends are serialized so frames never interleave."""
+
+    __slots__ = ("sock", "send_lock")
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.send_lock = threading.Lock()
+
+    def send(self, payload: bytes) -> None:
+        with self.send_lock:
+            send_frame(self.sock, payload)
+
+    def drop(self) -> None:
+        """Close the connection; shutdown() first so the thread blocked reading it wakes up."""
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class MoveRelay:
+    """Forwards frames between the two players of a match over persistent TCP connections.
+
+    A player connects once per match and sends a JSON hello as the first
+    frame: {"username": ..., "code": ...}. ``authorize(code, username)``
+    returns the opponent (None refuses the connection); the relay answers
+    {"type": "welcome", "opponent": ..., "opponent_connected": ...} or
+    {"type": "error", "error": ...}. Every later frame is forwarded as is to
+    the opponent's connection for the same code, or kept (up to ``backlog``
+    frames) until the opponent connects. Forwarding is two dict lookups and a
+    send: it does not depend on how many players are registered.
+    """
+
+    def __init__(self, authorize: Callable[[str, str], Optional[str]], backlog: int = 64):
+        self.authorize = authorize
+        self.backlog = backlog
+        self.port: Optional[int] = None
+        self.forwarded = 0
+        self.queued = 0  # Frames kept for an opponent not connected yet
+        self._peers: Dict[Tuple[str, str], Peer] = {}  # {(code, username): connection}
+        self._pending: Dict[Tuple[str, str], Deque[bytes]] = {}  # {(code, username): frames waiting for them}
+        self._lock = threading.Lock()
+        self._listener: Optional[socket.socket] = None
+
+    def __len__(self) -> int:
+        return len(self._peers)
+
+    def start(self, host: str = "0.0.0.0", port: int = 0) -> int:
+        """Listen on ``port`` (0 picks one) in a background thread; returns the port."""
+        listener = socket.create_server((host, port), backlog=1024)
+        self._listener = listener
+        self.port = listener.getsockname()[1]
+        threading.Thread(target=self._accept_loop, args=(listener,), name="relay", daemon=True).start()
+        return self.port
+
+    def close(self) -> None:
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        with self._lock:
+            peers = list(self._peers.values())
+            self._peers.clear()
+            self._pending.clear()
+        for peer in peers:
+            peer.drop()
+
+    def close_match(self, code: str, usernames: Iterable[str]) -> None:
+        """Disconnect the players of a finished match and drop what was kept for them."""
+        with self._lock:
+            peers = [self._peers.pop((code, name), None) for name in usernames]
+            for name in usernames:
+                self._pending.pop((code, name), None)
+        for peer in peers:
+            if peer is not None:
+                peer.drop()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            pending = sum(len(frames) for frames in self._pending.values())
+        return {"connections": len(self._peers), "forwarded": self.forwarded, "queued": self.queued, "pending": pending}
+
+    def forward(self, code: str, to: str, payload: bytes) -> None:
+        key = (code, to)
+        with self._lock:
+            peer = self._peers.get(key)
+            if peer is None:
+                self._pending.setdefault(key, deque(maxlen=self.backlog)).append(payload)
+                self.queued += 1
+                return
+            self.forwarded += 1  # Counted before the opponent can see the frame
+        try:
+            peer.send(payload)
+        except OSError:
+            # The opponent's own thread notices the broken connection and unregisters it
+            with self._lock:
+                self._pending.setdefault(key, deque(maxlen=self.backlog)).append(payload)
+                self.forwarded -= 1
+                self.queued += 1
+
+    # === CONNECTIONS ===
+
+    def _accept_loop(self, listener: socket.socket) -> None:
+        while True:
+            try:
+                sock, _ = listener.accept()
+            except OSError:
+                return  # Closed
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            threading.Thread(target=self._serve, args=(sock,), name="relay-peer", daemon=True).start()
+
+    def _serve(self, sock: socket.socket) -> None:
+        peer = Peer(sock)
+        key = None
+        try:
+            sock.settimeout(10)  # For the hello only
+            hello = self._hello(recv_frame(sock))
+            if isinstance(hello, str):
+                peer.send(json.dumps({"type": "error", "error": hello}).encode())
+                return
+            code, username, opponent = hello
+            sock.settimeout(None)
+
+            key = (code, username)
+            with self._lock:
+                replaced = self._peers.get(key)
+                self._peers[key] = peer
+                backlog = self._pending.pop(key, ())
+                opponent_connected = (code, opponent) in self._peers
+            if replaced is not None:
+                replaced.drop()  # A reconnect takes over from the old connection
+            peer.send(json.dumps({"type": "welcome", "code": code, "opponent": opponent,
+                                  "opponent_connected": opponent_connected}).encode())
+            for payload in backlog:
+                peer.send(payload)
+
+            while True:
+                payload = recv_frame(sock)
+                if payload is None:
+                    return
+                self.forward(code, opponent, payload)
+        except (OSError, ValueError):
+            return
+        finally:
+            if key is not None:
+                with self._lock:
+                    if self._peers.get(key) is peer:
+                        del self._peers[key]
+            sock.close()
+
+    def _hello(self, payload: Optional[bytes]):
+        """(code, username, opponent) from a hello frame, or the error to send back."""
+        try:
+            hello = json.loads(payload) if payload else None
+        except ValueError:
+            hello = None
+        if not isinstance(hello, dict) or not hello.get("username") or not hello.get("code"):
+            return "Expected a hello frame: {\"username\": ..., \"code\": ...}"
+        code, username = str(hello["code"]), str(hello["username"])
+        opponent = self.authorize(code, username)
+        if opponent is None:
+            return f"{username} is not playing an active match with code {code}"
+        return code, username, opponent
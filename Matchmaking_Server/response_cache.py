@@ -0,0 +1,35 @@
+from typing import Any, Dict, Hashable, Optional, Tuple
+import hashlib
+
+
+class ResponseCache:
+    """Serialized response bodies, each kept with the collection versions it was built from.
+
+    A body is served again as long as the versions it was built from are
+    the current ones; its ETag is a hash of the bytes, so it is strong and
+    the same in every worker and across restarts.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._entries: Dict[Hashable, Tuple[Any, bytes, str]] = {}  # {key: (versions, body, etag)}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, versions: Any) -> Optional[Tuple[bytes, str]]:
+        """(body, etag) cached for ``key`` at exactly ``versions``, if any."""
+        entry = self._entries.get(key) if self.enabled else None
+        if entry is None or entry[0] != versions:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, key: Hashable, versions: Any, body: bytes) -> Tuple[bytes, str]:
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        if self.enabled:
+            self._entries[key] = (versions, body, etag)
+        return body, etag
+
+    def stats(self) -> Dict[str, int]:
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
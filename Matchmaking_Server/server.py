@@ -1,22 +1,562 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from contextlib import contextmanager
 from datetime import datetime, timezone
-from bracket_generator import generate_bracket
+from bracket_generator import Bracket
+from tournament_formats import FORMATS, build_format, load_format
+from match_store import MatchStore, WaitingMatches
+from stats import Leaderboard
+from events import EventBroker
+from changelog import ChangeLog
+from journal import Journal
+from matchmaking import MatchQueue, Ratings
+from leases import Leases
+from ratelimit import RateLimiter
+from response_cache import ResponseCache
+from metrics import RequestMetrics, family
+from profiler import RequestProfiler
+from relay import MoveRelay
+from concurrency import LockSet
+from sqlite_store import (SqliteDatabase, SqliteDict, SqliteEventBroker, SqliteLeaderboard, SqliteLeases,
+                          SqliteMatchQueue, SqliteMatchStore, SqlitePlayers, SqliteWaitingMatches)
+import functools
+import hmac
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
 
 app = Flask(__name__)
 
 # === DATA STORES ===
 
 players = {}  # {username: {'ip': ..., 'port': ..., 'joined': ...}}
-scores = {}  # {username: score}
-matches_history = []  # List of {player1, player2, code, timestamp, winner, duration}
+leaderboard = Leaderboard()  # {username: score}, ranked on demand
+match_store = MatchStore()  # Indexed {player1, player2, code, timestamp, winner, duration} records
+changes = ChangeLog()  # Recent changes to matches, waiting codes and scores, for ?since= reads
+match_store.changes = changes
 pending_requests = {}  # {to_username: {'from': ..., 'code': ...}}
-waiting_matches = {}  # {code: {'creator': username, 'created_at': timestamp}}
+waiting_matches = WaitingMatches()  # {code: {'creator': username, 'created_at': timestamp}}
+ratings = Ratings()  # Elo rating per player, updated by every result
+match_queue = MatchQueue()  # Players waiting in /enqueue, sorted by rating
+leases = Leases()  # Expiry of players ("player"), match codes ("waiting") and requests ("request"), see LEASES
 
 tournament_state = {
     "started": False,
-    "bracket": None,
-    "started_at": None
+    "bracket": None,  # Bracket, RoundRobin or Swiss, see tournament_formats
+    "started_at": None,
+    "auto_dispatch": False
 }
+bracket_preview = {"seed": None, "players": None, "data": None}  # Pre-start bracket, rebuilt when the player set changes
+
+events = EventBroker()  # Push channel behind /events and /events/poll
+journal = None  # Journal when persistence is enabled, see init_persistence()
+db = None  # SqliteDatabase when the SQLite backend is selected, see init_sqlite()
+tournament_rev = 0  # Revision of the tournament saved in db, see save_tournament()
+
+# One lock per collection above. Flask serves requests on several threads:
+# every mutation and every multi-step read holds the locks of the collections
+# it touches, so handlers never see a collection changing under them.
+state_locks = LockSet(("players", "scores", "matches", "requests", "waiting", "queue", "tournament", "leases"))
+state_versions = dict.fromkeys(state_locks.locks, 0)  # Bumped by commit() for every collection an operation touches
+
+@contextmanager
+def hold(*names, write=False):
+    """Take the locks of the collections ``names``; ``write`` for blocks that commit.
+
+    With the shared SQLite store, other worker processes change the same data:
+    the block then also runs in one database transaction (holding the database
+    write lock when ``write``) and starts from the tournament they last saved.
+    """
+    global tournament_rev
+    with state_locks.hold(*names):
+        if db is None or not db.shared:
+            yield
+            return
+        try:
+            with db.transaction(write):
+                if "tournament" in names:
+                    sync_tournament()
+                yield
+        except BaseException:
+            tournament_rev = None  # The in-memory bracket may hold rolled back changes
+            raise
+
+# === STATE CHANGES ===
+# Every mutation goes through commit(): it is written to the journal first,
+# then applied. Replaying the journal through the same apply_* functions at
+# startup rebuilds the same state, so anything non-deterministic (clock,
+# client address, bracket seed) is decided by the route and passed in.
+
+def apply_join(username, ip, port, joined):
+    players[username] = {
+        "ip": ip,
+        "port": port,
+        "joined": joined
+    }
+    leaderboard.add_player(username)
+    changes.record("score", username, leaderboard.get(username))
+
+def apply_propose(from_player, to_player, code):
+    pending_requests[to_player] = {
+        "from": from_player,
+        "code": code or None
+    }
+    return pending_requests[to_player]
+
+def apply_take_request(username):
+    return pending_requests.pop(username, None)
+
+def apply_add_match(player1, player2, code, timestamp):
+    return match_store.add(player1, player2, code, timestamp)
+
+def apply_create_waiting(code, creator, created_at):
+    waiting_matches[code] = {
+        "creator": creator,
+        "created_at": created_at
+    }
+    changes.record("waiting", code, {"creator": creator, "created_at": created_at})
+
+def apply_expire_waiting(code):
+    changes.record("waiting", code, None)
+    return waiting_matches.pop(code, None)
+
+def apply_join_waiting(code, username, timestamp):
+    creator = waiting_matches.pop(code)["creator"]
+    changes.record("waiting", code, None)
+    match_store.add(creator, username, code, timestamp)
+    return creator
+
+def apply_start_tournament(player_names, seed, started_at, format="single_elimination", rounds=None,
+                           auto_dispatch=False):
+    global tournament_state
+    tournament_state = {
+        "started": True,
+        "bracket": build_format(format, player_names, seed, rounds),
+        "started_at": started_at,
+        "auto_dispatch": auto_dispatch
+    }
+    save_tournament()
+
+def apply_reset_tournament(preview_seed=None):
+    global tournament_state
+    tournament_state = {
+        "started": False,
+        "bracket": None,
+        "started_at": None,
+        "auto_dispatch": False
+    }
+    bracket_preview["seed"] = preview_seed
+    bracket_preview["data"] = None
+    save_tournament()
+
+def apply_result(winner, loser, duration):
+    """Returns the history match that was closed (if any) and whether the bracket advanced."""
+    changes.record("score", winner, leaderboard.add_points(winner))
+    ratings.record(winner, loser)
+    match = match_store.record_result(winner, duration)
+    advanced = False
+    if tournament_state["started"] and tournament_state["bracket"]:
+        advanced = tournament_state["bracket"].record_result(winner, loser) is not None
+        if advanced:
+            save_tournament()
+    return match, advanced
+
+def apply_expire(username):
+    """Release a player's presence (registration, request, queue slot, waiting codes), keeping their matches."""
+    if username not in players:
+        return False
+    del players[username]
+    pending_requests.pop(username, None)
+    match_queue.remove(username)
+    for code in waiting_matches.codes_of(username):
+        del waiting_matches[code]
+        changes.record("waiting", code, None)
+    return True
+
+def apply_disconnect(username):
+    if not apply_expire(username):
+        return False
+    match_store.remove_player(username)
+    return True
+
+def apply_batch(ops):
+    """Several [op, args] pairs applied in order as one journal entry, for the /batch routes."""
+    return [APPLY[op](**args) for op, args in ops]
+
+# Collections each operation touches ("scores" also covers ratings, "tournament" bracket_preview)
+OP_LOCKS = {
+    "join": ("players", "scores", "tournament"),
+    "propose": ("requests",),
+    "take_request": ("requests",),
+    "add_match": ("matches",),
+    "create_waiting": ("waiting",),
+    "expire_waiting": ("waiting",),
+    "join_waiting": ("matches", "waiting"),
+    "start_tournament": ("tournament",),
+    "reset_tournament": ("tournament",),
+    "result": ("scores", "matches", "tournament"),
+    "disconnect": ("players", "matches", "requests", "waiting", "queue", "tournament"),
+    "expire": ("players", "requests", "waiting", "queue", "tournament"),
+    "batch": tuple(state_locks.locks),
+}
+
+APPLY = {
+    "join": apply_join,
+    "propose": apply_propose,
+    "take_request": apply_take_request,
+    "add_match": apply_add_match,
+    "create_waiting": apply_create_waiting,
+    "expire_waiting": apply_expire_waiting,
+    "join_waiting": apply_join_waiting,
+    "start_tournament": apply_start_tournament,
+    "reset_tournament": apply_reset_tournament,
+    "result": apply_result,
+    "disconnect": apply_disconnect,
+    "expire": apply_expire,
+    "batch": apply_batch,
+}
+
+def commit(op, **args):
+    """Journal then apply one state change, and return what the apply_* function returns.
+
+    Both happen under the operation's locks, so the journal sees conflicting
+    operations in the order they were applied. Routes that check state before
+    committing hold those locks (or more) around the check and the commit.
+    """
+    with hold(*OP_LOCKS[op], write=True):
+        if journal:
+            journal.append(op, args)
+        try:
+            return APPLY[op](**args)
+        finally:
+            for name in OP_LOCKS[op]:
+                state_versions[name] += 1
+
+@app.after_request
+def take_snapshot(response):
+    # Runs once the route released its locks: a snapshot needs all of them
+    if journal and journal.should_snapshot():
+        with state_locks.hold_all():
+            if journal.should_snapshot():
+                journal.snapshot(snapshot_state())
+    return response
+
+def tournament_to_state():
+    bracket = tournament_state["bracket"]
+    return {
+        "started": tournament_state["started"],
+        "started_at": tournament_state["started_at"],
+        "bracket": bracket.to_state() if bracket else None,
+        "auto_dispatch": tournament_state["auto_dispatch"],
+        "preview_seed": bracket_preview["seed"]
+    }
+
+def tournament_from_state(state):
+    return {
+        "started": state["started"],
+        "bracket": load_format(state["bracket"]) if state["bracket"] else None,
+        "started_at": state["started_at"],
+        "auto_dispatch": state.get("auto_dispatch", False)
+    }
+
+def load_tournament(state):
+    global tournament_state
+    tournament_state = tournament_from_state(state) if state else {
+        "started": False, "bracket": None, "started_at": None, "auto_dispatch": False}
+    bracket_preview["seed"] = state.get("preview_seed") if state else None
+    bracket_preview["data"] = None
+
+def save_tournament():
+    """With the SQLite backend the tournament is stored there; in memory it is journaled instead."""
+    global tournament_rev
+    if db is not None:
+        saved = SqliteDict(db, "tournament")
+        tournament_rev = saved.get("rev", 0) + 1
+        saved["state"] = tournament_to_state()
+        saved["rev"] = tournament_rev
+
+def sync_tournament():
+    """Reload the tournament if another worker saved a newer revision (shared store)."""
+    global tournament_rev
+    saved = SqliteDict(db, "tournament")
+    rev = saved.get("rev", 0)
+    if rev != tournament_rev:
+        load_tournament(saved.get("state"))
+        tournament_rev = rev
+
+def snapshot_state():
+    return {
+        "players": players,
+        "scores": leaderboard.items(),
+        "ratings": ratings.items(),
+        "matches": match_store.history(),
+        "pending_requests": pending_requests,
+        "waiting_matches": dict(waiting_matches),
+        "tournament": tournament_to_state()
+    }
+
+def restore_state(state):
+    global leaderboard, ratings, match_store
+    players.clear()
+    players.update(state["players"])
+    leaderboard = Leaderboard()
+    for username, score in state["scores"]:
+        leaderboard.add_player(username)
+        if score:
+            leaderboard.add_points(username, score)
+    ratings = Ratings(dict(state.get("ratings", ())))
+    match_store = MatchStore()
+    for match in state["matches"]:
+        match_store.restore(match)
+    match_store.changes = changes
+    pending_requests.clear()
+    pending_requests.update(state["pending_requests"])
+    waiting_matches.clear()
+    waiting_matches.update(state["waiting_matches"])
+    load_tournament(state["tournament"])
+
+def init_persistence(data_dir):
+    """Recover state from ``data_dir`` and journal every later change there."""
+    global journal
+    journal = Journal(data_dir)
+    snapshot_seq, replayed = journal.recover(restore_state, lambda op, args: APPLY[op](**args))
+    journal.open()
+    grant_leases(time.time())
+    print(f"[JOURNAL] Recovered snapshot #{snapshot_seq} + {replayed} ops from {data_dir}")
+
+def init_sqlite(path, shared=False):
+    """Keep players, scores, matches, requests and the tournament in the SQLite database at ``path``.
+
+    SQLite's own write-ahead log makes the data durable, so the journal is not used.
+    With ``shared``, several worker processes (e.g. ``gunicorn -w 4 server:app``)
+    open the same file: writes commit immediately, check-and-commit blocks run
+    in write transactions, and events go through the database so every worker
+    pushes the same ones.
+    """
+    global db, players, leaderboard, ratings, match_store, pending_requests, waiting_matches, match_queue, leases, events, tournament_rev
+    db = SqliteDatabase(path, shared=shared)
+    players = SqlitePlayers(db)
+    leaderboard = SqliteLeaderboard(db)
+    ratings = Ratings(SqliteDict(db, "ratings"))
+    match_queue = SqliteMatchQueue(db)
+    match_store = SqliteMatchStore(db)
+    if not shared:
+        match_store.changes = changes  # Other workers' changes would be missing from this log: shared reads get everything
+    pending_requests = SqliteDict(db, "pending_requests")
+    waiting_matches = SqliteWaitingMatches(db)
+    if shared:
+        leases = SqliteLeases(db)
+        events = SqliteEventBroker(db)
+        # Fix the preview seed up front so every worker previews the same bracket
+        with db.transaction(write=True):
+            if "state" not in SqliteDict(db, "tournament"):
+                bracket_preview["seed"] = random.randrange(2 ** 32)
+                save_tournament()
+    saved = SqliteDict(db, "tournament")
+    load_tournament(saved.get("state"))
+    tournament_rev = saved.get("rev", 0)
+    with hold(*state_locks.locks, write=True):
+        grant_leases(time.time())
+    print(f"[SQLITE] Using {path}{' (shared)' if shared else ''}: {len(players)} players, {len(match_store)} matches")
+
+# === REQUEST CHECKS ===
+# Shared by the single routes and their /batch variants.
+
+class BadRequest(Exception):
+    """A payload, or one item of a batch, that cannot be applied."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+def join_args(data, ip):
+    if not isinstance(data, dict) or not data.get("username") or not data.get("port"):
+        raise BadRequest('Missing username or port')
+    return {"username": data["username"], "ip": ip, "port": data["port"], "joined": datetime.now().isoformat()}
+
+def result_args(data):
+    if not isinstance(data, dict) or not data.get("winner") or not data.get("loser"):
+        raise BadRequest('Missing result data')
+    duration = data.get("duration")
+    if not isinstance(duration, (int, float)):
+        duration = None
+    return {"winner": data["winner"], "loser": data["loser"], "duration": duration}
+
+def tournament_match_args(data):
+    """Needs the "tournament" lock held."""
+    if not isinstance(data, dict) or not data.get("player1") or not data.get("player2") or data.get("match_id") is None:
+        raise BadRequest("Missing player names or match ID")
+    p1, p2, match_id = data["player1"], data["player2"], data["match_id"]
+    bracket = tournament_state["bracket"]
+    if not bracket:
+        raise BadRequest("No tournament in progress")
+    if not isinstance(match_id, int) or not 1 <= match_id <= len(bracket):
+        raise BadRequest("Match ID not found in bracket", 404)
+    if bracket.results[match_id - 1]:
+        raise BadRequest("Match already completed")
+    return {"player1": p1, "player2": p2, "code": f"{p1}_{p2}_{match_id}", "timestamp": datetime.now().strftime("%d/%m/%Y %H:%M")}
+
+def commit_items(op, items, check):
+    """Check every item of a batch, then apply the valid ones in one journaled operation.
+
+    Returns (args, outcome) per item, in order: outcome is the BadRequest of a
+    rejected item, or what the apply_* function returned.
+    """
+    if not isinstance(items, list):
+        raise BadRequest("Expected a JSON array")
+    with hold(*OP_LOCKS["batch"], write=True):
+        checked = []
+        for item in items:
+            try:
+                checked.append((check(item), None))
+            except BadRequest as e:
+                checked.append((None, e))
+        ops = [[op, args] for args, error in checked if error is None]
+        outcomes = iter(commit("batch", ops=ops) if ops else ())
+    return [(args, error or next(outcomes)) for args, error in checked]
+
+def batch_reply(replies):
+    """Per-item HTTP statuses and bodies of a /batch route."""
+    results = []
+    for reply in replies:
+        if isinstance(reply, BadRequest):
+            results.append({"http_status": reply.status, "error": str(reply)})
+        else:
+            results.append({"http_status": 200, **reply})
+    applied = sum(r["http_status"] == 200 for r in results)
+    return jsonify({"results": results, "applied": applied, "failed": len(results) - applied})
+
+# === RATE LIMITS ===
+# Token buckets per route class and per client (the username a request acts
+# for, when it names one, and the client address). The address also has a
+# bucket of its own, ten clients' worth, that every request from it is
+# charged to: names are not authenticated, so a new one per request only
+# gets a client bucket, never a fresh budget. A client over its budget gets
+# 429 with Retry-After instead of taking threads and locks from others.
+# BATTLESHIP_RATE_LIMITS="read=20/40,write=10/20,batch=5/20" sets rate/burst
+# per class; "off" disables the limiter. Unlisted routes are not limited.
+# Behind a reverse proxy, BATTLESHIP_TRUSTED_PROXIES="127.0.0.1" (comma
+# separated) lists the proxies whose X-Forwarded-For is believed; from any
+# other address the header is ignored.
+
+DEFAULT_RATE_LIMITS = "read=20/40,write=10/20,batch=5/20"
+limiter = RateLimiter.from_spec(os.environ.get("BATTLESHIP_RATE_LIMITS", DEFAULT_RATE_LIMITS))
+TRUSTED_PROXIES = frozenset(filter(None, (
+    address.strip() for address in os.environ.get("BATTLESHIP_TRUSTED_PROXIES", "").split(","))))
+
+ROUTE_CLASSES = {
+    **dict.fromkeys(("get_admin_data", "get_players", "check_requests", "match_status", "dynamic_bracket_data",
+                     "tournament_status", "scores_history", "get_stats", "get_leaderboard", "get_rank", "get_player",
+                     "pending_matches", "queue_stats", "heartbeat", "relay_info"), "read"),
+    **dict.fromkeys(("auto_join", "propose_match", "confirm_match", "start_tournament_match", "create_match",
+                     "join_match", "start_tournament", "reset_tournament", "match_result", "disconnect",
+                     "enqueue", "dequeue"), "write"),
+    **dict.fromkeys(("auto_join_batch", "start_tournament_match_batch", "match_result_batch"), "batch"),
+}
+
+@app.before_request
+def rate_limit():
+    route_class = ROUTE_CLASSES.get(request.endpoint)
+    if limiter is None or route_class is None:
+        return None
+    address = client_address()
+    retry_after = limiter.acquire(route_class, client_key(address), time.monotonic(), address)
+    if not retry_after:
+        return None
+    response = jsonify({'error': 'Too many requests', 'retry_after': round(retry_after, 3)})
+    response.status_code = 429
+    response.headers["Retry-After"] = str(math.ceil(retry_after))
+    return response
+
+def client_key(address):
+    """(username the request acts for, ``address``), or None if it names nobody."""
+    username = (request.view_args or {}).get("username") or request.args.get("username")
+    if username is None and request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            username = data.get("username") or data.get("player_id") or data.get("from")
+    return (username, address) if username is not None else None
+
+def client_address():
+    """The remote address, or for a trusted proxy the last X-Forwarded-For hop that is not a proxy."""
+    address = request.remote_addr
+    if address in TRUSTED_PROXIES:
+        hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+        for address in reversed(hops or [address]):
+            if address not in TRUSTED_PROXIES:
+                break
+    return address
+
+# === RESPONSE CACHE ===
+# Read routes polled by the pages keep their serialized JSON with the versions
+# of the collections it was built from, and serve it again until commit()
+# bumps one of them. The ETag lets pollers revalidate with a bodiless 304.
+
+response_cache = ResponseCache()
+
+def collection_versions(collections):
+    """Current versions of ``collections``; with the shared store, also the database's, which other workers change."""
+    versions = tuple(state_versions[name] for name in collections)
+    return (versions, db.revision()) if db is not None and db.shared else versions
+
+def cached(*collections):
+    """Serve the view from response_cache while ``collections`` are unchanged (errors are not cached)."""
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(**kwargs):
+            if request.args:
+                return view(**kwargs)  # Only argument-less reads are cached, so entries stay one per route
+            key = request.endpoint
+            # Versions are read before the view runs: a body is never older than its versions
+            versions = collection_versions(collections)
+            entry = response_cache.get(key, versions)
+            if entry is None:
+                response = app.make_response(view(**kwargs))
+                if response.status_code != 200:
+                    return response
+                entry = response_cache.put(key, versions, response.get_data())
+            body, etag = entry
+            response = Response(status=304) if request.if_none_match.contains(etag) else \
+                Response(body, mimetype="application/json")
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+        return wrapper
+    return decorate
+
+# === DELTA FEED ===
+# /admin_data?since=<version> and /scores_history?since=<version> return what
+# changed after that version, from the change log, instead of every match:
+#   {"version", "full", "matches": [{"id", ...match}], "matches_removed": [ids],
+#    "waiting": {code: info}, "waiting_removed": [codes], "scores": [[username, score]]}
+# With "full": true (first read, version older than the log, restart, shared
+# store) the lists hold everything and the client starts over from them.
+
+def delta_feed(since, kinds):
+    """Needs the locks of the collections behind ``kinds`` held."""
+    changed = None if db is not None and db.shared else changes.since(since, kinds)
+    full = changed is None
+    if full:
+        everything = {
+            "match": lambda: dict(match_store.items()),
+            "waiting": lambda: dict(waiting_matches.items()),
+            "score": lambda: dict(leaderboard.items())
+        }
+        changed = {kind: everything[kind]() for kind in kinds}
+
+    feed = {"version": changes.version, "full": full}
+    if "match" in changed:
+        feed["matches"] = [{"id": match_id, **match} for match_id, match in changed["match"].items() if match]
+        feed["matches_removed"] = [match_id for match_id, match in changed["match"].items() if not match]
+    if "waiting" in changed:
+        feed["waiting"] = {code: info for code, info in changed["waiting"].items() if info}
+        feed["waiting_removed"] = [code for code, info in changed["waiting"].items() if not info]
+    if "score" in changed:
+        feed["scores"] = [[username, score] for username, score in changed["score"].items() if score is not None]
+    return feed
 
 # === FRONTEND ROUTES ===
 
@@ -29,45 +569,84 @@ def admin_panel():
     return render_template('admin.html')
 
 @app.route('/admin_data')
+@cached("scores", "matches", "waiting")
 def get_admin_data():
-    active = {
-        m["code"]: {"player1": m["player1"], "player2": m["player2"]}
-        for m in matches_history if m.get("winner") is None
-    }
-    return jsonify({
-        "waiting": waiting_matches,
-        "active": active,
-        "history": matches_history,
-        "scores": sorted(scores.items(), key=lambda x: -x[1])
-    })
+    since = request.args.get("since", type=int)
+    with hold("scores", "matches", "waiting"):
+        if since is not None:
+            return jsonify(delta_feed(since, ("match", "waiting", "score")))
+        active = {
+            m["code"]: {"player1": m["player1"], "player2": m["player2"]}
+            for m in match_store.active()
+        }
+        return jsonify({
+            "waiting": dict(waiting_matches),
+            "active": active,
+            "history": match_store.history(),
+            "scores": leaderboard.ranked()
+        })
 
 # === PLAYER CONNECTION ===
 
 @app.route('/auto_join', methods=['POST'])
 def auto_join():
-    data = request.json
-    username = data.get("username")
-    port = data.get("port")
+    try:
+        args = join_args(request.json, request.remote_addr)
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), e.status
+
+    commit("join", **args)
+    touch(args["username"])
+    announce_join(args)
+    dispatch_ready()
+    return jsonify({'status': 'connected', 'player_id': args["username"]})
+
+@app.route('/auto_join/batch', methods=['POST'])
+def auto_join_batch():
+    """Register an array of {"username", "port"} players at once."""
     ip = request.remote_addr
-
-    if not username or not port:
-        return jsonify({'error': 'Missing username or port'}), 400
-
-    players[username] = {
-        "ip": ip,
-        "port": port,
-        "joined": datetime.now().isoformat()
-    }
-    scores.setdefault(username, 0)
-
-    print(f"[JOIN] {username} connected from {ip}:{port}")
-    return jsonify({'status': 'connected', 'player_id': username})
+    try:
+        checked = commit_items("join", request.json, lambda data: join_args(data, ip))
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), e.status
+
+    replies = []
+    for args, outcome in checked:
+        if isinstance(outcome, BadRequest):
+            replies.append(outcome)
+            continue
+        announce_join(args)
+        replies.append({'status': 'connected', 'player_id': args["username"]})
+    touch(*(args["username"] for args, outcome in checked if not isinstance(outcome, BadRequest)))
+    dispatch_ready()
+    return batch_reply(replies)
+
+def announce_join(args):
+    events.publish("player_change", {"username": args["username"], "status": "connected"})
+    print(f"[JOIN] {args['username']} connected from {args['ip']}:{args['port']}")
 
 @app.route('/players')
+@cached("players")
 def get_players():
-    return jsonify([
-        {"username": u, **info} for u, info in players.items()
-    ])
+    with hold("players"):
+        return jsonify([
+            {"username": u, **info} for u, info in players.items()
+        ])
+
+@app.route('/players/<username>')
+def get_player(username):
+    with hold("players"):
+        info = players.get(username)
+        if info is None:
+            return jsonify({'error': 'Player not found'}), 404
+        return jsonify({"username": username, **info})
+
+def match_addresses(*usernames):
+    """{username: {"ip", "port"}} for the players of a new match (None if not registered),
+    so they can reach each other without looking anything up per move."""
+    with hold("players"):
+        infos = {u: players.get(u) for u in usernames}
+    return {u: {"ip": info["ip"], "port": info["port"]} if info else None for u, info in infos.items()}
 
 # === MATCHMAKING REQUESTS ===
 
@@ -80,19 +659,20 @@ def propose_match():
 
     if not from_player or not to_player:
         return jsonify({'error': 'Missing player names'}), 400
-    if to_player not in players:
-        return jsonify({'error': 'Target player not found'}), 404
-
-    pending_requests[to_player] = {
-        "from": from_player,
-        "code": code or None
-    }
+    with hold("players", "requests", "leases", write=True):
+        if to_player not in players:
+            return jsonify({'error': 'Target player not found'}), 404
+        req = commit("propose", from_player=from_player, to_player=to_player, code=code)
+        leases.renew("request", to_player, time.time() + REQUEST_TTL)
+    events.publish("match_request", req, to=[to_player])
 
     return jsonify({'status': 'request sent'})
 
 @app.route('/check_requests/<username>')
 def check_requests(username):
-    req = pending_requests.pop(username, None)
+    with hold("requests", "leases", write=True):
+        req = commit("take_request", username=username) if username in pending_requests else None
+        leases.renew("player", username, time.time() + PLAYER_TTL)  # Clients poll this route: it counts as a heartbeat
     return jsonify(req or {})
 
 @app.route('/confirm_match', methods=['POST'])
@@ -102,46 +682,46 @@ def confirm_match():
     p2 = data.get("player2")
     code = data.get("code") or f"{p1}_{p2}_{int(datetime.now().timestamp())}"
 
-    matches_history.append({
-        "player1": p1,
-        "player2": p2,
-        "timestamp": datetime.now().strftime("%d/%m/%Y %H:%M"),
-        "winner": None,
-        "code": code
-    })
+    commit("add_match", player1=p1, player2=p2, code=code, timestamp=datetime.now().strftime("%d/%m/%Y %H:%M"))
+    addresses = match_addresses(p1, p2)
+    events.publish("match_start", {"code": code, "player1": p1, "player2": p2, "addresses": addresses}, to=[p1, p2])
 
-    return jsonify({'status': 'match_started', 'match_code': code})
+    return jsonify({'status': 'match_started', 'match_code': code, 'addresses': addresses})
 
 @app.route('/start_tournament_match', methods=['POST'])
 def start_tournament_match():
     data = request.json
-    p1 = data.get("player1")
-    p2 = data.get("player2")
-    match_id = data.get("match_id")
-
-    if not p1 or not p2 or match_id is None:
-        return jsonify({"error": "Missing player names or match ID"}), 400
-
-    if not tournament_state["bracket"]:
-        return jsonify({"error": "No tournament in progress"}), 400
-
-    match = next((m for m in tournament_state["bracket"]["matches"] if m["id"] == match_id), None)
-    if not match:
-        return jsonify({"error": "Match ID not found in bracket"}), 404
-
-    if match.get("opponent1", {}).get("result") == "win" or match.get("opponent2", {}).get("result") == "win":
-        return jsonify({"error": "Match already completed"}), 400
-
-    match_code = f"{p1}_{p2}_{match_id}"
-    matches_history.append({
-        "player1": p1,
-        "player2": p2,
-        "timestamp": datetime.now().strftime("%d/%m/%Y %H:%M"),
-        "winner": None,
-        "code": match_code
-    })
-
-    return jsonify({"status": "match_started", "code": match_code})
+    with hold("matches", "tournament", write=True):
+        try:
+            args = tournament_match_args(data)
+        except BadRequest as e:
+            return jsonify({"error": str(e)}), e.status
+        commit("add_match", **args)
+
+    announce_tournament_match(args, data["match_id"])
+    return jsonify({"status": "match_started", "code": args["code"]})
+
+@app.route('/start_tournament_match/batch', methods=['POST'])
+def start_tournament_match_batch():
+    """Start an array of {"player1", "player2", "match_id"} bracket matches at once."""
+    items = request.json
+    try:
+        checked = commit_items("add_match", items, tournament_match_args)
+    except BadRequest as e:
+        return jsonify({"error": str(e)}), e.status
+
+    replies = []
+    for item, (args, outcome) in zip(items, checked):
+        if isinstance(outcome, BadRequest):
+            replies.append(outcome)
+            continue
+        announce_tournament_match(args, item["match_id"])
+        replies.append({"status": "match_started", "code": args["code"]})
+    return batch_reply(replies)
+
+def announce_tournament_match(args, match_id):
+    p1, p2 = args["player1"], args["player2"]
+    events.publish("match_start", {"code": args["code"], "player1": p1, "player2": p2, "match_id": match_id}, to=[p1, p2])
 
 # === MATCHES WITH CODES ===
 
@@ -153,13 +733,12 @@ def create_match():
 
     if not username or not code:
         return jsonify({'error': 'Missing data'}), 400
-    if code in waiting_matches:
-        return jsonify({'error': 'Code already used'}), 400
-
-    waiting_matches[code] = {
-        "creator": username,
-        "created_at": datetime.now(timezone.utc).isoformat()
-    }
+    with hold("waiting", "leases", write=True):
+        if code in waiting_matches:
+            return jsonify({'error': 'Code already used'}), 400
+        commit("create_waiting", code=code, creator=username, created_at=datetime.now(timezone.utc).isoformat())
+        leases.renew("waiting", code, time.time() + WAITING_TTL)
+    events.publish("match_waiting", {"code": code, "creator": username})
 
     return jsonify({'status': 'waiting', 'code': code})
 
@@ -169,20 +748,15 @@ def join_match():
     username = data.get("player_id")
     code = data.get("code")
 
-    if code not in waiting_matches:
-        return jsonify({'error': 'Match not found'}), 404
-
-    creator = waiting_matches.pop(code)["creator"]
-
-    matches_history.append({
-        "player1": creator,
-        "player2": username,
-        "timestamp": datetime.now().strftime("%d/%m/%Y %H:%M"),
-        "winner": None,
-        "code": code
-    })
+    with hold(*OP_LOCKS["join_waiting"], write=True):
+        if code not in waiting_matches:
+            return jsonify({'error': 'Match not found'}), 404
+        creator = commit("join_waiting", code=code, username=username, timestamp=datetime.now().strftime("%d/%m/%Y %H:%M"))
+    addresses = match_addresses(creator, username)
+    events.publish("match_start", {"code": code, "player1": creator, "player2": username, "addresses": addresses},
+                   to=[creator, username])
 
-    return jsonify({'status': 'match_started', 'players': [creator, username]})
+    return jsonify({'status': 'match_started', 'players': [creator, username], 'addresses': addresses})
 
 @app.route('/match_status')
 def match_status():
@@ -190,173 +764,633 @@ def match_status():
     if not code:
         return jsonify({'error': 'Missing code'}), 400
 
-    for match in matches_history:
-        if match.get("code") == code and match.get("winner") is None:
-            return jsonify({"status": "active", "opponent": match.get("player2")})
+    with hold("matches"):
+        match = match_store.find_active(code)
+    if match:
+        return jsonify({"status": "active", "opponent": match.get("player2")})
     return jsonify({"status": "waiting"})
 
 # === TOURNAMENT ===
 
 @app.route('/bracket_data')
+@cached("players", "tournament")
 def dynamic_bracket_data():
-    if tournament_state["started"] and tournament_state["bracket"]:
-        return jsonify(tournament_state["bracket"])
+    with hold("players", "tournament"):
+        if tournament_state["started"] and tournament_state["bracket"]:
+            return jsonify(tournament_state["bracket"].to_dict())
 
-    current_players = list(players.keys())
-    if len(current_players) < 2:
-        return jsonify({"error": "Not enough players to start a tournament"}), 400
+        current_players = list(players.keys())
+        if len(current_players) < 2:
+            return jsonify({"error": "Not enough players to start a tournament"}), 400
 
-    return jsonify(generate_bracket(current_players))
+        if bracket_preview["data"] is None or bracket_preview["players"] != current_players:
+            bracket = Bracket.build(current_players, bracket_preview["seed"])
+            bracket_preview["seed"] = bracket.seed
+            bracket_preview["players"] = current_players
+            bracket_preview["data"] = bracket.to_dict()
+        return jsonify(bracket_preview["data"])
 
 @app.route('/start_tournament', methods=['POST'])
 def start_tournament():
-    global tournament_state
-
-    current_players = list(players.keys())
-    if len(current_players) < 2:
-        return jsonify({"error": "Not enough players"}), 400
-
-    bracket = generate_bracket(current_players)
-    tournament_state = {
-        "started": True,
-        "bracket": bracket,
-        "started_at": datetime.now().isoformat()
-    }
-
-    print(f"[TOURNAMENT] Started with {len(current_players)} players at {tournament_state['started_at']}")
-    return jsonify({"status": "tournament_started", "players": current_players})
+    """Optional JSON: {"format": "single_elimination" | "round_robin" | "swiss", "rounds": n (Swiss),
+    "auto_dispatch": true to start every match as soon as both players are free}."""
+    data = request.get_json(silent=True) or {}
+    kind = data.get("format", "single_elimination")
+    rounds = data.get("rounds")
+    if kind not in FORMATS:
+        return jsonify({"error": f"Unknown format, expected one of {', '.join(FORMATS)}"}), 400
+    if rounds is not None and (not isinstance(rounds, int) or isinstance(rounds, bool)):
+        return jsonify({"error": "rounds must be an integer"}), 400
+
+    with hold("players", "tournament", write=True):
+        current_players = list(players.keys())
+        if len(current_players) < 2:
+            return jsonify({"error": "Not enough players"}), 400
+        # More rounds than opponents would force Swiss rematches
+        if rounds is not None and not 1 <= rounds <= len(current_players) - 1:
+            return jsonify({"error": f"rounds must be between 1 and {len(current_players) - 1}"}), 400
+
+        # Reuse the preview seed so the launched bracket is the one players were shown
+        seed = bracket_preview["seed"]
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        commit("start_tournament", player_names=current_players, seed=seed, started_at=datetime.now().isoformat(),
+               format=kind, rounds=rounds, auto_dispatch=bool(data.get("auto_dispatch")))
+
+    events.publish("bracket_change", {"status": "started"}, to=current_players)
+    print(f"[TOURNAMENT] Started {kind} with {len(current_players)} players at {tournament_state['started_at']}")
+    dispatch_ready()
+    return jsonify({"status": "tournament_started", "players": current_players, "format": kind})
 
 @app.route('/tournament_status')
+@cached("players", "tournament")
 def tournament_status():
-    return jsonify({
-        "started": tournament_state["started"],
-        "started_at": tournament_state["started_at"],
-        "player_count": len(players),
-        "players": list(players.keys())
-    })
+    with hold("players", "tournament"):
+        bracket = tournament_state["bracket"]
+        return jsonify({
+            "started": tournament_state["started"],
+            "started_at": tournament_state["started_at"],
+            "format": bracket.kind if bracket else None,
+            "auto_dispatch": tournament_state["auto_dispatch"],
+            "player_count": len(players),
+            "players": list(players.keys())
+        })
 
 @app.route('/reset_tournament', methods=['POST'])
 def reset_tournament():
-    global tournament_state
-    tournament_state = {
-        "started": False,
-        "bracket": None,
-        "started_at": None
-    }
+    commit("reset_tournament", preview_seed=random.randrange(2 ** 32))
+    events.publish("bracket_change", {"status": "reset"})
     print("[TOURNAMENT] Reset")
     return jsonify({"status": "tournament_reset"})
 
+# With auto_dispatch, every tournament match whose two players are connected
+# and not in another match is started as soon as that becomes true: when the
+# tournament starts, when a result frees two players (and maybe opens the next
+# match) and when a player joins. The format picks which matches to start,
+# see ready() in bracket_generator and tournament_formats.
+
+def dispatch_ready():
+    """Start the tournament matches that are ready; returns how many were started."""
+    if not tournament_state["auto_dispatch"] and (db is None or not db.shared):
+        return 0  # Other workers may have started one in the shared store: check under the locks there
+    started = []
+    with hold("players", "matches", "tournament", write=True):
+        bracket = tournament_state["bracket"]
+        if not (tournament_state["started"] and tournament_state["auto_dispatch"] and bracket):
+            return 0
+        busy = {name for match in match_store.active() for name in (match["player1"], match["player2"])}
+        timestamp = datetime.now().strftime("%d/%m/%Y %H:%M")
+        for index in bracket.ready(name for name in players if name not in busy):
+            p1, p2 = bracket.opponents(index)
+            args = {"player1": p1, "player2": p2, "code": f"{p1}_{p2}_{index + 1}", "timestamp": timestamp}
+            commit("add_match", **args)
+            started.append((args, index + 1))
+    for args, match_id in started:
+        announce_tournament_match(args, match_id)
+    if started:
+        print(f"[TOURNAMENT] Dispatched {len(started)} match(es)")
+    return len(started)
+
 # === SCORES AND STATS ===
 
 @app.route('/match_result', methods=['POST'])
 def match_result():
-    data = request.json
-    winner = data.get("winner")
-    loser = data.get("loser")
-
-    if not winner or not loser:
-        return jsonify({'error': 'Missing result data'}), 400
-
-    scores[winner] = scores.get(winner, 0) + 1
-
-    for match in reversed(matches_history):
-        if match.get("winner") is None and winner in [match.get("player1"), match.get("player2")]:
-            match["winner"] = winner
-            break
-
-    if tournament_state["started"] and tournament_state["bracket"]:
-        matches = tournament_state["bracket"]["matches"]
-        current_match = None
-
-        for match in matches:
-            op1 = match.get("opponent1") or {}
-            op2 = match.get("opponent2") or {}
-
-            if op1.get("name") == winner:
-                op1["result"] = "win"
-                match["opponent1"] = op1
-                current_match = match
-                break
-            elif op2.get("name") == winner:
-                op2["result"] = "win"
-                match["opponent2"] = op2
-                current_match = match
-                break
-
-        if current_match:
-            current_round = current_match["round"]
-            next_round = current_round + 1
-            current_round_matches = [m for m in matches if m["round"] == current_round]
-            next_round_matches = [m for m in matches if m["round"] == next_round]
-
-            match_index = current_round_matches.index(current_match)
-            next_match_index = match_index // 2
-
-            if next_match_index < len(next_round_matches):
-                next_match = next_round_matches[next_match_index]
-                if not next_match.get("opponent1"):
-                    next_match["opponent1"] = {"id": None, "name": winner}
-                elif not next_match.get("opponent2"):
-                    next_match["opponent2"] = {"id": None, "name": winner}
+    try:
+        args = result_args(request.json)
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), e.status
 
+    announce_result(args, commit("result", **args))
+    dispatch_ready()
     return jsonify({'status': 'result recorded'})
 
+@app.route('/match_result/batch', methods=['POST'])
+def match_result_batch():
+    """Record an array of {"winner", "loser"[, "duration"]} results at once, in order."""
+    try:
+        checked = commit_items("result", request.json, result_args)
+    except BadRequest as e:
+        return jsonify({'error': str(e)}), e.status
+
+    replies = []
+    for args, outcome in checked:
+        if isinstance(outcome, BadRequest):
+            replies.append(outcome)
+            continue
+        announce_result(args, outcome)
+        replies.append({'status': 'result recorded'})
+    dispatch_ready()
+    return batch_reply(replies)
+
+def announce_result(args, outcome):
+    match, advanced = outcome
+    winner, loser = args["winner"], args["loser"]
+    if match:
+        move_relay.close_match(match["code"], (match["player1"], match["player2"]))
+    events.publish("result", {
+        "winner": winner,
+        "loser": loser,
+        "code": match["code"] if match else None
+    }, to=[winner, loser])
+    if advanced:
+        events.publish("bracket_change", {"status": "advanced", "winner": winner}, to=[winner, loser])
+
 @app.route('/scores_history')
+@cached("scores", "matches")
 def scores_history():
-    sorted_scores = sorted(scores.items(), key=lambda x: -x[1])
-    return jsonify({
-        "scores": sorted_scores,
-        "history": matches_history
-    })
+    since = request.args.get("since", type=int)
+    with hold("scores", "matches"):
+        if since is not None:
+            return jsonify(delta_feed(since, ("match", "score")))
+        return jsonify({
+            "scores": leaderboard.ranked(),
+            "history": match_store.history()
+        })
 
 @app.route('/stats')
+@cached("matches")
 def get_stats():
-    total = len(matches_history)
-    durations = []
-    wins = {}
-
-    for m in matches_history:
-        if m.get('winner'):
-            wins[m['winner']] = wins.get(m['winner'], 0) + 1
-        if 'duration' in m:
-            durations.append(m['duration'])
-
-    avg_duration = sum(durations) / len(durations) if durations else 0
-    win_percentages = {p: (count / total) * 100 for p, count in wins.items()} if total else {}
-
-    return jsonify({
-        "total_matches": total,
-        "avg_duration": avg_duration,
-        "win_percentages": win_percentages
-    })
+    with hold("matches"):
+        return jsonify(match_store.stats.snapshot())
+
+@app.route('/leaderboard')
+def get_leaderboard():
+    top = request.args.get("top", type=int)
+    if top is not None and top < 0:
+        return jsonify({'error': 'top must be zero or more'}), 400  # Backends would slice or LIMIT it differently
+    with hold("scores"):
+        ranked = leaderboard.top(top) if top is not None else leaderboard.ranked()
+        return jsonify({"scores": ranked, "player_count": len(leaderboard)})
+
+@app.route('/rank/<username>')
+def get_rank(username):
+    with hold("scores"):
+        rank = leaderboard.rank(username)
+        if rank is None:
+            return jsonify({'error': 'Player not found'}), 404
+        return jsonify({
+            "username": username,
+            "score": leaderboard.get(username),
+            "rank": rank,
+            "rating": round(ratings.get(username)),
+            "player_count": len(leaderboard)
+        })
 
 @app.route('/pending_matches')
+@cached("waiting")
 def pending_matches():
-    return jsonify([
-        {
-            "code": code,
-            "creator": info["creator"],
-            "created_at": info["created_at"]
-        }
-        for code, info in waiting_matches.items()
-    ])
+    with hold("waiting"):
+        return jsonify([
+            {
+                "code": code,
+                "creator": info["creator"],
+                "created_at": info["created_at"]
+            }
+            for code, info in waiting_matches.items()
+        ])
 
 @app.route('/disconnect', methods=['POST'])
 def disconnect():
     data = request.json
     username = data.get("username")
-    if username in players:
-        del players[username]
+    with hold(*OP_LOCKS["disconnect"], "leases", write=True):
+        removed = username in players and commit("disconnect", username=username)
+        leases.release("player", username)
+    if removed:
+        events.publish("player_change", {"username": username, "status": "disconnected"})
         print(f"[DISCONNECT] {username} has left the game.")
-        pending_requests.pop(username, None)
-        matches_history[:] = [m for m in matches_history if m["player1"] != username and m["player2"] != username]
-        global waiting_matches
-        waiting_matches = {k: v for k, v in waiting_matches.items() if v["creator"] != username}
     else:
         print(f"[DISCONNECT] {username} not found in players list.")
     return jsonify({'status': 'disconnected'})
 
+# === RATED QUEUE ===
+# /enqueue pairs players of close Elo ratings. A player unmatched on arrival
+# stays queued; a background sweep retries every queued player as their
+# rating window widens, and both players get a match_start event.
+
+@app.route('/enqueue', methods=['POST'])
+def enqueue():
+    data = request.json
+    username = data.get("username")
+    if not username:
+        return jsonify({'error': 'Missing username'}), 400
+
+    now = time.time()
+    with hold("players", "scores", "matches", "queue", "leases", write=True):
+        if username not in players:
+            return jsonify({'error': 'Player not found'}), 404
+        rating = ratings.get(username)
+        leases.renew("player", username, now + PLAYER_TTL)
+        match_queue.enqueue(username, rating, now)
+        partner = match_queue.find_partner(username, now)
+        started = start_queued_match(*match_queue.pop_pair(username, partner, now), now) if partner else None
+        window = None if started else match_queue.window(username, now)
+        depth = len(match_queue)
+    start_sweeper()
+
+    if started:
+        announce_queued_match(started)
+        return jsonify({
+            "status": "match_started",
+            "match_code": started["code"],
+            "opponent": partner,
+            "rating": round(rating)
+        })
+    return jsonify({"status": "queued", "rating": round(rating), "window": window, "queue_depth": depth})
+
+@app.route('/dequeue', methods=['POST'])
+def dequeue():
+    username = request.json.get("username")
+    with hold("queue", write=True):
+        if match_queue.remove(username) is None:
+            return jsonify({'error': 'Player not queued'}), 404
+    return jsonify({'status': 'dequeued'})
+
+@app.route('/queue_stats')
+def queue_stats():
+    with hold("queue"):
+        return jsonify(match_queue.snapshot())
+
+def start_queued_match(player1, player2, now):
+    """Needs the "matches" lock held."""
+    code = f"Q_{player1}_{player2}_{int(now)}"
+    return commit("add_match", player1=player1, player2=player2, code=code,
+                  timestamp=datetime.fromtimestamp(now).strftime("%d/%m/%Y %H:%M"))
+
+def announce_queued_match(match):
+    p1, p2 = match["player1"], match["player2"]
+    events.publish("match_start", {"code": match["code"], "player1": p1, "player2": p2, "queued": True}, to=[p1, p2])
+
+def sweep_queue(now=None):
+    """Pair the queued players whose rating windows now overlap."""
+    now = now or time.time()
+    if len(match_queue) < 2:
+        return []
+    with hold("scores", "matches", "queue", write=True):
+        started = [start_queued_match(a, b, now) for a, b in match_queue.sweep(now)]
+    for match in started:
+        announce_queued_match(match)
+    return started
+
+# === PRESENCE AND EXPIRY ===
+# Players, match codes and match requests are leased. A player's lease is
+# renewed by /heartbeat and by the routes clients poll anyway (/events/poll,
+# /events, /check_requests); codes and requests get a fixed lifetime. Once a
+# second the sweeper expires what ran out, so nothing piles up when clients
+# crash instead of leaving. An expired player only loses their presence (the
+# "expire" op): unlike /disconnect, their matches stay, since one missed
+# heartbeat window during a long game must not delete it.
+
+PLAYER_TTL = float(os.environ.get("BATTLESHIP_PLAYER_TTL", "90"))
+WAITING_TTL = float(os.environ.get("BATTLESHIP_WAITING_TTL", "600"))
+REQUEST_TTL = float(os.environ.get("BATTLESHIP_REQUEST_TTL", "120"))
+SWEEP_INTERVAL = 1.0
+sweeper = None
+
+@app.route('/heartbeat', methods=['POST'])
+def heartbeat():
+    username = (request.json or {}).get("username")
+    if not username:
+        return jsonify({'error': 'Missing username'}), 400
+    with hold("players", "leases", write=True):
+        if username not in players:
+            return jsonify({'error': 'Player not found'}), 404
+        leases.renew("player", username, time.time() + PLAYER_TTL)
+    start_sweeper()
+    return jsonify({'status': 'alive', 'ttl': PLAYER_TTL})
+
+def touch(*usernames):
+    """Renew the presence lease of ``usernames``."""
+    deadline = time.time() + PLAYER_TTL
+    with hold("leases", write=True):
+        for username in usernames:
+            leases.renew("player", username, deadline)
+    start_sweeper()
+
+def grant_leases(now):
+    """Lease everything restored at startup that has no lease yet. Needs all locks held."""
+    for kind, keys, ttl in (("player", players, PLAYER_TTL),
+                            ("waiting", waiting_matches, WAITING_TTL),
+                            ("request", pending_requests, REQUEST_TTL)):
+        for key in list(keys):
+            if leases.deadline(kind, key) is None:
+                leases.renew(kind, key, now + ttl)
+
+def sweep_leases(now=None):
+    """Expire the players, codes and requests whose lease ran out; returns the expired (kind, key) pairs."""
+    now = now or time.time()
+    with hold("leases", write=True):
+        due = leases.expire(now)
+    return [(kind, key) for kind, key in due if EXPIRE[kind](key)]
+
+# Each check runs again under the locks: the lease may have been renewed, or
+# the item removed, since leases.expire() returned it
+
+def expire_player(username):
+    with hold(*OP_LOCKS["expire"], "leases", write=True):
+        if leases.deadline("player", username) is not None or username not in players:
+            return False
+        commit("expire", username=username)
+    events.publish("player_change", {"username": username, "status": "disconnected", "reason": "expired"})
+    print(f"[EXPIRE] {username} stopped sending heartbeats.")
+    return True
+
+def expire_waiting(code):
+    with hold("waiting", "leases", write=True):
+        if leases.deadline("waiting", code) is not None or code not in waiting_matches:
+            return False
+        creator = commit("expire_waiting", code=code)["creator"]
+    events.publish("match_expired", {"code": code, "creator": creator})
+    return True
+
+def expire_request(username):
+    with hold("requests", "leases", write=True):
+        if leases.deadline("request", username) is not None or username not in pending_requests:
+            return False
+        req = commit("take_request", username=username)
+    events.publish("match_request_expired", {"from": req["from"], "to": username, "code": req["code"]},
+                   to=[req["from"], username])
+    return True
+
+EXPIRE = {
+    "player": expire_player,
+    "waiting": expire_waiting,
+    "request": expire_request,
+}
+
+def start_sweeper():
+    """Start the background thread running sweep_leases() and sweep_queue() every second."""
+    global sweeper
+    if sweeper is None:
+        def loop():
+            while True:
+                time.sleep(SWEEP_INTERVAL)
+                if db is not None and db.closed:
+                    return
+                for sweep in (sweep_leases, sweep_queue):
+                    try:
+                        sweep()
+                    except Exception as e:
+                        print(f"[SWEEP] {sweep.__name__} failed: {e}")
+
+        sweeper = threading.Thread(target=loop, name="sweeper", daemon=True)
+        sweeper.start()
+
+# === METRICS ===
+# Every request through Flask (including the ASGI bridge) is timed by a WSGI
+# wrapper around the app, so rate limited, failed and snapshotting requests
+# count too. /metrics serves the Prometheus text format.
+
+request_metrics = RequestMetrics()
+untimed_wsgi_app = app.wsgi_app
+
+def timed_wsgi_app(environ, start_response):
+    start = time.perf_counter()
+    status = []
+
+    def start_and_keep_status(status_line, headers, exc_info=None):
+        status.append(status_line)
+        return start_response(status_line, headers, exc_info)
+
+    try:
+        return untimed_wsgi_app(environ, start_and_keep_status)
+    finally:
+        request_metrics.observe(environ.get("battleship.route", "unmatched"), environ["REQUEST_METHOD"],
+                                int(status[0][:3]) if status else 500, time.perf_counter() - start)
+
+app.wsgi_app = timed_wsgi_app
+
+@app.after_request
+def label_route(response):
+    # The URL rule, not the path: /rank/<username> is one series, not one per player
+    if request.url_rule is not None:
+        request.environ["battleship.route"] = request.url_rule.rule
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    with hold("players", "matches", "waiting", "queue", "leases"):
+        gauges = [
+            ("players", "Registered players.", len(players)),
+            ("waiting_matches", "Match codes waiting for a second player.", len(waiting_matches)),
+            ("active_matches", "Matches started and without a result.", len(match_store.active())),
+            ("history_matches", "Matches in the history, finished or not.", len(match_store)),
+            ("queue_depth", "Players waiting in the rated queue.", len(match_queue)),
+            ("leases", "Live player, code and request leases.", len(leases)),
+        ]
+    lag = journal.lag if journal else db.lag if db else 0
+    gauges += [
+        ("journal_lag", "Journaled operations (or SQLite writes) not yet on disk.", lag),
+        ("event_subscribers", "Open /events and /events/poll connections.", events.subscriber_count()),
+        ("relay_connections", "Players connected to the move relay.", len(move_relay)),
+    ]
+
+    lines = []
+    for name, help_text, value in gauges:
+        lines += family(f"battleship_{name}", "gauge", help_text, [({}, value)])
+    locks = state_locks.stats()
+    lines += family("battleship_lock_wait_seconds_total", "counter", "Time spent waiting for each collection lock.",
+                    [({"collection": name}, stats["wait_seconds_total"]) for name, stats in locks.items()])
+    lines += family("battleship_lock_contended_total", "counter", "Lock acquisitions that had to wait.",
+                    [({"collection": name}, stats["contended"]) for name, stats in locks.items()])
+    if limiter:
+        limits = limiter.stats()
+        lines += family("battleship_rate_limited_total", "counter", "Requests refused with 429, by route class.",
+                        [({"class": name}, count) for name, count in limits["limited"].items()])
+    cache = response_cache.stats()
+    lines += family("battleship_response_cache_hits_total", "counter", "Reads served from the response cache.", [({}, cache["hits"])])
+    lines += request_metrics.render("battleship")
+    return Response("\n".join(lines) + "\n", mimetype="text/plain", content_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.route('/metrics.json')
+def metrics_json():
+    """Lock contention per collection (acquisitions, waits, time spent waiting), rate limiter and
+    response cache counters, rated queue metrics and live leases."""
+    with hold("queue", "leases"):
+        queue = match_queue.snapshot()
+        lease_count = len(leases)
+    return jsonify({
+        "locks": state_locks.stats(),
+        "rate_limits": limiter.stats() if limiter else None,
+        "response_cache": response_cache.stats(),
+        "journal_lag": journal.lag if journal else 0,
+        "queue": queue,
+        "leases": lease_count,
+        "event_subscribers": events.subscriber_count()
+    })
+
+# === PROFILER ===
+# POST /admin/profile {"mode": "collapsed" | "pstats", "fraction": 0.1, "duration": 60}
+# profiles that fraction of requests for that long (or until
+# /admin/profile/stop), then writes one profile per route under
+# BATTLESHIP_PROFILE_DIR (DATA_DIR/profiles by default). Only while it runs is
+# app.wsgi_app the profiling wrapper: switched off, requests take the same
+# path as if the profiler did not exist.
+# The admin routes need BATTLESHIP_ADMIN_TOKEN in X-Admin-Token, and refuse
+# everything while it is unset. BATTLESHIP_ADMIN_LOOPBACK=on lets requests
+# from the server's own host in without a token instead: a reverse proxy on
+# that host makes every request local, unless it is in BATTLESHIP_TRUSTED_PROXIES.
+
+ADMIN_TOKEN = os.environ.get("BATTLESHIP_ADMIN_TOKEN")
+ADMIN_LOOPBACK = os.environ.get("BATTLESHIP_ADMIN_LOOPBACK", "off").strip().lower() == "on"
+
+request_profiler = RequestProfiler(os.environ.get("BATTLESHIP_PROFILE_DIR") or os.path.join(
+    os.environ.get("BATTLESHIP_DATA_DIR") or tempfile.gettempdir(), "profiles"))
+
+def admin_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMIN_TOKEN is not None:
+            allowed = hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN)
+        else:
+            allowed = ADMIN_LOOPBACK and client_address() in ("127.0.0.1", "::1")
+        if not allowed:
+            return jsonify({"error": "Admin only"}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def profiled_wsgi_app(environ, start_response):
+    if request_profiler.sample():
+        return request_profiler.run(timed_wsgi_app, lambda: environ.get("battleship.route", "unmatched"),
+                                    environ, start_response)
+    if not request_profiler.active:
+        app.wsgi_app = timed_wsgi_app  # The time window ran out
+    return timed_wsgi_app(environ, start_response)
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+@admin_only
+def profile():
+    if request.method == 'GET':
+        return jsonify(request_profiler.status())
+    data = request.get_json(silent=True) or {}
+    try:
+        request_profiler.start(mode=data.get("mode", "collapsed"), fraction=float(data.get("fraction", 1.0)),
+                               duration=float(data["duration"]) if data.get("duration") else None,
+                               interval=float(data.get("interval", 0.005)))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": str(e)}), 400
+    except RuntimeError as e:
+        return jsonify({"error": str(e)}), 409
+    app.wsgi_app = profiled_wsgi_app
+    print(f"[PROFILE] Started: {request_profiler.mode}, {request_profiler.fraction:.0%} of requests")
+    return jsonify(request_profiler.status())
+
+@app.route('/admin/profile/stop', methods=['POST'])
+@admin_only
+def stop_profile():
+    app.wsgi_app = timed_wsgi_app
+    files = request_profiler.stop()
+    print(f"[PROFILE] Stopped: {request_profiler.profiled} requests profiled, {len(files)} files")
+    return jsonify({**request_profiler.status(), "files": files})
+
+# === PUSH EVENTS ===
+
+@app.route('/events')
+def event_stream():
+    """Server-Sent Events stream. ``username`` narrows it to that player's events."""
+    username = request.args.get("username")
+    since = request.headers.get("Last-Event-ID") or request.args.get("since")
+    subscriber = events.subscribe(username, int(since) if since and since.isdigit() else None)
+
+    def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                if username:
+                    touch(username)
+                batch = subscriber.get(timeout=15)
+                if not batch:
+                    yield ": keepalive\n\n"
+                for event in batch:
+                    yield f"id: {event['seq']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            events.unsubscribe(subscriber)
+
+    return Response(stream_with_context(stream()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route('/events/poll')
+def poll_events():
+    """Long-poll variant of /events for clients without an SSE reader."""
+    username = request.args.get("username")
+    since = request.args.get("since", type=int)
+    timeout = min(request.args.get("timeout", 25, type=float), 60)
+    if username:
+        touch(username)
+    return jsonify(events.poll(since, username, timeout))
+
+# === MOVE RELAY ===
+# With BATTLESHIP_RELAY_PORT set, the players of an active match can each
+# hold one TCP connection to the server and send their moves through it: the
+# relay forwards them by match code (see relay.py for the framing), instead
+# of every move fetching /players and dialing the opponent. GET /relay tells
+# clients whether it runs and on which port. The relay is started by the
+# __main__ block and by asgi_server.py at startup; with several shared-store
+# workers the first one to bind the port serves the relay for all of them.
+
+RELAY_PORT = os.environ.get("BATTLESHIP_RELAY_PORT")
+
+def relay_opponent(code, username):
+    """The opponent of ``username`` in the active match ``code``; None if there is no such match."""
+    with hold("matches"):
+        match = match_store.find_active(code)
+    if not match or username not in (match["player1"], match["player2"]):
+        return None
+    touch(username)
+    return match["player2"] if match["player1"] == username else match["player1"]
+
+move_relay = MoveRelay(relay_opponent)
+
+def start_relay():
+    if RELAY_PORT and move_relay.port is None:
+        try:
+            move_relay.start(port=int(RELAY_PORT))
+        except OSError as e:
+            print(f"[RELAY] Not started, port {RELAY_PORT} unavailable (another worker may hold it): {e}")
+            return
+        print(f"[RELAY] Listening on port {move_relay.port}")
+
+@app.route('/relay')
+def relay_info():
+    return jsonify({"enabled": move_relay.port is not None, "port": move_relay.port, **move_relay.stats()})
+
 # === RUN FLASK ===
 
+# BATTLESHIP_DATA_DIR="" keeps everything in memory, as before journaling existed.
+# BATTLESHIP_STORE=sqlite stores the data in DATA_DIR/store.db instead of memory + journal.
+# BATTLESHIP_STORE=shared does the same for several worker processes sharing DATA_DIR.
+DATA_DIR = os.environ.get("BATTLESHIP_DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data"))
+STORE = os.environ.get("BATTLESHIP_STORE", "memory")
+if STORE == "shared" and not DATA_DIR:
+    raise SystemExit("BATTLESHIP_STORE=shared needs a BATTLESHIP_DATA_DIR the workers share")
+if STORE in ("sqlite", "shared"):
+    if DATA_DIR:
+        os.makedirs(DATA_DIR, exist_ok=True)
+    init_sqlite(os.path.join(DATA_DIR, "store.db") if DATA_DIR else ":memory:", shared=STORE == "shared")
+elif DATA_DIR:
+    init_persistence(DATA_DIR)
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    start_relay()
+    # The reloader would start a second process appending to the same journal
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
\ No newline at end of file
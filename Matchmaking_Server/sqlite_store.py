@@ -0,0 +1,566 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import datetime
+from events import EventBroker
+from leases import Leases
+from matchmaking import MatchQueue
+import json
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    username TEXT PRIMARY KEY,
+    ip TEXT,
+    port INTEGER,
+    joined TEXT
+);
+CREATE TABLE IF NOT EXISTS scores (
+    username TEXT PRIMARY KEY,
+    score INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS scores_rank ON scores (score DESC);
+CREATE TABLE IF NOT EXISTS matches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    player1 TEXT,
+    player2 TEXT,
+    code TEXT,
+    timestamp TEXT,
+    winner TEXT,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS matches_code ON matches (code);
+CREATE INDEX IF NOT EXISTS matches_player1 ON matches (player1);
+CREATE INDEX IF NOT EXISTS matches_player2 ON matches (player2);
+CREATE INDEX IF NOT EXISTS matches_winner ON matches (winner);
+CREATE INDEX IF NOT EXISTS matches_active ON matches (code) WHERE winner IS NULL;
+CREATE INDEX IF NOT EXISTS matches_active_player1 ON matches (player1) WHERE winner IS NULL;
+CREATE INDEX IF NOT EXISTS matches_active_player2 ON matches (player2) WHERE winner IS NULL;
+CREATE TABLE IF NOT EXISTS kv (
+    collection TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (collection, key)
+);
+CREATE INDEX IF NOT EXISTS kv_waiting_creator ON kv (json_extract(value, '$.creator'))
+    WHERE collection = 'waiting_matches';
+CREATE TABLE IF NOT EXISTS queue (
+    username TEXT PRIMARY KEY,
+    rating REAL NOT NULL,
+    enqueued_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS queue_rating ON queue (rating);
+CREATE TABLE IF NOT EXISTS leases (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    deadline REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+);
+CREATE INDEX IF NOT EXISTS leases_deadline ON leases (deadline);
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    type TEXT NOT NULL,
+    data TEXT NOT NULL,
+    recipients TEXT NOT NULL,
+    time REAL NOT NULL
+);
+"""
+
+
+class SqliteDatabase:
+    """One WAL-mode connection shared by the SQLite stores, with batched commits.
+
+    Writes run inside an open transaction that is committed every
+    ``batch_size`` writes or ``flush_interval`` seconds. Reads go through the
+    same connection, so they always see the uncommitted writes. Statements are
+    constant SQL strings, which sqlite3 keeps prepared in its statement cache.
+
+    With ``shared=True`` several processes use the same file: writes commit
+    immediately instead of in batches, and ``transaction()`` groups a check
+    and the writes depending on it so other processes see them atomically.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, flush_interval: float = 0.05, shared: bool = False):
+        self.path = path
+        self.shared = shared
+        self.batch_size = 1 if shared else batch_size
+        self.flush_interval = flush_interval
+        self.version = 0  # Bumped on every write, lets stores cache derived reads
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None, cached_statements=256)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._pending = 0
+        self._depth = 0  # Nesting of transaction()
+        self._closed = False
+        self._dirty = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="sqlite-commit", daemon=True)
+        self._flusher.start()
+
+    def read(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def read_one(self, sql: str, params: Tuple = ()) -> Optional[Tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def write(self, sql: str, params: Tuple = ()) -> sqlite3.Cursor:
+        with self.lock:
+            if self._depth:
+                self.version += 1
+                return self.conn.execute(sql, params)
+            if not self.conn.in_transaction:
+                self.conn.execute("BEGIN")
+            cursor = self.conn.execute(sql, params)
+            self.version += 1
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self._commit()
+            else:
+                self._dirty.set()
+            return cursor
+
+    @contextmanager
+    def transaction(self, write: bool = False) -> Iterator[None]:
+        """Run the block in one transaction; ``write`` takes the database write lock up front.
+
+        Nested blocks join the outermost transaction. A read block must not
+        contain writes: upgrading it could fail if another process wrote since.
+        """
+        with self.lock:
+            if not self._depth:
+                self._commit()
+                self.conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if not self._depth:
+                    self.conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if not self._depth:
+                self.conn.execute("COMMIT")
+
+    def revision(self) -> Any:
+        """Changes whenever the data changes, including commits made by other processes."""
+        if not self.shared:
+            return self.version
+        with self.lock:
+            return self.version, self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    @property
+    def lag(self) -> int:
+        """Writes not committed yet."""
+        return self._pending
+
+    def flush(self) -> None:
+        with self.lock:
+            self._commit()
+
+    def close(self) -> None:
+        with self.lock:
+            self._closed = True
+            self._commit()
+            self.conn.close()
+        self._dirty.set()
+
+    def _commit(self) -> None:
+        if self.conn.in_transaction and not self._depth:
+            self.conn.execute("COMMIT")
+        self._pending = 0
+
+    def _flush_loop(self) -> None:
+        while True:
+            self._dirty.wait()
+            if self._closed:
+                return
+            self._dirty.clear()
+            time.sleep(self.flush_interval)  # Let a batch accumulate
+            with self.lock:
+                if self._closed:
+                    return
+                self._commit()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+
+class SqliteDict(MutableMapping):
+    """A JSON-valued dict persisted in the ``kv`` table under one collection name."""
+
+    def __init__(self, db: SqliteDatabase, collection: str):
+        self.db = db
+        self.collection = collection
+
+    def __getitem__(self, key: str) -> Any:
+        row = self.db.read_one("SELECT value FROM kv WHERE collection = ? AND key = ?", (self.collection, key))
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self.db.write(
+            "INSERT INTO kv (collection, key, value) VALUES (?, ?, ?) "
+            "ON CONFLICT (collection, key) DO UPDATE SET value = excluded.value",
+            (self.collection, key, json.dumps(value)))
+
+    def __delitem__(self, key: str) -> None:
+        if self.db.write("DELETE FROM kv WHERE collection = ? AND key = ?", (self.collection, key)).rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        return self.db.read_one("SELECT 1 FROM kv WHERE collection = ? AND key = ?", (self.collection, key)) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self.db.read("SELECT key FROM kv WHERE collection = ? ORDER BY rowid", (self.collection,))])
+
+    def __len__(self) -> int:
+        return self.db.read_one("SELECT COUNT(*) FROM kv WHERE collection = ?", (self.collection,))[0]
+
+    def items(self) -> List[Tuple[str, Any]]:
+        rows = self.db.read("SELECT key, value FROM kv WHERE collection = ? ORDER BY rowid", (self.collection,))
+        return [(key, json.loads(value)) for key, value in rows]
+
+
+class SqliteWaitingMatches(SqliteDict):
+    """WaitingMatches on SQLite, with an index on the creator of each code."""
+
+    def __init__(self, db: SqliteDatabase):
+        super().__init__(db, "waiting_matches")
+
+    def codes_of(self, creator: str) -> List[str]:
+        rows = self.db.read("SELECT key FROM kv WHERE collection = 'waiting_matches' "
+                            "AND json_extract(value, '$.creator') = ? ORDER BY rowid", (creator,))
+        return [row[0] for row in rows]
+
+
+class SqlitePlayers(MutableMapping):
+    """``players`` on SQLite: {username: {'ip', 'port', 'joined'}} in join order."""
+
+    def __init__(self, db: SqliteDatabase):
+        self.db = db
+
+    def __getitem__(self, username: str) -> Dict[str, Any]:
+        row = self.db.read_one("SELECT ip, port, joined FROM players WHERE username = ?", (username,))
+        if row is None:
+            raise KeyError(username)
+        return {"ip": row[0], "port": row[1], "joined": row[2]}
+
+    def __setitem__(self, username: str, info: Dict[str, Any]) -> None:
+        self.db.write(
+            "INSERT INTO players (username, ip, port, joined) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET ip = excluded.ip, port = excluded.port, joined = excluded.joined",
+            (username, info["ip"], info["port"], info["joined"]))
+
+    def __delitem__(self, username: str) -> None:
+        if self.db.write("DELETE FROM players WHERE username = ?", (username,)).rowcount == 0:
+            raise KeyError(username)
+
+    def __contains__(self, username: object) -> bool:
+        return self.db.read_one("SELECT 1 FROM players WHERE username = ?", (username,)) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter([row[0] for row in self.db.read("SELECT username FROM players ORDER BY rowid")])
+
+    def __len__(self) -> int:
+        return self.db.read_one("SELECT COUNT(*) FROM players")[0]
+
+    def items(self) -> List[Tuple[str, Dict[str, Any]]]:
+        rows = self.db.read("SELECT username, ip, port, joined FROM players ORDER BY rowid")
+        return [(u, {"ip": ip, "port": port, "joined": joined}) for u, ip, port, joined in rows]
+
+
+class SqliteLeaderboard:
+    """Leaderboard on SQLite; ranks come from the (score DESC) index, ties by first appearance."""
+
+    def __init__(self, db: SqliteDatabase):
+        self.db = db
+        self._ranked: Optional[List[Tuple[str, int]]] = None
+        self._ranked_version = None
+
+    def __contains__(self, username: str) -> bool:
+        return self.get(username) is not None
+
+    def __len__(self) -> int:
+        return self.db.read_one("SELECT COUNT(*) FROM scores")[0]
+
+    def get(self, username: str, default: Optional[int] = None) -> Optional[int]:
+        row = self.db.read_one("SELECT score FROM scores WHERE username = ?", (username,))
+        return row[0] if row else default
+
+    def add_player(self, username: str) -> None:
+        self.db.write("INSERT OR IGNORE INTO scores (username, score) VALUES (?, 0)", (username,))
+
+    def add_points(self, username: str, points: int = 1) -> int:
+        self.db.write(
+            "INSERT INTO scores (username, score) VALUES (?, ?) "
+            "ON CONFLICT (username) DO UPDATE SET score = score + excluded.score",
+            (username, points))
+        return self.get(username)
+
+    def items(self) -> List[Tuple[str, int]]:
+        return [tuple(row) for row in self.db.read("SELECT username, score FROM scores ORDER BY rowid")]
+
+    def ranked(self) -> List[Tuple[str, int]]:
+        revision = self.db.revision()
+        if self._ranked_version != revision:
+            self._ranked = self.top(-1)
+            self._ranked_version = revision
+        return self._ranked
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        rows = self.db.read("SELECT username, score FROM scores ORDER BY score DESC, rowid LIMIT ?", (k,))
+        return [tuple(row) for row in rows]
+
+    def rank(self, username: str) -> Optional[int]:
+        score = self.get(username)
+        if score is None:
+            return None
+        return self.db.read_one("SELECT COUNT(*) FROM scores WHERE score > ?", (score,))[0] + 1
+
+
+class SqliteMatchStats:
+    """/stats computed in SQL, cached until the next write."""
+
+    def __init__(self, db: SqliteDatabase):
+        self.db = db
+        self._cached: Optional[Dict[str, Any]] = None
+        self._cached_version = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        revision = self.db.revision()
+        if self._cached_version != revision:
+            total, avg_duration = self.db.read_one("SELECT COUNT(*), AVG(duration) FROM matches")
+            wins = self.db.read("SELECT winner, COUNT(*) FROM matches WHERE winner IS NOT NULL GROUP BY winner")
+            self._cached = {
+                "total_matches": total,
+                "avg_duration": avg_duration or 0,
+                "win_percentages": {p: (count / total) * 100 for p, count in wins} if total else {}
+            }
+            self._cached_version = revision
+        return self._cached
+
+
+MATCH_COLUMNS = "player1, player2, timestamp, winner, code, duration"
+
+
+def _match(row: Tuple) -> Dict[str, Any]:
+    match = {"player1": row[0], "player2": row[1], "timestamp": row[2], "winner": row[3], "code": row[4]}
+    if row[5] is not None:
+        match["duration"] = row[5]
+    return match
+
+
+class SqliteMatchStore:
+    """MatchStore on SQLite, with indexes on code, players, winner and the active set."""
+
+    def __init__(self, db: SqliteDatabase):
+        self.db = db
+        self.stats = SqliteMatchStats(db)
+        self.changes = None
+
+    def __len__(self) -> int:
+        return self.db.read_one("SELECT COUNT(*) FROM matches")[0]
+
+    def add(self, player1: str, player2: str, code: str, timestamp: Optional[str] = None) -> Dict[str, Any]:
+        timestamp = timestamp or datetime.now().strftime("%d/%m/%Y %H:%M")
+        match_id = self.db.write("INSERT INTO matches (player1, player2, code, timestamp) VALUES (?, ?, ?, ?)",
+                                 (player1, player2, code, timestamp)).lastrowid
+        match = {"player1": player1, "player2": player2, "timestamp": timestamp, "winner": None, "code": code}
+        self._changed(match_id, match)
+        return match
+
+    def restore(self, match: Dict[str, Any]) -> Dict[str, Any]:
+        match_id = self.db.write(
+            "INSERT INTO matches (player1, player2, code, timestamp, winner, duration) VALUES (?, ?, ?, ?, ?, ?)",
+            (match["player1"], match["player2"], match["code"], match["timestamp"], match.get("winner"), match.get("duration"))).lastrowid
+        self._changed(match_id, match)
+        return match
+
+    def record_result(self, winner: str, duration: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        with self.db.lock:
+            row = self.db.read_one(
+                f"SELECT id, {MATCH_COLUMNS} FROM matches WHERE winner IS NULL AND (player1 = ? OR player2 = ?) "
+                "ORDER BY id DESC LIMIT 1", (winner, winner))
+            if row is None:
+                return None
+            self.db.write("UPDATE matches SET winner = ?, duration = ? WHERE id = ?", (winner, duration, row[0]))
+        match = _match(row[1:])
+        match["winner"] = winner
+        if duration is not None:
+            match["duration"] = duration
+        self._changed(row[0], match)
+        return match
+
+    def remove_player(self, username: str) -> int:
+        with self.db.lock:
+            if self.changes is not None:
+                for (match_id,) in self.db.read("SELECT id FROM matches WHERE player1 = ? OR player2 = ?", (username, username)):
+                    self._changed(match_id, None)
+            return self.db.write("DELETE FROM matches WHERE player1 = ? OR player2 = ?", (username, username)).rowcount
+
+    def find_active(self, code: str) -> Optional[Dict[str, Any]]:
+        row = self.db.read_one(
+            f"SELECT {MATCH_COLUMNS} FROM matches WHERE code = ? AND winner IS NULL ORDER BY id LIMIT 1", (code,))
+        return _match(row) if row else None
+
+    def find_by_code(self, code: str) -> List[Dict[str, Any]]:
+        return [_match(r) for r in self.db.read(f"SELECT {MATCH_COLUMNS} FROM matches WHERE code = ? ORDER BY id", (code,))]
+
+    def matches_of(self, username: str) -> List[Dict[str, Any]]:
+        rows = self.db.read(
+            f"SELECT {MATCH_COLUMNS} FROM matches WHERE player1 = ? OR player2 = ? ORDER BY id", (username, username))
+        return [_match(r) for r in rows]
+
+    def active(self) -> List[Dict[str, Any]]:
+        return [_match(r) for r in self.db.read(f"SELECT {MATCH_COLUMNS} FROM matches WHERE winner IS NULL ORDER BY id")]
+
+    def history(self) -> List[Dict[str, Any]]:
+        return [_match(r) for r in self.db.read(f"SELECT {MATCH_COLUMNS} FROM matches ORDER BY id")]
+
+    def items(self) -> List[Tuple[int, Dict[str, Any]]]:
+        return [(r[0], _match(r[1:])) for r in self.db.read(f"SELECT id, {MATCH_COLUMNS} FROM matches ORDER BY id")]
+
+    def _changed(self, match_id: int, match: Optional[Dict[str, Any]]) -> None:
+        if self.changes is not None:
+            self.changes.record("match", match_id, dict(match) if match else None)
+
+
+class SqliteMatchQueue(MatchQueue):
+    """MatchQueue on SQLite: neighbours come from the rating index, so every worker shares one queue.
+
+    Time-to-match stats are counted by the worker that made the match.
+    """
+
+    def __init__(self, db: SqliteDatabase, **windows: float):
+        super().__init__(**windows)
+        self.db = db
+
+    def __len__(self) -> int:
+        return self.db.read_one("SELECT COUNT(*) FROM queue")[0]
+
+    def __contains__(self, username: str) -> bool:
+        return self.db.read_one("SELECT 1 FROM queue WHERE username = ?", (username,)) is not None
+
+    def enqueue(self, username: str, rating: float, now: float) -> None:
+        self.db.write("INSERT OR IGNORE INTO queue (username, rating, enqueued_at) VALUES (?, ?, ?)",
+                      (username, rating, now))
+
+    def remove(self, username: str) -> Optional[float]:
+        with self.db.lock:
+            row = self.db.read_one("SELECT enqueued_at FROM queue WHERE username = ?", (username,))
+            if row is None:
+                return None
+            self.db.write("DELETE FROM queue WHERE username = ?", (username,))
+        return row[0]
+
+    def _lookup(self, username: str) -> Tuple[float, float]:
+        return self.db.read_one("SELECT rating, enqueued_at FROM queue WHERE username = ?", (username,))
+
+    def _neighbours(self, username: str) -> List[Tuple[float, str]]:
+        rating = self._lookup(username)[0]
+        below = self.db.read_one(
+            "SELECT rating, username FROM queue WHERE rating <= ? AND username != ? ORDER BY rating DESC LIMIT 1",
+            (rating, username))
+        above = self.db.read_one(
+            "SELECT rating, username FROM queue WHERE rating >= ? AND username != ? ORDER BY rating LIMIT 1",
+            (rating, username))
+        return [tuple(row) for row in (below, above) if row]
+
+    def _waiting(self) -> List[str]:
+        return [row[0] for row in self.db.read("SELECT username FROM queue ORDER BY enqueued_at, rowid")]
+
+
+class SqliteLeases(Leases):
+    """Leases on SQLite, so a heartbeat received by one worker holds for all of them.
+
+    Due leases come from the deadline index: O(log n) per expiry instead of
+    the wheel's O(1), and the worker that deletes a lease is the one expiring it.
+    """
+
+    def __init__(self, db: SqliteDatabase):
+        super().__init__()
+        self.db = db
+
+    def __len__(self) -> int:
+        return self.db.read_one("SELECT COUNT(*) FROM leases")[0]
+
+    def renew(self, kind: str, key: str, deadline: float) -> None:
+        self.db.write("INSERT OR REPLACE INTO leases (kind, key, deadline) VALUES (?, ?, ?)", (kind, key, deadline))
+
+    def release(self, kind: str, key: str) -> None:
+        self.db.write("DELETE FROM leases WHERE kind = ? AND key = ?", (kind, key))
+
+    def deadline(self, kind: str, key: str) -> Optional[float]:
+        row = self.db.read_one("SELECT deadline FROM leases WHERE kind = ? AND key = ?", (kind, key))
+        return row[0] if row else None
+
+    def expire(self, now: float) -> List[Tuple[str, str]]:
+        with self.db.lock:
+            expired = [tuple(row) for row in self.db.read("SELECT kind, key FROM leases WHERE deadline <= ?", (now,))]
+            if expired:
+                self.db.write("DELETE FROM leases WHERE deadline <= ?", (now,))
+        return expired
+
+
+class SqliteEventBroker(EventBroker):
+    """EventBroker shared by worker processes through the ``events`` table.
+
+    ``publish`` inserts the event, numbered by the table. A thread in every
+    worker tails the table and fans new rows out to that worker's
+    subscribers, so clients see the same event sequence whichever worker
+    serves them.
+    """
+
+    def __init__(self, db: SqliteDatabase, backlog: int = 1000, poll_interval: float = 0.02):
+        super().__init__(backlog)
+        self.db = db
+        self.poll_interval = poll_interval
+        self._tail_lock = threading.Lock()
+        rows = db.read("SELECT seq, type, data, recipients, time FROM events ORDER BY seq DESC LIMIT ?", (backlog,))
+        for row in reversed(rows):
+            self._record(self._event(row))
+        self._pruned_at = self._seq
+        self._tailer = threading.Thread(target=self._tail_loop, name="sqlite-events", daemon=True)
+        self._tailer.start()
+
+    def publish(self, kind: str, data: Dict[str, Any], to: Iterable[str] = ()) -> int:
+        cursor = self.db.write("INSERT INTO events (type, data, recipients, time) VALUES (?, ?, ?, ?)",
+                               (kind, json.dumps(data), json.dumps(list(to)), time.time()))
+        self._catch_up()  # Deliver it here right away, other workers get it from their tailer
+        return cursor.lastrowid
+
+    def subscribe(self, username: Optional[str] = None, since: Optional[int] = None, loop=None):
+        if since is not None and since > self._seq:
+            self._catch_up()  # The client may have seen events this worker has not tailed yet
+        return super().subscribe(username, since, loop)
+
+    def _catch_up(self) -> None:
+        with self._tail_lock:
+            rows = self.db.read("SELECT seq, type, data, recipients, time FROM events WHERE seq > ? ORDER BY seq",
+                                (self._seq,))
+            for row in rows:
+                self.deliver(self._event(row))
+
+    def _tail_loop(self) -> None:
+        while not self.db.closed:
+            time.sleep(self.poll_interval)
+            try:
+                self._catch_up()
+                if self._seq - self._pruned_at >= self._events.maxlen:
+                    self.db.write("DELETE FROM events WHERE seq <= ?", (self._seq - self._events.maxlen,))
+                    self._pruned_at = self._seq
+            except sqlite3.ProgrammingError:
+                return  # Database closed under us
+
+    @staticmethod
+    def _event(row: Tuple) -> Dict[str, Any]:
+        seq, kind, data, to, at = row
+        return {"seq": seq, "type": kind, "data": json.loads(data), "to": json.loads(to), "time": at}
@@ -26,8 +26,10 @@ function renderNativeBracket(container, data) {
     const roundNumbers = Object.keys(rounds).map(n => parseInt(n)).sort((a, b) => a - b);
     const totalRounds = roundNumbers.length;
   
-    // Generate round names dynamically
+    // Generate round names dynamically (round robin and Swiss rounds are just numbered)
+    const elimination = !data.stages?.length || data.stages[0].type === "single_elimination";
     const roundNames = roundNumbers.map((roundNum, index) => {
+      if (!elimination) return `Round ${index + 1}`;
       const remaining = totalRounds - index;
       if (remaining === 1) return "Final";
       if (remaining === 2) return "Semi-finals";
@@ -0,0 +1,151 @@
+from typing import Dict, List, Optional, Tuple, Any
+import heapq
+
+
+class MatchStats:
+    """Running counters behind /stats, updated as matches are added, won or removed."""
+
+    def __init__(self):
+        self.total = 0
+        self.wins: Dict[str, int] = {}
+        self.duration_sum = 0.0
+        self.duration_count = 0
+        self._cached: Optional[Dict[str, Any]] = None
+
+    def on_add(self, match: Dict[str, Any]) -> None:
+        self.total += 1
+        self._cached = None
+
+    def on_result(self, match: Dict[str, Any]) -> None:
+        winner = match.get("winner")
+        if winner:
+            self.wins[winner] = self.wins.get(winner, 0) + 1
+        if "duration" in match:
+            self.duration_sum += match["duration"]
+            self.duration_count += 1
+        self._cached = None
+
+    def on_remove(self, match: Dict[str, Any]) -> None:
+        self.total -= 1
+        winner = match.get("winner")
+        if winner:
+            self.wins[winner] -= 1
+            if not self.wins[winner]:
+                del self.wins[winner]
+        if "duration" in match:
+            self.duration_sum -= match["duration"]
+            self.duration_count -= 1
+        self._cached = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the /stats payload, recomputed only after a change."""
+        if self._cached is None:
+            total = self.total
+            self._cached = {
+                "total_matches": total,
+                "avg_duration": self.duration_sum / self.duration_count if self.duration_count else 0,
+                "win_percentages": {p: (count / total) * 100 for p, count in self.wins.items()} if total else {}
+            }
+        return self._cached
+
+
+class Leaderboard:
+    """Scores with sublinear updates: a score change or rank() is O(log S), S the best score.
+
+    Players sit in buckets by score ({score: {username: None}}), and a Fenwick
+    tree counts players per score, so rank() is a prefix sum. Scores are win
+    counts, never negative. The full ranking (descending score, then first
+    appearance, the order ``sorted(scores.items(), key=lambda x: -x[1])`` used
+    to produce) is only sorted by ranked() and kept until the next change;
+    top(k) slices it when it is kept, else walks the buckets from the best score.
+    """
+
+    def __init__(self):
+        self._scores: Dict[str, int] = {}  # {username: score}
+        self._seq: Dict[str, int] = {}  # {username: first appearance}
+        self._buckets: Dict[int, Dict[str, None]] = {}  # {score: {username: None}}
+        self._tree = [0, 0]  # Fenwick tree: players per score, score s at index s + 1
+        self._ranked: Optional[List[Tuple[str, int]]] = None
+
+    def __contains__(self, username: str) -> bool:
+        return username in self._scores
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def get(self, username: str, default: Optional[int] = None) -> Optional[int]:
+        return self._scores.get(username, default)
+
+    def add_player(self, username: str) -> None:
+        """Register ``username`` with a score of 0 if unknown."""
+        if username not in self._scores:
+            self._seq[username] = len(self._seq)
+            self._move(username, None, 0)
+
+    def add_points(self, username: str, points: int = 1) -> int:
+        old = self._scores.get(username)
+        if old is None:
+            self._seq[username] = len(self._seq)
+        self._move(username, old, (old or 0) + points)
+        return self._scores[username]
+
+    def items(self) -> List[Tuple[str, int]]:
+        """All (username, score) pairs in first-appearance order."""
+        return list(self._scores.items())
+
+    def ranked(self) -> List[Tuple[str, int]]:
+        """All (username, score) pairs, best first."""
+        if self._ranked is None:
+            # Stable sort of the first-appearance order: ties stay in that order
+            self._ranked = sorted(self._scores.items(), key=lambda item: -item[1])
+        return self._ranked
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        if self._ranked is not None:
+            return self._ranked[:k]
+        best = []
+        for score in sorted(self._buckets, reverse=True):
+            if len(best) >= k:
+                break
+            names = heapq.nsmallest(k - len(best), self._buckets[score], key=self._seq.__getitem__)
+            best.extend((name, score) for name in names)
+        return best
+
+    def rank(self, username: str) -> Optional[int]:
+        """1-based competition rank: players with the same score share a rank."""
+        score = self._scores.get(username)
+        if score is None:
+            return None
+        return len(self._scores) - self._count_at_most(score) + 1
+
+    def _move(self, username: str, old: Optional[int], new: int) -> None:
+        if new < 0:
+            raise ValueError(f"Negative score for {username}")
+        if old is not None:
+            bucket = self._buckets[old]
+            del bucket[username]
+            if not bucket:
+                del self._buckets[old]
+            self._count(old, -1)
+        self._count(new, 1)  # Before joining the bucket: a growing tree is rebuilt from the buckets
+        self._buckets.setdefault(new, {})[username] = None
+        self._scores[username] = new
+        self._ranked = None
+
+    def _count(self, score: int, delta: int) -> None:
+        if score + 1 >= len(self._tree):
+            size = 1 << (score + 1).bit_length()  # Grows by doubling, rebuilt from the buckets
+            self._tree = [0] * (size + 1)
+            for known, bucket in self._buckets.items():
+                self._count(known, len(bucket))
+        i = score + 1
+        while i < len(self._tree):
+            self._tree[i] += delta
+            i += i & -i
+
+    def _count_at_most(self, score: int) -> int:
+        i, total = min(score + 1, len(self._tree) - 1), 0
+        while i:
+            total += self._tree[i]
+            i -= i & -i
+        return total
@@ -0,0 +1,35 @@
+import importlib
+import os
+import sys
+
+import pytest
+
+# Server modules import each other by bare name (they run from Matchmaking_Server/)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+# Keep unit tests in memory; persistence tests pass their own directory
+os.environ["BATTLESHIP_DATA_DIR"] = ""
+# Tests hammer the server from one address; test_ratelimit.py installs its own limiter
+os.environ["BATTLESHIP_RATE_LIMITS"] = "off"
+
+
+@pytest.fixture(params=["memory", "sqlite", "shared"])
+def server(request, tmp_path):
+    """A freshly imported server module, so every test starts with empty state, on each store backend."""
+    import server as module
+    os.environ["BATTLESHIP_STORE"] = request.param
+    if request.param == "shared":
+        os.environ["BATTLESHIP_DATA_DIR"] = str(tmp_path)
+    try:
+        module = importlib.reload(module)
+    finally:
+        os.environ.pop("BATTLESHIP_STORE")
+        os.environ["BATTLESHIP_DATA_DIR"] = ""
+    yield module
+    if module.db is not None:
+        module.db.close()
+
+
+@pytest.fixture
+def client(server):
+    return server.app.test_client()
@@ -1,5 +1,4 @@
 import requests
-import time
 
 SERVER_URL = "http://localhost:5000"
 
@@ -15,20 +14,18 @@ players = [
 ]
 
 def register_players():
-    for player in players:
-        try:
-            print(f"📡 Registering {player['username']}...")
-            response = requests.post(
-                f"{SERVER_URL}/auto_join",
-                json=player
-            )
-            if response.status_code == 200:
+    # One request for the whole list, with a status per player
+    try:
+        print(f"📡 Registering {len(players)} players...")
+        response = requests.post(f"{SERVER_URL}/auto_join/batch", json=players)
+        response.raise_for_status()
+        for player, result in zip(players, response.json()["results"]):
+            if result["http_status"] == 200:
                 print(f"✅ Registered {player['username']}")
             else:
-                print(f"❌ Error for {player['username']}: {response.text}")
-        except Exception as e:
-            print(f"❌ Exception for {player['username']}: {e}")
-        time.sleep(0.3)  # Small delay to simulate spacing
+                print(f"❌ Error for {player['username']}: {result['error']}")
+    except Exception as e:
+        print(f"❌ Exception while registering: {e}")
 
 if __name__ == "__main__":
     register_players()
@@ -0,0 +1,78 @@
+import asyncio
+import importlib
+import json
+
+import pytest
+
+
+@pytest.fixture
+def asgi(server):
+    import asgi_server
+    return importlib.reload(asgi_server)
+
+
+async def call(app, method, path, body=None, query=""):
+    """Run one request through the ASGI app; returns (status, headers, body bytes)."""
+    data = json.dumps(body).encode() if body is not None else b""
+    scope = {
+        "type": "http", "method": method, "path": path, "query_string": query.encode(),
+        "headers": [(b"content-type", b"application/json")] if body is not None else [],
+        "client": ("10.0.0.7", 5555), "server": ("testserver", 80),
+    }
+    received = []
+    sent = {"body": b""}
+
+    async def receive():
+        if not received:
+            received.append(1)
+            return {"type": "http.request", "body": data, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+            sent["headers"] = dict(message["headers"])
+        else:
+            sent["body"] += message.get("body", b"")
+
+    await app(scope, receive, send)
+    return sent["status"], sent["headers"], sent["body"]
+
+
+def test_flask_routes_are_served_unchanged(asgi, server):
+    async def scenario():
+        status, _, body = await call(asgi.app, "POST", "/auto_join", {"username": "Alice", "port": 9000})
+        assert status == 200 and json.loads(body)["status"] == "connected"
+        status, _, body = await call(asgi.app, "POST", "/auto_join", {"username": "Bob"})
+        assert status == 400
+        status, headers, body = await call(asgi.app, "GET", "/players")
+        assert headers[b"content-type"] == b"application/json"
+        return json.loads(body)
+
+    players = asyncio.run(scenario())
+    assert players == server.app.test_client().get("/players").json
+    assert players[0]["ip"] == "10.0.0.7"
+
+
+def test_idle_long_polls_share_one_thread(asgi):
+    async def scenario():
+        polls = [asyncio.ensure_future(call(asgi.app, "GET", "/events/poll", query="since=0&timeout=5"))
+                 for _ in range(2000)]
+        await asyncio.sleep(0.2)
+        assert not any(p.done() for p in polls)
+        # The publish happens on a Flask pool thread and wakes every poller on the loop
+        await call(asgi.app, "POST", "/auto_join", {"username": "Alice", "port": 9000})
+        return await asyncio.wait_for(asyncio.gather(*polls), 2)
+
+    results = asyncio.run(scenario())
+    for status, _, body in results:
+        payload = json.loads(body)
+        assert status == 200
+        assert [e["type"] for e in payload["events"]] == ["player_change"]
+        assert payload["last_seq"] == 1
+
+
+def test_long_poll_times_out_empty(asgi):
+    status, _, body = asyncio.run(call(asgi.app, "GET", "/events/poll", query="username=Nobody&timeout=0.05"))
+    assert status == 200
+    assert json.loads(body) == {"events": [], "last_seq": 0, "reset": False}
@@ -0,0 +1,44 @@
+def test_auto_join_batch_reports_each_item(client):
+    r = client.post("/auto_join/batch", json=[
+        {"username": "Alice", "port": 9000},
+        {"username": "Bob"},
+        "not a player",
+        {"username": "Carol", "port": 9002},
+    ])
+    assert r.status_code == 200
+    assert [item["http_status"] for item in r.json["results"]] == [200, 400, 400, 200]
+    assert r.json["results"][0] == {"http_status": 200, "status": "connected", "player_id": "Alice"}
+    assert r.json["results"][1]["error"] == "Missing username or port"
+    assert (r.json["applied"], r.json["failed"]) == (2, 2)
+    assert [p["username"] for p in client.get("/players").json] == ["Alice", "Carol"]
+
+
+def test_batch_needs_an_array(client):
+    assert client.post("/match_result/batch", json={"winner": "Alice", "loser": "Bob"}).status_code == 400
+
+
+def test_tournament_batches_play_a_whole_bracket(client):
+    client.post("/auto_join/batch", json=[{"username": f"P{i}", "port": 9000 + i} for i in range(8)])
+    client.post("/start_tournament")
+
+    while True:
+        ready = [m for m in client.get("/bracket_data").json["matches"] if m["status"] == 2]
+        if not ready:
+            break
+        started = client.post("/start_tournament_match/batch", json=[
+            {"player1": m["opponent1"]["name"], "player2": m["opponent2"]["name"], "match_id": m["id"]} for m in ready
+        ] + [{"player1": "X", "player2": "Y", "match_id": 999}]).json
+        assert started["failed"] == 1 and started["results"][-1]["http_status"] == 404
+
+        recorded = client.post("/match_result/batch", json=[
+            {"winner": m["opponent1"]["name"], "loser": m["opponent2"]["name"], "duration": 10} for m in ready
+        ]).json
+        assert recorded["applied"] == len(ready)
+
+    final = client.get("/bracket_data").json["matches"][-1]
+    assert final["status"] == 4
+    assert client.get("/stats").json["total_matches"] == 7
+    assert client.get("/admin_data").json["active"] == {}
+    # A completed match cannot be started again
+    r = client.post("/start_tournament_match/batch", json=[{"player1": "P0", "player2": "P1", "match_id": final["id"]}])
+    assert r.json["results"][0]["error"] == "Match already completed"
@@ -0,0 +1,96 @@
+from bracket_generator import Bracket, generate_bracket
+
+
+def test_links_point_to_next_round():
+    bracket = generate_bracket([f"P{i}" for i in range(16)])
+    by_id = {m["id"]: m for m in bracket["matches"]}
+
+    final = [m for m in bracket["matches"] if m["next_match_id"] is None]
+    assert len(final) == 1
+    for match in bracket["matches"]:
+        if match["next_match_id"] is None:
+            continue
+        parent = by_id[match["next_match_id"]]
+        assert parent["round"] == match["round"] + 1
+        assert match["id"] in parent["prev_match_ids"]
+        assert parent["prev_match_ids"].index(match["id"]) == (0 if match["next_slot"] == "opponent1" else 1)
+
+
+def test_same_seed_same_bracket():
+    players = [f"P{i}" for i in range(11)]
+    first = generate_bracket(players, seed=42)
+    assert generate_bracket(list(reversed(players)), seed=42) == first
+    assert generate_bracket(players, seed=43)["participants"] != first["participants"]
+
+
+def test_first_round_byes_resolve():
+    bracket = Bracket.build([f"P{i}" for i in range(5)], seed=1)
+    matches = bracket.to_dict()["matches"]
+    first_round = [m for m in matches if m["round"] == 1]
+
+    byes = [m for m in first_round if m["opponent2"] is None]
+    assert len(byes) == 3
+    for match in first_round:
+        assert match["opponent1"] is not None
+    for match in byes:
+        assert match["opponent1"]["result"] == "win"
+        assert match["status"] == 4
+        advanced = matches[match["next_match_id"] - 1][match["next_slot"]]
+        assert advanced["name"] == match["opponent1"]["name"]
+
+
+def play_round(client, rnd):
+    played = 0
+    for match in client.get("/bracket_data").json["matches"]:
+        if match["round"] != rnd or match["status"] == 4:
+            continue
+        p1 = match["opponent1"]["name"]
+        p2 = match["opponent2"]["name"]
+        client.post("/start_tournament_match", json={"player1": p1, "player2": p2, "match_id": match["id"]})
+        r = client.post("/match_result", json={"winner": p1, "loser": p2})
+        assert r.json["status"] == "result recorded"
+        played += 1
+    return played
+
+
+def test_full_tournament_reaches_final(client):
+    for i in range(8):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    preview = client.get("/bracket_data").json
+    assert client.get("/bracket_data").json == preview
+    assert client.post("/start_tournament").status_code == 200
+    assert client.get("/bracket_data").json["participants"] == preview["participants"]
+
+    assert [play_round(client, rnd) for rnd in (1, 2, 3)] == [4, 2, 1]
+
+    final = client.get("/bracket_data").json["matches"][-1]
+    results = {final["opponent1"]["result"], final["opponent2"]["result"]}
+    assert results == {"win", "loss"}
+
+
+def test_preview_changes_with_player_set(client):
+    for i in range(3):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    assert len(client.get("/bracket_data").json["participants"]) == 3
+    client.post("/auto_join", json={"username": "P3", "port": 9003})
+    assert len(client.get("/bracket_data").json["participants"]) == 4
+
+
+def test_result_only_advances_current_match(client, server):
+    for i in range(4):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    client.post("/start_tournament")
+    first = client.get("/bracket_data").json["matches"][0]
+    winner, loser = first["opponent1"]["name"], first["opponent2"]["name"]
+
+    client.post("/match_result", json={"winner": winner, "loser": loser})
+    # A casual match outside the bracket must not move the winner again
+    client.post("/match_result", json={"winner": winner, "loser": "Stranger"})
+
+    matches = client.get("/bracket_data").json["matches"]
+    assert matches[2]["opponent1"] == {"id": first["opponent1"]["id"], "name": winner}
+    assert matches[2]["opponent2"] is None
+    assert matches[0]["opponent1"]["result"] == "win"
+    assert client.post("/start_tournament_match", json={
+        "player1": winner, "player2": loser, "match_id": 1
+    }).status_code == 400
@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+
+from concurrency import InstrumentedLock, LockSet
+
+THREADS = 200
+
+
+def run_threads(target, count=THREADS):
+    """Start ``count`` threads together on ``target(i)``; return (elapsed seconds, errors)."""
+    barrier = threading.Barrier(count)
+    errors = []
+
+    def worker(i):
+        barrier.wait()
+        try:
+            target(i)
+        except Exception as e:  # Surfaced by the assertions below
+            errors.append(repr(e))
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - start, errors
+
+
+def test_lock_counts_contention():
+    lock = InstrumentedLock("test")
+    with lock:
+        with lock:  # Re-entrant
+            pass
+    assert lock.stats()["acquisitions"] == 2 and lock.stats()["contended"] == 0
+
+    held = threading.Event()
+
+    def hold():
+        with lock:
+            held.set()
+            time.sleep(0.05)
+
+    t = threading.Thread(target=hold)
+    t.start()
+    held.wait()
+    with lock:
+        pass
+    t.join()
+    assert lock.contended == 1
+    assert lock.wait_max >= 0.02
+
+
+def test_lock_set_takes_locks_in_declared_order():
+    locks = LockSet(("a", "b"))
+    done = []
+
+    def worker(i):
+        names = ("a", "b") if i % 2 else ("b", "a")  # Opposite orders would deadlock without sorting
+        for _ in range(200):
+            with locks.hold(*names):
+                pass
+        done.append(i)
+
+    _, errors = run_threads(worker, 20)
+    assert not errors and len(done) == 20
+
+
+def test_concurrent_mutations_keep_invariants(server):
+    players = [f"P{i}" for i in range(THREADS)]
+    codes = [f"C{i}" for i in range(THREADS // 4)]
+    setup = server.app.test_client()
+    for i, code in enumerate(codes):
+        setup.post("/auto_join", json={"username": f"Host{i}", "port": 8000 + i})
+        setup.post("/create_match", json={"player_id": f"Host{i}", "code": code})
+
+    joined = {}
+    request_counts = []
+    results_per_thread = 5
+
+    def worker(i):
+        client = server.app.test_client()
+        me = players[i]
+        statuses = [client.post("/auto_join", json={"username": me, "port": 9000 + i}).status_code]
+        for code in random.sample(codes, len(codes)):
+            r = client.post("/join_match", json={"player_id": me, "code": code})
+            assert r.status_code in (200, 404)
+            if r.status_code == 200:
+                joined.setdefault(code, []).append(me)
+        for _ in range(results_per_thread):
+            statuses.append(client.post("/match_result", json={"winner": me, "loser": "Nobody"}).status_code)
+        for route in ("/admin_data", "/players", "/pending_matches", "/scores_history", "/stats", "/leaderboard?top=5"):
+            statuses.append(client.get(route).status_code)
+        if i % 10 == 0:
+            statuses.append(client.post("/disconnect", json={"username": me}).status_code)
+            statuses.append(client.post("/auto_join", json={"username": me, "port": 9000 + i}).status_code)
+        assert set(statuses) == {200}, statuses
+        request_counts.append(len(statuses) + len(codes))
+
+    elapsed, errors = run_threads(worker)
+    assert not errors, errors[:3]
+
+    # Every waiting code was joined by exactly one thread
+    assert sorted(joined) == sorted(codes)
+    assert all(len(v) == 1 for v in joined.values())
+    assert setup.get("/pending_matches").json == []
+
+    # Every result was counted once
+    scores = dict(setup.get("/leaderboard").json["scores"])
+    assert sum(scores.values()) == THREADS * results_per_thread
+    assert len(server.players) == THREADS + len(codes)
+
+    history = setup.get("/scores_history").json["history"]
+    for match in history:
+        assert match["player1"] in scores and match["player2"] in scores
+
+    locks = setup.get("/metrics.json").json["locks"]
+    assert locks["waiting"]["acquisitions"] > 0
+    total = sum(request_counts)
+    print(f"\n{server.STORE}: {THREADS} threads, ~{total} requests in {elapsed:.2f}s "
+          f"({total / elapsed:.0f} req/s), lock waits: "
+          + ", ".join(f"{n} {s['contended']}x/{s['wait_seconds_total'] * 1000:.0f}ms" for n, s in locks.items()))
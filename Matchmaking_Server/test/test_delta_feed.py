@@ -0,0 +1,73 @@
+from changelog import ChangeLog
+
+
+def test_changelog_keeps_latest_value_per_item():
+    log = ChangeLog(limit=3)
+    start = log.version
+    log.record("match", 1, {"winner": None})
+    log.record("score", "Alice", 0)
+    log.record("match", 1, {"winner": "Alice"})
+    assert log.since(start + 1, ["match", "score"]) == {"match": {1: {"winner": "Alice"}}, "score": {"Alice": 0}}
+    assert log.since(log.version, ["match"]) == {"match": {}}
+
+    log.record("waiting", "C1", None)  # Pushes the first change out of the log
+    assert log.since(start, ["match"]) is None
+    assert log.since(start + 1, ["waiting"]) == {"waiting": {"C1": None}}
+    assert log.since(log.version + 1, ["match"]) is None  # Not a version of this log
+
+
+def merge(state, delta):
+    """What admin.html does with a delta."""
+    if delta["full"]:
+        state.update(waiting={}, matches={}, scores={})
+    state["waiting"].update(delta["waiting"])
+    for code in delta["waiting_removed"]:
+        del state["waiting"][code]
+    state["matches"].update((m["id"], m) for m in delta["matches"])
+    for match_id in delta["matches_removed"]:
+        del state["matches"][match_id]
+    state["scores"].update(delta["scores"])
+    state["version"] = delta["version"]
+
+
+def test_merged_deltas_match_full_admin_data(server, client):
+    state = {}
+    merge(state, client.get("/admin_data?since=0").json)
+    assert client.get("/admin_data?since=0").json["full"]
+
+    steps = [
+        ("/auto_join", {"username": "Alice", "port": 9000}),
+        ("/auto_join", {"username": "Bob", "port": 9001}),
+        ("/create_match", {"player_id": "Alice", "code": "C1"}),
+        ("/create_match", {"player_id": "Bob", "code": "C2"}),
+        ("/join_match", {"player_id": "Bob", "code": "C1"}),
+        ("/match_result", {"winner": "Bob", "loser": "Alice", "duration": 12}),
+        ("/confirm_match", {"player1": "Alice", "player2": "Carol", "code": "C3"}),
+        ("/disconnect", {"username": "Bob"}),
+    ]
+    for path, body in steps:
+        client.post(path, json=body)
+        delta = client.get(f"/admin_data?since={state['version']}").json
+        assert delta["full"] == (server.db is not None and server.db.shared)
+        merge(state, delta)
+
+        full = client.get("/admin_data").json
+        assert state["waiting"] == full["waiting"]
+        assert [{k: v for k, v in m.items() if k != "id"} for m in state["matches"].values()] == full["history"]
+        assert sorted(state["scores"].items()) == sorted(map(tuple, full["scores"]))
+
+
+def test_scores_history_delta(server, client):
+    client.post("/auto_join", json={"username": "Alice", "port": 9000})
+    version = client.get("/scores_history?since=0").json["version"]
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    client.post("/join_match", json={"player_id": "Bob", "code": "C1"})
+    client.post("/match_result", json={"winner": "Alice", "loser": "Bob"})
+
+    delta = client.get(f"/scores_history?since={version}").json
+    if server.db is not None and server.db.shared:
+        assert delta["full"]
+        return
+    assert delta["scores"] == [["Alice", 1]]
+    assert [(m["code"], m["winner"]) for m in delta["matches"]] == [("C1", "Alice")]
+    assert "waiting" not in delta
@@ -0,0 +1,72 @@
+import threading
+import time
+
+from events import EventBroker
+
+
+def test_player_subscribers_only_get_their_events():
+    broker = EventBroker()
+    alice = broker.subscribe("Alice")
+    dashboard = broker.subscribe()
+
+    broker.publish("match_request", {"from": "Bob"}, to=["Alice"])
+    broker.publish("match_request", {"from": "Bob"}, to=["Carol"])
+
+    assert [e["to"] for e in alice.get(0)] == [["Alice"]]
+    assert len(dashboard.get(0)) == 2
+
+
+def test_poll_resumes_from_backlog_and_flags_gaps():
+    broker = EventBroker(backlog=3)
+    for i in range(5):
+        broker.publish("result", {"n": i}, to=["Alice"])
+
+    resumed = broker.poll(since=3, username="Alice", timeout=0)
+    assert [e["data"]["n"] for e in resumed["events"]] == [3, 4]
+    assert resumed["last_seq"] == 5
+    assert not resumed["reset"]
+
+    assert broker.poll(since=0, username="Alice", timeout=0)["reset"]
+    assert broker.poll(since=99, username="Alice", timeout=0)["reset"]
+
+
+def test_poll_wakes_on_publish():
+    broker = EventBroker()
+    result = {}
+
+    def waiter():
+        result.update(broker.poll(since=broker.last_seq, username="Alice", timeout=5))
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while broker.subscriber_count() == 0:
+        time.sleep(0.001)
+    broker.publish("match_start", {"code": "X"}, to=["Alice"])
+    thread.join(2)
+
+    assert [e["type"] for e in result["events"]] == ["match_start"]
+    assert broker.subscriber_count() == 0
+
+
+def test_join_pushes_match_start_to_creator(client):
+    since = client.get("/events/poll?username=Alice&timeout=0").json["last_seq"]
+    client.post("/create_match", json={"player_id": "Alice", "code": "ABC"})
+    client.post("/join_match", json={"player_id": "Bob", "code": "ABC"})
+
+    polled = client.get(f"/events/poll?username=Alice&since={since}&timeout=0").json
+    assert [e["type"] for e in polled["events"]] == ["match_start"]
+    assert polled["events"][0]["data"] == {"code": "ABC", "player1": "Alice", "player2": "Bob",
+                                           "addresses": {"Alice": None, "Bob": None}}
+
+
+def test_match_start_hands_out_addresses(client):
+    client.post("/auto_join", json={"username": "Alice", "port": 9001})
+    client.post("/auto_join", json={"username": "Bob", "port": 9002})
+    assert client.get("/players/Alice").json["port"] == 9001
+    assert client.get("/players/Nobody").status_code == 404
+
+    client.post("/create_match", json={"player_id": "Alice", "code": "ABC"})
+    joined = client.post("/join_match", json={"player_id": "Bob", "code": "ABC"}).json
+    assert joined["addresses"]["Alice"] == {"ip": "127.0.0.1", "port": 9001}
+    confirmed = client.post("/confirm_match", json={"player1": "Alice", "player2": "Bob", "code": "XYZ"}).json
+    assert confirmed["addresses"] == {"Alice": {"ip": "127.0.0.1", "port": 9001}, "Bob": {"ip": "127.0.0.1", "port": 9002}}
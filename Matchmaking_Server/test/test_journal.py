@@ -0,0 +1,72 @@
+import importlib
+import os
+
+import pytest
+
+
+@pytest.fixture
+def restart(tmp_path):
+    """Start (or restart) the server module on a persistent data directory."""
+    import server as module
+    started = []
+
+    def start(snapshot_every=None):
+        if started:
+            started[-1].journal.close()
+        os.environ["BATTLESHIP_DATA_DIR"] = str(tmp_path)
+        try:
+            srv = importlib.reload(module)
+        finally:
+            os.environ["BATTLESHIP_DATA_DIR"] = ""
+        if snapshot_every:
+            srv.journal.snapshot_every = snapshot_every
+        started.append(srv)
+        return srv
+
+    yield start
+    started[-1].journal.close()
+
+
+def play_some(client):
+    for i in range(6):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    client.post("/create_match", json={"player_id": "P0", "code": "WAIT"})
+    client.post("/create_match", json={"player_id": "P1", "code": "GAME"})
+    client.post("/join_match", json={"player_id": "P2", "code": "GAME"})
+    client.post("/match_result", json={"winner": "P2", "loser": "P1", "duration": 12})
+    client.post("/propose_match", json={"from": "P3", "to": "P4", "code": "REQ"})
+    client.post("/auto_join/batch", json=[{"username": "Q0", "port": 9100}, {"username": "Q1"}])
+    client.post("/start_tournament")
+    first = next(m for m in client.get("/bracket_data").json["matches"] if m["status"] == 2)
+    client.post("/match_result", json={"winner": first["opponent1"]["name"], "loser": first["opponent2"]["name"]})
+    client.post("/disconnect", json={"username": "P5"})
+
+
+def observed(client):
+    return {
+        route: client.get(route).json
+        for route in ("/players", "/admin_data", "/stats", "/bracket_data", "/tournament_status", "/pending_matches")
+    }
+
+
+@pytest.mark.parametrize("snapshot_every", [None, 5])
+def test_state_survives_restart(restart, snapshot_every):
+    srv = restart(snapshot_every)
+    client = srv.app.test_client()
+    play_some(client)
+    before = observed(client)
+
+    srv = restart()
+    assert observed(srv.app.test_client()) == before
+    assert srv.pending_requests == {"P4": {"from": "P3", "code": "REQ"}}
+
+
+def test_torn_tail_is_ignored(restart, tmp_path):
+    srv = restart()
+    srv.app.test_client().post("/auto_join", json={"username": "Alice", "port": 9000})
+    srv.journal.flush()
+    with open(tmp_path / "journal.log", "a") as f:
+        f.write('{"n": 2, "op": "join", "args": {"userna')
+
+    srv = restart()
+    assert list(srv.players) == ["Alice"]
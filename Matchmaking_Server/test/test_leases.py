@@ -0,0 +1,111 @@
+import time
+
+from leases import Leases
+
+
+def test_wheel_expires_due_leases_only():
+    leases = Leases(tick=1.0, slots=8)
+    leases.renew("player", "A", 10.0)
+    leases.renew("player", "B", 12.5)
+    assert leases.expire(9.0) == []
+    assert leases.expire(11.0) == [("player", "A")]
+    assert leases.expire(12.0) == []
+    assert leases.expire(13.0) == [("player", "B")]
+    assert len(leases) == 0
+
+
+def test_renewed_and_released_leases_do_not_expire():
+    leases = Leases(tick=1.0, slots=8)
+    leases.renew("player", "A", 10.0)
+    leases.renew("waiting", "CODE", 10.0)
+    leases.renew("player", "A", 30.0)  # Heartbeat
+    leases.release("waiting", "CODE")
+    assert leases.expire(20.0) == []
+    assert leases.deadline("player", "A") == 30.0
+    # Further than one turn of the wheel: comes back round without expiring early
+    assert leases.expire(29.0) == []
+    assert leases.expire(31.0) == [("player", "A")]
+
+
+def test_late_sweep_catches_up():
+    leases = Leases(tick=1.0, slots=4)
+    for i in range(100):
+        leases.renew("player", i, float(i))
+    leases.renew("player", "late", 500.0)
+    assert len(leases.expire(200.0)) == 100
+    assert leases.expire(1000.0) == [("player", "late")]
+
+
+def test_sweep_before_the_first_deadline_keeps_earlier_leases_on_time():
+    leases = Leases(tick=1.0, slots=8)
+    leases.renew("player", "A", 1000.0)
+    assert leases.expire(5.0) == []
+    leases.renew("request", "R", 20.0)
+    assert leases.expire(21.0) == [("request", "R")]
+
+
+def register(client, *names):
+    for port, name in enumerate(names, start=9000):
+        client.post("/auto_join", json={"username": name, "port": port})
+
+
+def test_silent_player_expires(server, client, monkeypatch):
+    register(client, "Alice", "Bob")
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    client.post("/enqueue", json={"username": "Alice"})
+    since = client.get("/events/poll?timeout=0").json["last_seq"]
+    now, ttl = time.time(), server.PLAYER_TTL
+    assert server.sweep_leases(now + ttl / 2) == []
+
+    # Bob's heartbeat pushes his lease past the next sweep: only Alice expires
+    monkeypatch.setattr(server, "PLAYER_TTL", 10 ** 6)
+    assert client.post("/heartbeat", json={"username": "Bob"}).json["status"] == "alive"
+    assert server.sweep_leases(now + ttl + 1) == [("player", "Alice")]
+
+    assert [p["username"] for p in client.get("/players").json] == ["Bob"]
+    assert client.get("/pending_matches").json == []
+    assert client.get("/queue_stats").json["queue_depth"] == 0
+    events = client.get(f"/events/poll?since={since}&timeout=0").json["events"]
+    assert events[-1]["data"] == {"username": "Alice", "status": "disconnected", "reason": "expired"}
+    assert client.post("/heartbeat", json={"username": "Alice"}).status_code == 404
+
+
+def test_codes_and_requests_expire(server, client, monkeypatch):
+    monkeypatch.setattr(server, "PLAYER_TTL", 10 ** 6)
+    register(client, "Alice", "Bob")
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    client.post("/propose_match", json={"from": "Alice", "to": "Bob", "code": "C2"})
+
+    now = time.time()
+    assert server.sweep_leases(now + server.REQUEST_TTL + 1) == [("request", "Bob")]
+    assert client.get("/check_requests/Bob").json == {}
+    assert server.sweep_leases(now + server.WAITING_TTL + 1) == [("waiting", "C1")]
+    assert client.get("/pending_matches").json == []
+    assert client.post("/join_match", json={"player_id": "Bob", "code": "C1"}).status_code == 404
+
+
+def test_expired_player_keeps_matches(server, client, monkeypatch):
+    register(client, "Alice", "Bob", "Carol")
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    client.post("/join_match", json={"player_id": "Bob", "code": "C1"})
+    client.post("/match_result", json={"winner": "Alice", "loser": "Bob"})
+    client.post("/create_match", json={"player_id": "Carol", "code": "C2"})
+    client.post("/join_match", json={"player_id": "Alice", "code": "C2"})
+    client.post("/create_match", json={"player_id": "Alice", "code": "C3"})
+    stats = client.get("/stats").json
+    history = client.get("/scores_history").json["history"]
+
+    now, ttl = time.time(), server.PLAYER_TTL
+    monkeypatch.setattr(server, "PLAYER_TTL", 10 ** 6)
+    for name in ("Bob", "Carol"):
+        client.post("/heartbeat", json={"username": name})
+    assert server.sweep_leases(now + ttl + 1) == [("player", "Alice")]
+
+    # Presence is gone, the finished match and the game in progress are not
+    assert [p["username"] for p in client.get("/players").json] == ["Bob", "Carol"]
+    admin = client.get("/admin_data").json
+    assert admin["waiting"] == {}
+    assert admin["active"] == {"C2": {"player1": "Carol", "player2": "Alice"}}
+    assert client.get("/match_status?code=C2").json == {"status": "active", "opponent": "Alice"}
+    assert client.get("/stats").json == stats
+    assert client.get("/scores_history").json["history"] == history
@@ -0,0 +1,51 @@
+from match_store import MatchStore
+
+
+def test_add_and_find_active():
+    store = MatchStore()
+    store.add("Alice", "Bob", "ABC")
+    match = store.find_active("ABC")
+    assert match["player1"] == "Alice"
+    assert match["player2"] == "Bob"
+    assert match["winner"] is None
+    assert store.find_active("missing") is None
+
+
+def test_record_result_targets_latest_active_match():
+    store = MatchStore()
+    first = store.add("Alice", "Bob", "M1")
+    second = store.add("Alice", "Carol", "M2")
+
+    assert store.record_result("Alice") is second
+    assert second["winner"] == "Alice"
+    assert first["winner"] is None
+    assert [m["code"] for m in store.active()] == ["M1"]
+
+    assert store.record_result("Alice") is first
+    assert store.record_result("Alice") is None
+    assert store.active() == []
+    assert store.find_active("M1") is None
+
+
+def test_remove_player_drops_all_indexes():
+    store = MatchStore()
+    store.add("Alice", "Bob", "M1")
+    store.add("Carol", "Dan", "M2")
+    store.add("Bob", "Carol", "M3")
+    store.record_result("Carol")
+
+    assert store.remove_player("Bob") == 2
+    assert [m["code"] for m in store.history()] == ["M2"]
+    assert store.matches_of("Carol") == store.find_by_code("M2")
+    assert store.find_active("M1") is None
+    assert store.record_result("Carol")["code"] == "M2"
+    assert len(store) == 1
+
+
+def test_history_keeps_insertion_order_and_shape():
+    store = MatchStore()
+    for i in range(5):
+        store.add(f"P{i}", f"Q{i}", f"C{i}", timestamp="01/01/2025 10:00")
+    history = store.history()
+    assert [m["code"] for m in history] == [f"C{i}" for i in range(5)]
+    assert set(history[0]) == {"player1", "player2", "timestamp", "winner", "code"}
@@ -0,0 +1,95 @@
+import bisect
+import random
+import time
+
+import pytest
+
+from matchmaking import MatchQueue, Ratings, SortedBuckets
+
+
+def test_elo_update_is_zero_sum_and_favours_upsets():
+    ratings = Ratings()
+    ratings.record("Alice", "Bob")
+    assert ratings.get("Alice") == pytest.approx(1516)
+    assert ratings.get("Alice") + ratings.get("Bob") == pytest.approx(3000)
+
+    # After that first game Alice is the favourite: beating Bob again earns less than an upset
+    upset = Ratings()
+    upset.record("Alice", "Bob")
+    favourite_gain = ratings.record("Alice", "Bob")[0] - 1516
+    upset_gain = upset.record("Bob", "Alice")[0] - 1484
+    assert favourite_gain < 16 < upset_gain
+
+
+def test_queue_pairs_nearest_rating_once_window_allows():
+    queue = MatchQueue(base_window=50, widen_rate=10, max_window=200)
+    queue.enqueue("Low", 1200, now=0)
+    queue.enqueue("Mid", 1500, now=0)
+    queue.enqueue("High", 1580, now=0)
+
+    assert queue.find_partner("Mid", now=0) is None  # 80 apart, window 50
+    assert queue.find_partner("Mid", now=3) == "High"  # Window 80 after 3 s
+    assert queue.find_partner("Low", now=100) is None  # Window capped at 200
+
+    assert queue.sweep(now=3) == [("Mid", "High")]
+    assert len(queue) == 1 and "Low" in queue
+    assert queue.snapshot()["matched_players"] == 2
+    assert queue.snapshot()["max_wait"] == 3
+
+
+def test_sorted_buckets_match_a_sorted_list():
+    rng = random.Random(7)
+    buckets, expected = SortedBuckets(load=4), []
+    for _ in range(2000):
+        if expected and rng.random() < 0.45:
+            item = expected.pop(rng.randrange(len(expected)))
+            buckets.remove(item)
+        else:
+            item = (rng.randint(0, 50), rng.random())
+            bisect.insort(expected, item)
+            buckets.add(item)
+        assert len(buckets) == len(expected)
+        if expected:
+            i = rng.randrange(len(expected))
+            assert buckets.neighbours(expected[i]) == expected[max(i - 1, 0):i] + expected[i + 1:i + 2]
+    assert [item for bucket in buckets._buckets for item in bucket] == expected
+    with pytest.raises(ValueError):
+        buckets.remove((99, 0.5))
+
+
+def test_enqueue_matches_close_ratings(client, server):
+    for name in ("Alice", "Bob", "Carol"):
+        client.post("/auto_join", json={"username": name, "port": 9000})
+    since = client.get("/events/poll?username=Alice&timeout=0").json["last_seq"]
+
+    assert client.post("/enqueue", json={"username": "Ghost"}).status_code == 404
+    queued = client.post("/enqueue", json={"username": "Alice"}).json
+    assert queued["status"] == "queued" and queued["rating"] == 1500 and queued["queue_depth"] == 1
+
+    started = client.post("/enqueue", json={"username": "Bob"}).json
+    assert started["status"] == "match_started" and started["opponent"] == "Alice"
+    event = client.get(f"/events/poll?username=Alice&since={since}&timeout=0").json["events"][-1]
+    assert event["type"] == "match_start" and event["data"]["code"] == started["match_code"]
+
+    client.post("/match_result", json={"winner": "Bob", "loser": "Alice"})
+    assert client.get("/rank/Bob").json["rating"] == 1516
+    assert client.get("/rank/Alice").json["rating"] == 1484
+    assert client.get("/queue_stats").json["queue_depth"] == 0
+
+
+def test_sweep_widens_window_for_waiting_players(client, server):
+    for name in ("Alice", "Bob", "Carol"):
+        client.post("/auto_join", json={"username": name, "port": 9000})
+    for _ in range(5):  # Bob ~1570, Carol ~1430
+        client.post("/match_result", json={"winner": "Bob", "loser": "Carol"})
+
+    assert client.post("/enqueue", json={"username": "Bob"}).json["status"] == "queued"
+    assert client.post("/enqueue", json={"username": "Carol"}).json["status"] == "queued"
+    assert server.sweep_queue(time.time()) == []
+    started = server.sweep_queue(time.time() + 10)
+    assert [(m["player1"], m["player2"]) for m in started] == [("Bob", "Carol")]
+
+    client.post("/enqueue", json={"username": "Alice"})
+    assert client.post("/dequeue", json={"username": "Alice"}).json == {"status": "dequeued"}
+    assert client.post("/dequeue", json={"username": "Alice"}).status_code == 404
+    assert client.get("/metrics.json").json["queue"]["matched_players"] == 2
@@ -0,0 +1,45 @@
+import re
+
+from metrics import RequestMetrics
+
+
+def metric(text, name, **labels):
+    """Value of one sample in a text exposition, None if absent."""
+    wanted = ",".join(f'{k}="{v}"' for k, v in labels.items())
+    pattern = "^" + re.escape(f"{name}{{{wanted}}}" if labels else name) + r" (\S+)$"
+    match = re.search(pattern, text, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics = RequestMetrics(buckets=(0.01, 0.1))
+    for seconds in (0.005, 0.05, 0.05, 3):
+        metrics.observe("/stats", "GET", 200, seconds)
+    text = "\n".join(metrics.render("t"))
+    buckets = [metric(text, "t_request_duration_seconds_bucket", route="/stats", method="GET", le=le)
+               for le in ("0.01", "0.1", "+Inf")]
+    assert buckets == [1, 3, 4]
+    assert metric(text, "t_request_duration_seconds_count", route="/stats", method="GET") == 4
+
+
+def test_metrics_endpoint(server, client, monkeypatch):
+    client.post("/auto_join", json={"username": "Alice", "port": 9000})
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    client.get("/rank/Alice")
+    client.get("/rank/Nobody")
+
+    def broken():
+        raise RuntimeError("boom")
+    monkeypatch.setitem(server.app.view_functions, "get_stats", broken)
+    assert client.get("/stats").status_code == 500
+
+    response = client.get("/metrics")
+    assert response.content_type.startswith("text/plain; version=0.0.4")
+    text = response.data.decode()
+    assert metric(text, "battleship_players") == 1
+    assert metric(text, "battleship_waiting_matches") == 1
+    # One series per URL rule, not per player
+    assert metric(text, "battleship_requests_total", route="/rank/<username>", method="GET", status="200") == 1
+    assert metric(text, "battleship_requests_total", route="/rank/<username>", method="GET", status="404") == 1
+    assert metric(text, "battleship_request_errors_total", route="/stats", method="GET") == 1
+    assert metric(text, "battleship_request_duration_seconds_count", route="/auto_join", method="POST") == 1
@@ -0,0 +1,82 @@
+import os
+import pstats
+import time
+
+import pytest
+
+
+@pytest.fixture
+def profiler(server, tmp_path, monkeypatch):
+    monkeypatch.setattr(server.request_profiler, "directory", str(tmp_path))
+    monkeypatch.setattr(server, "ADMIN_LOOPBACK", True)
+    yield server.request_profiler
+    server.request_profiler.stop()
+
+
+def test_collapsed_stacks_per_route(server, client, profiler):
+    def slow_stats():
+        time.sleep(0.05)
+        return {"slow": True}
+
+    server.app.view_functions["get_stats"] = slow_stats
+    assert client.post("/admin/profile", json={"mode": "collapsed", "interval": 0.001}).json["active"]
+    assert server.app.wsgi_app == server.profiled_wsgi_app
+    client.get("/stats")
+    client.get("/rank/Alice")
+
+    reply = client.post("/admin/profile/stop").json
+    assert server.app.wsgi_app == server.timed_wsgi_app
+    assert reply["profiled"] >= 2
+    path = os.path.join(reply["session"], "stats.collapsed")
+    assert path in reply["files"]
+    with open(path) as f:
+        lines = f.read().splitlines()
+    assert any("slow_stats" in line and line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_pstats_window_switches_itself_off(server, client, profiler):
+    client.post("/auto_join", json={"username": "Alice", "port": 9000})
+    assert client.post("/admin/profile", json={"mode": "pstats", "duration": 0.2}).status_code == 200
+    assert client.post("/admin/profile", json={"mode": "pstats"}).status_code == 409
+    client.get("/rank/Alice")
+    time.sleep(0.25)
+    client.get("/rank/Alice")  # Past the window: not profiled, and turns the profiler off
+
+    assert not profiler.active
+    assert server.app.wsgi_app == server.timed_wsgi_app
+    assert profiler.profiled == 2  # The refused second start and the first /rank
+    stats = pstats.Stats(os.path.join(profiler.session, "rank_username.pstats"))
+    assert any(name == "get_rank" for _, _, name in stats.stats)
+
+
+def test_sessions_in_the_same_second_keep_their_own_files(server, client, profiler, monkeypatch):
+    monkeypatch.setattr(time, "strftime", lambda format: "20250101-120000")
+    sessions = []
+    for _ in range(3):
+        client.post("/admin/profile", json={"mode": "pstats"})
+        client.get("/stats")
+        reply = client.post("/admin/profile/stop").json
+        sessions.append(reply["session"])
+        assert [os.path.dirname(path) for path in reply["files"]] == [reply["session"]]
+
+    assert [os.path.basename(s) for s in sessions] == ["20250101-120000", "20250101-120000-2", "20250101-120000-3"]
+    assert all(len(os.listdir(session)) == 1 for session in sessions)
+
+
+def test_admin_routes_are_closed_by_default(server, client):
+    assert not server.ADMIN_LOOPBACK
+    assert client.get("/admin/profile").status_code == 403
+    assert client.post("/admin/profile", json={"mode": "pstats"}).status_code == 403
+    assert not server.request_profiler.active
+
+
+def test_profile_switch_is_admin_only(server, client, profiler, monkeypatch):
+    assert client.post("/admin/profile", json={"mode": "flame"}).status_code == 400
+    assert client.get("/admin/profile", environ_base={"REMOTE_ADDR": "10.0.0.7"}).status_code == 403
+    # A same-host reverse proxy is not the server's own host once declared
+    monkeypatch.setattr(server, "TRUSTED_PROXIES", frozenset({"127.0.0.1"}))
+    assert client.get("/admin/profile", headers={"X-Forwarded-For": "8.8.8.8"}).status_code == 403
+
+    monkeypatch.setattr(server, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/profile").status_code == 403
+    assert client.get("/admin/profile", headers={"X-Admin-Token": "secret"}).json["active"] is False
@@ -0,0 +1,72 @@
+from ratelimit import RateLimiter
+
+
+def test_bucket_refills_at_rate():
+    limiter = RateLimiter({"read": (2, 3)})
+    assert [limiter.acquire("read", "A", 0.0) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire("read", "A", 0.0) == 0.5  # Next token in 1/rate seconds
+    assert limiter.acquire("read", "B", 0.0) == 0  # Other clients keep their own budget
+    assert limiter.acquire("read", "A", 0.5) == 0
+    assert limiter.stats() == {"clients": 2, "allowed": {"read": 5}, "limited": {"read": 1}}
+
+
+def test_address_bucket_is_shared_by_its_clients():
+    limiter = RateLimiter({"read": (1, 2)}, per_address=2)
+    assert [limiter.acquire("read", f"x{i}", 0.0, "1.2.3.4") for i in range(4)] == [0, 0, 0, 0]
+    assert limiter.acquire("read", "x9", 0.0, "1.2.3.4") == 0.5  # Address bucket: rate and burst doubled
+    assert limiter.acquire("read", "x9", 0.0, "5.6.7.8") == 0
+    assert limiter.acquire("read", None, 0.5, "1.2.3.4") == 0
+
+
+def test_refilled_buckets_are_dropped():
+    limiter = RateLimiter({"read": (10, 10), "batch": (1, 2)})
+    for i in range(1000):
+        limiter.acquire("read", i, i / 1000)
+    assert len(limiter) == 100  # One token takes 0.1 s to refill: only the last 0.1 s of clients are kept
+    limiter.acquire("batch", "late", 5.0)  # 1 s later every read bucket is full again
+    assert len(limiter) == 1
+
+
+def test_from_spec():
+    assert RateLimiter.from_spec("off") is None
+    assert RateLimiter.from_spec("read=20/40, write=5").classes == {"read": (20, 40), "write": (5, 5)}
+
+
+def test_over_limit_gets_429(server, client, monkeypatch):
+    monkeypatch.setattr(server, "limiter", RateLimiter({"read": (1, 2), "write": (1, 1), "batch": (1, 1)}))
+    client.post("/auto_join", json={"username": "Alice", "port": 9000})
+
+    assert client.get("/check_requests/Alice").status_code == 200
+    assert client.get("/check_requests/Alice").status_code == 200
+    response = client.get("/check_requests/Alice")
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert 0 < response.json["retry_after"] <= 1
+
+    # Bob, from the same address, and unlimited routes are not affected
+    assert client.get("/check_requests/Bob").status_code == 200
+    assert client.get("/metrics.json").json["rate_limits"]["limited"]["read"] == 1
+
+
+def test_new_names_do_not_reset_the_budget(server, client, monkeypatch):
+    monkeypatch.setattr(server, "limiter", RateLimiter({"read": (1, 2), "write": (1, 1)}, per_address=3))
+    reads = [client.get(f"/players?username=x{i}").status_code for i in range(7)]
+    assert reads == [200] * 6 + [429]
+    writes = [client.post("/match_result", json={"username": f"x{i}", "winner": "A", "loser": "B"}).status_code
+              for i in range(4)]
+    assert 429 not in writes[:3] and writes[3] == 429
+
+
+def test_forwarded_for_is_only_believed_from_trusted_proxies(server, client, monkeypatch):
+    monkeypatch.setattr(server, "limiter", RateLimiter({"read": (1, 1)}, per_address=1))
+
+    def read(forwarded, remote="127.0.0.1"):
+        return client.get("/players", headers={"X-Forwarded-For": forwarded},
+                          environ_base={"REMOTE_ADDR": remote}).status_code
+
+    # Not configured: every player behind the proxy is the proxy
+    assert [read("1.1.1.1"), read("2.2.2.2")] == [200, 429]
+    monkeypatch.setattr(server, "TRUSTED_PROXIES", frozenset({"127.0.0.1", "10.0.0.1"}))
+    assert [read("3.3.3.3"), read("6.6.6.6, 4.4.4.4, 10.0.0.1"), read("4.4.4.4")] == [200, 200, 429]
+    # Anyone else cannot pick a bucket with the header
+    assert [read("5.5.5.5", "9.9.9.9"), read("7.7.7.7", "9.9.9.9")] == [200, 429]
@@ -0,0 +1,65 @@
+import json
+import socket
+
+import pytest
+
+from relay import MoveRelay, recv_frame, send_frame
+
+
+def connect(relay, username, code="C1"):
+    sock = socket.create_connection(("127.0.0.1", relay.port), timeout=5)
+    send_frame(sock, json.dumps({"username": username, "code": code}).encode())
+    return sock, json.loads(recv_frame(sock))
+
+
+@pytest.fixture
+def relay():
+    opponents = {("C1", "Alice"): "Bob", ("C1", "Bob"): "Alice"}
+    relay = MoveRelay(lambda code, username: opponents.get((code, username)))
+    relay.start("127.0.0.1")
+    yield relay
+    relay.close()
+
+
+def test_forwards_moves_both_ways(relay):
+    alice, welcome = connect(relay, "Alice")
+    assert welcome == {"type": "welcome", "code": "C1", "opponent": "Bob", "opponent_connected": False}
+    send_frame(alice, b'{"move": [1, 2]}')  # Kept until Bob connects
+
+    bob, welcome = connect(relay, "Bob")
+    assert welcome["opponent_connected"]
+    assert recv_frame(bob) == b'{"move": [1, 2]}'
+    send_frame(bob, b'{"move": [3, 4]}')
+    assert recv_frame(alice) == b'{"move": [3, 4]}'
+    assert relay.stats()["forwarded"] == 1 and relay.stats()["queued"] == 1
+
+    relay.close_match("C1", ("Alice", "Bob"))
+    assert recv_frame(alice) is None and recv_frame(bob) is None
+
+
+def test_refuses_players_outside_the_match(relay):
+    sock, reply = connect(relay, "Mallory")
+    assert reply["type"] == "error"
+    assert recv_frame(sock) is None
+
+    sock = socket.create_connection(("127.0.0.1", relay.port), timeout=5)
+    send_frame(sock, b"not json")
+    assert json.loads(recv_frame(sock))["type"] == "error"
+
+
+def test_server_authorizes_active_match_players(server, client):
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    assert server.relay_opponent("C1", "Alice") is None  # Nobody joined yet
+    client.post("/join_match", json={"player_id": "Bob", "code": "C1"})
+    assert server.relay_opponent("C1", "Alice") == "Bob"
+    assert server.relay_opponent("C1", "Carol") is None
+    assert client.get("/relay").json["enabled"] is False
+
+    server.move_relay.start("127.0.0.1")
+    try:
+        bob, welcome = connect(server.move_relay, "Bob")
+        assert welcome["opponent"] == "Alice"
+        client.post("/match_result", json={"winner": "Bob", "loser": "Alice"})
+        assert recv_frame(bob) is None  # The result closes the match's connections
+    finally:
+        server.move_relay.close()
@@ -0,0 +1,36 @@
+def test_unchanged_reads_are_served_from_cache(server, client):
+    client.post("/auto_join", json={"username": "Alice", "port": 9000})
+    first = client.get("/players")
+    second = client.get("/players")
+    assert second.data == first.data
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert server.response_cache.stats()["hits"] >= 1
+
+    # A change to another collection keeps the entry; a change to players replaces it
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    assert client.get("/players").headers["ETag"] == first.headers["ETag"]
+    client.post("/auto_join", json={"username": "Bob", "port": 9001})
+    changed = client.get("/players")
+    assert changed.headers["ETag"] != first.headers["ETag"]
+    assert [p["username"] for p in changed.json] == ["Alice", "Bob"]
+
+
+def test_if_none_match_gets_304(client):
+    client.post("/create_match", json={"player_id": "Alice", "code": "C1"})
+    etag = client.get("/pending_matches").headers["ETag"]
+
+    response = client.get("/pending_matches", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+
+    client.post("/join_match", json={"player_id": "Bob", "code": "C1"})
+    response = client.get("/pending_matches", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json == []
+
+
+def test_errors_are_not_cached(client):
+    assert client.get("/bracket_data").status_code == 400
+    client.post("/auto_join", json={"username": "Alice", "port": 9000})
+    client.post("/auto_join", json={"username": "Bob", "port": 9001})
+    assert client.get("/bracket_data").status_code == 200
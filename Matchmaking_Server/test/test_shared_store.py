@@ -0,0 +1,85 @@
+import importlib.util
+import os
+import threading
+
+import pytest
+
+SERVER_PY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "server.py")
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two independent server modules on the same shared store, like two pre-forked workers."""
+    os.environ.update(BATTLESHIP_STORE="shared", BATTLESHIP_DATA_DIR=str(tmp_path))
+    started = []
+    try:
+        for name in ("worker_a", "worker_b"):
+            spec = importlib.util.spec_from_file_location(name, SERVER_PY)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            started.append(module)
+    finally:
+        os.environ.pop("BATTLESHIP_STORE")
+        os.environ["BATTLESHIP_DATA_DIR"] = ""
+    yield [m.app.test_client() for m in started]
+    for module in started:
+        module.db.close()
+
+
+def test_workers_see_each_others_state(workers):
+    a, b = workers
+    for i in range(5):
+        (a if i % 2 else b).post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    assert a.get("/players").json == b.get("/players").json
+
+    # Same preview on both workers, and the launched bracket is that preview
+    preview = a.get("/bracket_data").json
+    assert b.get("/bracket_data").json == preview
+    b.post("/start_tournament")
+    assert a.get("/bracket_data").json["participants"] == preview["participants"]
+
+    # A result reported to one worker advances the bracket the other serves
+    first = next(m for m in a.get("/bracket_data").json["matches"] if m["status"] == 2)
+    b.post("/start_tournament_match", json={"player1": first["opponent1"]["name"],
+                                           "player2": first["opponent2"]["name"], "match_id": first["id"]})
+    a.post("/match_result", json={"winner": first["opponent1"]["name"], "loser": first["opponent2"]["name"]})
+    assert b.get("/bracket_data").json["matches"][first["id"] - 1]["status"] == 4
+    assert b.get("/leaderboard?top=1").json["scores"] == [[first["opponent1"]["name"], 1]]
+    assert b.get("/stats").json == a.get("/stats").json
+
+    a.post("/reset_tournament")
+    assert not b.get("/tournament_status").json["started"]
+
+
+def test_events_reach_clients_of_other_workers(workers):
+    a, b = workers
+    since = b.get("/events/poll?username=Alice&timeout=0").json["last_seq"]
+    a.post("/create_match", json={"player_id": "Alice", "code": "ABC"})
+    a.post("/join_match", json={"player_id": "Bob", "code": "ABC"})
+
+    polled = b.get(f"/events/poll?username=Alice&since={since}&timeout=2").json
+    assert [e["type"] for e in polled["events"]] == ["match_start"]
+    assert not polled["reset"]
+    # The seq a client got from one worker resumes on the other
+    again = a.get(f"/events/poll?since={polled['last_seq']}&timeout=0").json
+    assert again["events"] == [] and not again["reset"]
+
+
+def test_code_is_joined_once_across_workers(workers):
+    a, b = workers
+    a.post("/create_match", json={"player_id": "Host", "code": "RACE"})
+    statuses = []
+    barrier = threading.Barrier(20)
+
+    def join(i):
+        client = workers[i % 2]
+        barrier.wait()
+        statuses.append(client.post("/join_match", json={"player_id": f"J{i}", "code": "RACE"}).status_code)
+
+    threads = [threading.Thread(target=join, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert sorted(statuses) == [200] + [404] * 19
+    assert len(b.get("/admin_data").json["history"]) == 1
@@ -0,0 +1,93 @@
+import importlib
+import os
+
+import pytest
+
+from match_store import MatchStore, WaitingMatches
+from sqlite_store import SqliteDatabase, SqliteLeaderboard, SqliteMatchStore, SqliteWaitingMatches
+from stats import Leaderboard
+
+
+@pytest.fixture
+def db():
+    database = SqliteDatabase(":memory:", batch_size=4)
+    yield database
+    database.close()
+
+
+def test_match_store_parity(db):
+    memory, sqlite = MatchStore(), SqliteMatchStore(db)
+    for store in (memory, sqlite):
+        store.add("Alice", "Bob", "M1", "01/01/2025 10:00")
+        store.add("Alice", "Carol", "M2", "01/01/2025 10:01")
+        store.add("Dan", "Bob", "M3", "01/01/2025 10:02")
+        store.record_result("Alice", 30)
+        store.record_result("Bob", 10)
+        store.remove_player("Dan")
+
+    assert sqlite.history() == memory.history()
+    assert sqlite.active() == memory.active()
+    assert sqlite.find_active("M1") == memory.find_active("M1")
+    assert sqlite.matches_of("Alice") == memory.matches_of("Alice")
+    assert sqlite.stats.snapshot() == memory.stats.snapshot()
+    assert len(sqlite) == len(memory) == 2
+
+
+def test_leaderboard_parity(db):
+    memory, sqlite = Leaderboard(), SqliteLeaderboard(db)
+    for board in (memory, sqlite):
+        for name in ["Alice", "Bob", "Carol", "Dan"]:
+            board.add_player(name)
+        for name in ["Carol", "Bob", "Carol", "Dan", "Bob"]:
+            board.add_points(name)
+
+    assert sqlite.ranked() == memory.ranked()
+    assert sqlite.top(2) == memory.top(2)
+    assert [sqlite.rank(n) for n in "Alice Bob Carol Dan".split()] == [memory.rank(n) for n in "Alice Bob Carol Dan".split()]
+
+
+def test_waiting_matches_parity(db):
+    memory, sqlite = WaitingMatches(), SqliteWaitingMatches(db)
+    for waiting in (memory, sqlite):
+        for code, creator in [("W1", "Alice"), ("W2", "Bob"), ("W3", "Alice"), ("W4", "Alice")]:
+            waiting[code] = {"creator": creator, "created_at": 0}
+        waiting["W3"] = {"creator": "Bob", "created_at": 1}  # Taken over by another creator
+        del waiting["W1"]
+        assert waiting.pop("W2")["creator"] == "Bob"
+
+    assert dict(sqlite.items()) == dict(memory.items())
+    assert sqlite.codes_of("Alice") == memory.codes_of("Alice") == ["W4"]
+    assert sqlite.codes_of("Bob") == memory.codes_of("Bob") == ["W3"]
+    assert sqlite.codes_of("Carol") == memory.codes_of("Carol") == []
+
+
+def test_sqlite_state_survives_restart(tmp_path):
+    import server as module
+
+    def start():
+        os.environ.update(BATTLESHIP_STORE="sqlite", BATTLESHIP_DATA_DIR=str(tmp_path))
+        try:
+            return importlib.reload(module)
+        finally:
+            os.environ.pop("BATTLESHIP_STORE")
+            os.environ["BATTLESHIP_DATA_DIR"] = ""
+
+    srv = start()
+    client = srv.app.test_client()
+    for i in range(4):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    client.post("/create_match", json={"player_id": "P0", "code": "WAIT"})
+    client.post("/propose_match", json={"from": "P1", "to": "P2", "code": "REQ"})
+    client.post("/start_tournament")
+    first = client.get("/bracket_data").json["matches"][0]
+    client.post("/match_result", json={"winner": first["opponent1"]["name"], "loser": first["opponent2"]["name"]})
+    before = {r: client.get(r).json for r in ("/players", "/admin_data", "/stats", "/bracket_data", "/pending_matches")}
+    srv.db.close()
+
+    srv = start()
+    client = srv.app.test_client()
+    try:
+        assert {r: client.get(r).json for r in before} == before
+        assert client.get("/check_requests/P2").json == {"from": "P1", "code": "REQ"}
+    finally:
+        srv.db.close()
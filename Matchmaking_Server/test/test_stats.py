@@ -0,0 +1,84 @@
+import random
+
+from match_store import MatchStore
+from stats import Leaderboard
+
+
+def test_leaderboard_matches_sorted_scores():
+    scores = {}
+    board = Leaderboard()
+    events = ["Alice", "Bob", "Carol", "Bob", "Dan", "Carol", "Carol", "Alice", "Bob"]
+    for name in ["Alice", "Bob", "Carol", "Dan", "Eve"]:
+        scores.setdefault(name, 0)
+        board.add_player(name)
+    for name in events:
+        scores[name] = scores.get(name, 0) + 1
+        board.add_points(name)
+        assert board.ranked() == sorted(scores.items(), key=lambda x: -x[1])
+
+
+def test_leaderboard_top_and_rank():
+    board = Leaderboard()
+    for name, points in [("Alice", 3), ("Bob", 5), ("Carol", 3), ("Dan", 0)]:
+        board.add_player(name)
+        board.add_points(name, points)
+
+    assert board.top(2) == [("Bob", 5), ("Alice", 3)]
+    assert board.rank("Bob") == 1
+    assert board.rank("Alice") == 2
+    assert board.rank("Carol") == 2
+    assert board.rank("Dan") == 4
+    assert board.rank("Nobody") is None
+
+
+def test_leaderboard_random_updates_match_a_full_sort():
+    rng = random.Random(7)
+    scores = {}
+    board = Leaderboard()
+    for step in range(2000):
+        name = f"P{rng.randrange(60)}"
+        points = rng.choice([0, 1, 1, 1, 5, 40])  # Large jumps grow the score tree
+        if rng.random() < 0.2:
+            scores.setdefault(name, 0)
+            board.add_player(name)
+        else:
+            scores[name] = scores.get(name, 0) + points
+            assert board.add_points(name, points) == scores[name]
+        if step % 50:
+            continue
+        expected = sorted(scores.items(), key=lambda x: -x[1])
+        assert board.top(7) == expected[:7]
+        assert board.ranked() == expected
+        assert board.top(7) == expected[:7]  # From the kept ranking this time
+        for name, score in scores.items():
+            assert board.rank(name) == 1 + sum(1 for s in scores.values() if s > score)
+
+
+def test_leaderboard_route_top(client):
+    for port, name in enumerate(["Alice", "Bob", "Carol"], start=9000):
+        client.post("/auto_join", json={"username": name, "port": port})
+    client.post("/match_result", json={"winner": "Carol", "loser": "Alice"})
+
+    assert client.get("/leaderboard?top=-1").status_code == 400
+    assert client.get("/leaderboard?top=0").json["scores"] == []
+    assert client.get("/leaderboard?top=2").json["scores"] == [["Carol", 1], ["Alice", 0]]
+    assert len(client.get("/leaderboard?top=10").json["scores"]) == 3
+
+
+def test_match_stats_follow_store_changes():
+    store = MatchStore()
+    store.add("Alice", "Bob", "M1")
+    store.add("Carol", "Dan", "M2")
+    store.record_result("Alice", duration=30)
+    store.record_result("Dan", duration=10)
+
+    stats = store.stats.snapshot()
+    assert stats["total_matches"] == 2
+    assert stats["avg_duration"] == 20
+    assert stats["win_percentages"] == {"Alice": 50.0, "Dan": 50.0}
+
+    store.remove_player("Bob")
+    stats = store.stats.snapshot()
+    assert stats["total_matches"] == 1
+    assert stats["avg_duration"] == 10
+    assert stats["win_percentages"] == {"Dan": 100.0}
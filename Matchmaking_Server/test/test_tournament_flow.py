@@ -1,5 +1,4 @@
 import requests
-import time
 import pytest
 
 SERVER_URL = "http://localhost:5000"
@@ -16,10 +15,9 @@ players = [
 ]
 
 def test_register_players():
-    for player in players:
-        r = requests.post(f"{SERVER_URL}/auto_join", json=player)
-        assert r.status_code == 200
-        time.sleep(0.05)
+    r = requests.post(f"{SERVER_URL}/auto_join/batch", json=players)
+    assert r.status_code == 200
+    assert [item["http_status"] for item in r.json()["results"]] == [200] * len(players)
 
 def test_start_tournament():
     r = requests.post(f"{SERVER_URL}/start_tournament")
@@ -29,37 +27,23 @@ def test_start_tournament():
     assert len(data["players"]) == len(players)
 
 def test_simulate_match_results():
-    r = requests.get(f"{SERVER_URL}/bracket_data")
-    assert r.status_code == 200
-    bracket = r.json()
-    matches = bracket.get("matches", [])
-    rounds = sorted(set(m["round"] for m in matches if m.get("round") is not None))
-
-    # Simule tous les matchs de tous les rounds
-    for rnd in rounds:
-        current_matches = [m for m in matches if m["round"] == rnd]
-        for match in current_matches:
-            op1 = match.get("opponent1") or {}
-            op2 = match.get("opponent2") or {}
-            p1 = op1.get("name")
-            p2 = op2.get("name")
-            if p1 and p2 and not op1.get("result") and not op2.get("result"):
-                winner = p1
-                loser = p2
-                # Lancer le match
-                requests.post(f"{SERVER_URL}/start_tournament_match", json={
-                    "player1": p1,
-                    "player2": p2,
-                    "match_id": match["id"]
-                })
-                # Soumettre le résultat
-                res = requests.post(f"{SERVER_URL}/match_result", json={
-                    "winner": winner,
-                    "loser": loser
-                })
-                assert res.status_code == 200
-                assert res.json()["status"] == "result recorded"
-                time.sleep(0.05)
+    # Joue le tournoi round par round : un lot de lancements puis un lot de résultats
+    while True:
+        r = requests.get(f"{SERVER_URL}/bracket_data")
+        assert r.status_code == 200
+        ready = [m for m in r.json().get("matches", []) if m["status"] == 2]
+        if not ready:
+            break
+        started = requests.post(f"{SERVER_URL}/start_tournament_match/batch", json=[
+            {"player1": m["opponent1"]["name"], "player2": m["opponent2"]["name"], "match_id": m["id"]}
+            for m in ready
+        ])
+        assert started.status_code == 200
+        res = requests.post(f"{SERVER_URL}/match_result/batch", json=[
+            {"winner": m["opponent1"]["name"], "loser": m["opponent2"]["name"]} for m in ready
+        ])
+        assert res.status_code == 200
+        assert [item["status"] for item in res.json()["results"]] == ["result recorded"] * len(ready)
 
 def test_final_winner():
     r = requests.get(f"{SERVER_URL}/bracket_data")
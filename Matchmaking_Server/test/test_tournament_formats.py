@@ -0,0 +1,121 @@
+import itertools
+
+import pytest
+
+from tournament_formats import RoundFormat, RoundRobin, Swiss, load_format
+
+
+def play_out(tournament):
+    """Play every game ready() hands out, opponent1 winning; returns the number played."""
+    played = 0
+    while True:
+        ready = tournament.ready(tournament.names)
+        if not ready:
+            return played
+        for index in ready:
+            assert tournament.record_result(*tournament.opponents(index)) == index
+            played += 1
+
+
+def test_round_robin_pairs_everyone_once():
+    players = [f"P{i}" for i in range(7)]
+    tournament = RoundRobin.build(players, seed=3)
+    assert len(tournament) == 21
+    assert len(tournament.round_starts) == 7  # Odd count: one player sits out each round
+    assert {frozenset(tournament.opponents(i)) for i in range(21)} == set(map(frozenset, itertools.combinations(players, 2)))
+
+    ready = tournament.ready(players)
+    assert len(ready) == 3  # As many games as disjoint pairs
+    assert len({name for i in ready for name in tournament.opponents(i)}) == 6
+    assert play_out(tournament) == 21 and all(tournament.results)
+    assert tournament.record_result("P0", "P1") is None
+
+
+def test_swiss_pairs_by_standings_without_rematches():
+    players = [f"P{i}" for i in range(9)]
+    tournament = Swiss.build(players, seed=5)
+    assert tournament.rounds == 4
+    games = len(tournament)
+    assert tournament.ready(players)  # Only round 1 exists until it is complete
+    assert tournament.record_result(*tournament.opponents(0)) == 0
+    assert len(tournament) == games
+
+    play_out(tournament)
+    assert len(tournament.round_starts) == 4
+    pairs = [frozenset(tournament.opponents(i)) for i in range(len(tournament)) if None not in tournament.opponents(i)]
+    assert len(pairs) == len(set(pairs)) == 16
+    assert sum(tournament.points) == len(tournament)  # A win per game, byes included
+    assert sum(1 for i in range(len(tournament)) if tournament.opponents(i)[1] is None) == 4
+
+
+def test_formats_restore_from_state():
+    for cls in (RoundRobin, Swiss):
+        tournament = cls.build([f"P{i}" for i in range(6)], seed=9)
+        for index in tournament.ready(tournament.names)[:2]:
+            tournament.record_result(*reversed(tournament.opponents(index)))
+        restored = load_format(tournament.to_state())
+        assert type(restored) is cls
+        assert restored.to_dict() == tournament.to_dict()
+        assert play_out(restored) == play_out(tournament)
+
+
+def test_incomplete_format_fails_at_construction():
+    class NoResults(RoundFormat):
+        kind = "no_results"
+
+        def ready(self, free):
+            return []
+
+    with pytest.raises(TypeError, match="_game_of"):
+        NoResults.build(["A", "B"], seed=1)
+
+
+def test_auto_dispatch_plays_out_elimination(server, client):
+    for i in range(6):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    client.post("/create_match", json={"player_id": "P0", "code": "C1"})
+    client.post("/join_match", json={"player_id": "Guest", "code": "C1"})  # P0 is busy
+    assert client.post("/start_tournament", json={"format": "knockout"}).status_code == 400
+    assert client.post("/start_tournament", json={"auto_dispatch": True}).status_code == 200
+    assert client.get("/tournament_status").json["auto_dispatch"]
+
+    def started():
+        return [m for m in client.get("/admin_data").json["history"] if m["winner"] is None]
+
+    first = started()
+    assert first[0]["code"] == "C1" and len(first) > 1
+    assert all("P0" not in (m["player1"], m["player2"]) for m in first[1:])
+    client.post("/match_result", json={"winner": "Guest", "loser": "P0"})  # Frees P0 for the bracket
+
+    results = 0
+    while started():
+        match = started()[0]
+        client.post("/match_result", json={"winner": match["player1"], "loser": match["player2"]})
+        results += 1
+    bracket = client.get("/bracket_data").json
+    assert results == 5 and all(m["status"] == 4 for m in bracket["matches"])
+
+
+def test_start_round_robin(server, client):
+    for i in range(4):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    assert client.post("/start_tournament", json={"format": "round_robin"}).json["format"] == "round_robin"
+    assert client.get("/tournament_status").json["format"] == "round_robin"
+    assert client.get("/admin_data").json["history"] == []  # No auto_dispatch: nothing started
+
+    matches = client.get("/bracket_data").json["matches"]
+    assert len(matches) == 6
+    p1, p2 = matches[0]["opponent1"]["name"], matches[0]["opponent2"]["name"]
+    assert client.post("/start_tournament_match", json={"player1": p1, "player2": p2, "match_id": 1}).status_code == 200
+    client.post("/match_result", json={"winner": p2, "loser": p1})
+    assert client.get("/bracket_data").json["matches"][0]["opponent2"]["result"] == "win"
+
+
+@pytest.mark.parametrize("rounds", [True, 0, 4, "2", 2.0])
+def test_start_swiss_rejects_bad_rounds(server, client, rounds):
+    for i in range(4):
+        client.post("/auto_join", json={"username": f"P{i}", "port": 9000 + i})
+    response = client.post("/start_tournament", json={"format": "swiss", "rounds": rounds})
+    assert response.status_code == 400
+    assert not client.get("/tournament_status").json["started"]
+    assert client.post("/start_tournament", json={"format": "swiss", "rounds": 3}).status_code == 200
@@ -0,0 +1,294 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+from abc import ABC, abstractmethod
+from array import array
+import bisect
+import random
+
+from bracket_generator import BYE, OPPONENT1_WON, OPPONENT2_WON, PENDING, Bracket
+
+FORMATS = ("single_elimination", "round_robin", "swiss")
+
+
+class RoundFormat(ABC):
+    """Games grouped in rounds, stored like a Bracket: two participant slots and one result byte per game.
+
+    Game ``index`` is match id ``index + 1``; ``round_starts`` holds the index
+    of the first game of each round. Subclasses decide which games exist, which
+    of them ``ready()`` hands out and how ``_game_of()`` finds a result's game.
+    """
+
+    kind = ""
+
+    def __init__(self, names: List[str], seed: int):
+        self.seed = seed
+        self.names = names  # participant id - 1 -> name, in seeded order
+        self.slots = array("i")
+        self.results = bytearray()
+        self.round_starts: List[int] = []
+        self._lookup: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def build(cls, players: List[str], seed: Optional[int] = None, **options: Any) -> "RoundFormat":
+        """Seed ``players`` like Bracket.build: the same player set and seed give the same games."""
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        names = sorted(players)
+        random.Random(seed).shuffle(names)
+        return cls(names, seed, **options)
+
+    def __len__(self) -> int:
+        return len(self.results)
+
+    def round_of(self, index: int) -> int:
+        return bisect.bisect_right(self.round_starts, index)
+
+    def opponents(self, index: int) -> Tuple[str, Optional[str]]:
+        p1, p2 = self.slots[2 * index], self.slots[2 * index + 1]
+        return self.names[p1], self.names[p2] if p2 >= 0 else None
+
+    def to_state(self) -> Dict[str, Any]:
+        return {"format": self.kind, "seed": self.seed, "names": self.names, "results": self.results.hex()}
+
+    def _participant(self, name: str) -> Optional[int]:
+        if self._lookup is None:
+            self._lookup = {n: i for i, n in enumerate(self.names)}
+        return self._lookup.get(name)
+
+    def _add_game(self, p1: int, p2: int) -> int:
+        self.slots.extend((p1, p2))
+        self.results.append(PENDING)
+        return len(self.results) - 1
+
+    @abstractmethod
+    def ready(self, free: Iterable[str]) -> List[int]:
+        """Indexes of the pending games that can start now among the ``free`` players."""
+
+    @abstractmethod
+    def _game_of(self, winner: str, loser: str) -> Optional[Tuple[int, int]]:
+        """(index, result) of the pending game between ``winner`` and ``loser``; None if there is none."""
+
+    def _set_result(self, index: int, result: int) -> None:
+        self.results[index] = result
+
+    def record_result(self, winner: str, loser: str) -> Optional[int]:
+        """Record ``winner`` beating ``loser``; returns the game index, or None when they have no pending game."""
+        found = self._game_of(winner, loser)
+        if found is None:
+            return None
+        self._set_result(*found)
+        return found[0]
+
+    # === SERIALIZATION ===
+
+    def match(self, index: int) -> Dict[str, Any]:
+        """The brackets-viewer style dict for the game at ``index``, like Bracket.match()."""
+        result = self.results[index]
+        opponents = []
+        for slot in (0, 1):
+            participant = self.slots[2 * index + slot]
+            if participant < 0:
+                opponents.append(None)
+                continue
+            opponent = {"id": participant + 1, "name": self.names[participant]}
+            if result:
+                opponent["result"] = "win" if result == slot + 1 else "loss"
+            opponents.append(opponent)
+        rnd = self.round_of(index)
+        return {
+            "id": index + 1,
+            "stage_id": 1,
+            "round": rnd,
+            "group": 0,
+            "child_count": 1,
+            "status": 4 if result else 2,
+            "position": index - self.round_starts[rnd - 1],
+            "opponent1": opponents[0],
+            "opponent2": opponents[1],
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": [{"id": 1, "name": "Main", "tournament_id": 0, "type": self.kind, "number": 1}],
+            "matches": [self.match(i) for i in range(len(self.results))],
+            "participants": [{"id": i + 1, "name": name} for i, name in enumerate(self.names)],
+            "seed": self.seed
+        }
+
+
+class RoundRobin(RoundFormat):
+    """Everyone plays everyone once.
+
+    Games are laid out in rounds by the circle method, but the rounds are only
+    a display order: ``ready()`` pairs any two free players who still have to
+    meet, so nobody waits for the slowest game of a round.
+    """
+
+    kind = "round_robin"
+
+    def __init__(self, names: List[str], seed: int):
+        super().__init__(names, seed)
+        n = len(names)
+        self.remaining = array("i", [n - 1]) * n  # Games left per participant
+        self._games: Dict[Tuple[int, int], int] = {}  # {(lower id, higher id): game index}
+        circle = list(range(n)) + ([BYE] if n % 2 else [])
+        for _ in range(len(circle) - 1):
+            self.round_starts.append(len(self.results))
+            for i in range(len(circle) // 2):
+                p1, p2 = circle[i], circle[-1 - i]
+                if p1 != BYE and p2 != BYE:
+                    self._games[(min(p1, p2), max(p1, p2))] = self._add_game(p1, p2)
+            circle.insert(1, circle.pop())
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "RoundRobin":
+        tournament = cls(state["names"], state["seed"])
+        for index, result in enumerate(bytes.fromhex(state["results"])):
+            if result:
+                tournament._set_result(index, result)
+        return tournament
+
+    def ready(self, free: Iterable[str]) -> List[int]:
+        """Games to start among the ``free`` players, pairing those with the most games left first."""
+        ids = sorted((p for p in map(self._participant, free) if p is not None and self.remaining[p]),
+                     key=lambda p: (-self.remaining[p], p))
+        taken: Set[int] = set()
+        games = []
+        for p in ids:
+            if p in taken:
+                continue
+            for q in ids:
+                index = self._games.get((min(p, q), max(p, q)))
+                if q not in taken and index is not None and not self.results[index]:
+                    games.append(index)
+                    taken.update((p, q))
+                    break
+        return sorted(games)
+
+    def _game_of(self, winner: str, loser: str) -> Optional[Tuple[int, int]]:
+        w, l = self._participant(winner), self._participant(loser)
+        if w is None or l is None:
+            return None
+        index = self._games.get((min(w, l), max(w, l)))
+        if index is None or self.results[index]:
+            return None
+        return index, OPPONENT1_WON if self.slots[2 * index] == w else OPPONENT2_WON
+
+    def _set_result(self, index: int, result: int) -> None:
+        super()._set_result(index, result)
+        self.remaining[self.slots[2 * index]] -= 1
+        self.remaining[self.slots[2 * index + 1]] -= 1
+
+
+class Swiss(RoundFormat):
+    """``rounds`` rounds (log2 of the player count by default), each paired from the standings.
+
+    Players are ranked by wins, then seed; each one in turn meets the next
+    ranked player they have not met yet (a rematch only when nobody else is
+    left). With an odd count the lowest ranked player without a bye yet gets
+    one, worth a win. A round is paired once the previous one is complete.
+    More than ``n - 1`` rounds would force rematches: /start_tournament refuses them.
+    """
+
+    kind = "swiss"
+
+    def __init__(self, names: List[str], seed: int, rounds: Optional[int] = None):
+        super().__init__(names, seed)
+        n = len(names)
+        self.rounds = rounds if rounds is not None else max(1, (n - 1).bit_length())
+        self.points = array("i", [0]) * n
+        self._had_bye = bytearray(n)
+        self._current = array("i", [-1]) * n  # participant -> their game in the current round
+        self._met: Set[Tuple[int, int]] = set()
+        self._open = 0  # Pending games in the current round
+        self._pair_round()
+
+    @classmethod
+    def from_state(cls, state: Dict[str, Any]) -> "Swiss":
+        tournament = cls(state["names"], state["seed"], state["rounds"])
+        # Each round is paired when the last result of the one before is set,
+        # so replaying the results in order rebuilds every round
+        for index, result in enumerate(bytes.fromhex(state["results"])):
+            if result and not tournament.results[index]:
+                tournament._set_result(index, result)
+        return tournament
+
+    def to_state(self) -> Dict[str, Any]:
+        return {**super().to_state(), "rounds": self.rounds}
+
+    def current_match(self, name: str) -> Optional[int]:
+        participant = self._participant(name)
+        if participant is None:
+            return None
+        index = self._current[participant]
+        if index < 0 or self.results[index]:
+            return None
+        return index
+
+    def ready(self, free: Iterable[str]) -> List[int]:
+        """Pending games of the current round whose two players are ``free``."""
+        free = set(free)
+        games = []
+        for index in range(self.round_starts[-1], len(self.results)):
+            p1, p2 = self.opponents(index)
+            if not self.results[index] and p1 in free and p2 in free:
+                games.append(index)
+        return games
+
+    def _pair_round(self) -> None:
+        order = sorted(range(len(self.names)), key=lambda p: (-self.points[p], p))
+        bye = None
+        if len(order) % 2:
+            bye = next((p for p in reversed(order) if not self._had_bye[p]), order[-1])
+            order.remove(bye)
+        self.round_starts.append(len(self.results))
+        while order:
+            p = order.pop(0)
+            q = next((q for q in order if (min(p, q), max(p, q)) not in self._met), order[0])
+            order.remove(q)
+            index = self._add_game(p, q)
+            self._current[p] = self._current[q] = index
+            self._met.add((min(p, q), max(p, q)))
+            self._open += 1
+        if bye is not None:
+            index = self._add_game(bye, BYE)
+            self._current[bye] = index
+            self._had_bye[bye] = 1
+            self.results[index] = OPPONENT1_WON
+            self.points[bye] += 1
+
+    def _game_of(self, winner: str, loser: str) -> Optional[Tuple[int, int]]:
+        index = self.current_match(winner)
+        if index is None:
+            return None
+        p1, p2 = self.slots[2 * index], self.slots[2 * index + 1]
+        w, l = self._participant(winner), self._participant(loser)
+        if {w, l} != {p1, p2}:
+            return None
+        return index, OPPONENT1_WON if p1 == w else OPPONENT2_WON
+
+    def _set_result(self, index: int, result: int) -> None:
+        super()._set_result(index, result)
+        self.points[self.slots[2 * index + result - 1]] += 1
+        self._open -= 1
+        if not self._open and len(self.round_starts) < self.rounds:
+            self._pair_round()
+
+
+Tournament = Union[Bracket, RoundRobin, Swiss]
+
+
+def build_format(kind: str, players: List[str], seed: Optional[int] = None, rounds: Optional[int] = None) -> Tournament:
+    """A Bracket, RoundRobin or Swiss of ``players`` by format name."""
+    if kind == "single_elimination":
+        return Bracket.build(players, seed)
+    if kind == "round_robin":
+        return RoundRobin.build(players, seed)
+    if kind == "swiss":
+        return Swiss.build(players, seed, rounds=rounds)
+    raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+
+
+def load_format(state: Dict[str, Any]) -> Tournament:
+    """Inverse of ``to_state()`` for any format; Bracket states predate the "format" key."""
+    kind = state.get("format", "single_elimination")
+    return {"single_elimination": Bracket, "round_robin": RoundRobin, "swiss": Swiss}[kind].from_state(state)
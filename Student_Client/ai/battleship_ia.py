@@ -1,7 +1,5 @@
 import random
-import socket
 import threading
-import requests
 import json
 import time
 from Student_Client.core.BattleshipConnection import BattleshipConnection
@@ -14,6 +12,7 @@ USERNAME = config["username"]
 PORT = config["port"]
 SERVER_URL = config["matchmaking_url"]
 MATCH_CODE = config.get("match_code", "MATCH_AI")
+USE_RELAY = config.get("relay", False)  # Coups transmis par le relais du serveur (connexion persistante)
 
 # === Connexion au serveur de matchmaking ===
 conn = BattleshipConnection(USERNAME, PORT, SERVER_URL)
@@ -64,21 +63,11 @@ def envoyer_coup(move):
     if not conn.opponent:
         print("⚠️ Aucun adversaire connu.")
         return
-    try:
-        r = requests.get(f"{SERVER_URL}/players")
-        players = r.json()
-        target = next((p for p in players if p["username"] == conn.opponent), None)
-        if not target:
-            print("❌ Adversaire introuvable.")
-            return
-        ip, port = target["ip"], target["port"]
-        s = socket.socket()
-        s.connect((ip, port))
-        s.send(json.dumps({"move": list(move)}).encode())
-        s.close()
+    # Relais ou adresse de l'adversaire en cache : pas de /players à chaque coup
+    if conn.send_move(move):
         print(f"🚀 Coup envoyé vers {move}")
-    except Exception as e:
-        print("❌ Erreur lors de l'envoi :", e)
+    else:
+        print("❌ Erreur lors de l'envoi.")
 
 # === MATCHMAKING ===
 def rejoindre_ou_creer_match():
@@ -88,7 +77,7 @@ def rejoindre_ou_creer_match():
         success = conn.propose_match(adversaire, MATCH_CODE)
         if success:
             print("🕒 Attente de confirmation...")
-            time.sleep(5)
+            conn.wait_for_match(MATCH_CODE, timeout=120)
 
 # === BOUCLE DE JEU PRINCIPALE ===
 def boucle_de_jeu():
@@ -98,6 +87,7 @@ def boucle_de_jeu():
             move = ai.choose_next_move()
             if move:
                 envoyer_coup(move)
+                ai.pos_visited.add(move)  # Même si l'adversaire ne renvoie pas de résultat
                 conn.my_turn = False
 
 # === LISTENER CUSTOM : gère les coups reçus + maj IA ===
@@ -106,20 +96,24 @@ def start_game_with_ai():
         try:
             move = tuple(json.loads(data)["move"])
             print(f"📥 Coup reçu : {move}")
-            result = "MISS"
             if conn.game_board.get(move) == "SHIP":
                 conn.game_board[move] = "HIT"
-                result = "HIT"
                 print(f"💥 Touché en {move}")
             else:
                 conn.game_board[move] = "MISS"
-            ai.mark_result(move, result)
             conn.moves.append(move)
             conn.check_victory()
         except Exception as e:
             print("❌ Erreur gestion du coup :", e)
 
+    def custom_result(move, result):
+        # Résultat d'un de nos tirs : l'IA vise ensuite autour des cases touchées
+        conn.shots[move] = result
+        ai.mark_result(move, result)
+        print(f"🎯 Tir en {move} : {'touché' if result == 'HIT' else 'manqué'}")
+
     conn.handle_opponent_move = custom_handle
+    conn.handle_shot_result = custom_result
     conn.start_game()
 
 # === EXECUTION ===
@@ -129,6 +123,8 @@ if __name__ == "__main__":
     if conn.is_match_active:
         auto_place_ships()
         start_game_with_ai()
+        if USE_RELAY:
+            conn.connect_relay()
         boucle_de_jeu()
         print("🏁 Fin du match")
         if conn.winner:
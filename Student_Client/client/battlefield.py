@@ -2,8 +2,6 @@ import pygame
 import sys
 import threading
 import json
-import requests
-import socket
 import time
 from Student_Client.core.BattleshipConnection import BattleshipConnection
 
@@ -14,6 +12,7 @@ with open("Student_Client/client/config.json") as f:
 USERNAME = config["username"]
 PORT = config["port"]
 SERVER_URL = config["matchmaking_url"]
+USE_RELAY = config.get("relay", False)  # Coups transmis par le relais du serveur (connexion persistante)
 MATCH_CODE = input("💬 Entrez le code de match à utiliser (ex: ABC123) : ").strip()
 
 # === INITIALISATION DE LA CONNEXION ===
@@ -66,33 +65,22 @@ def draw_board(board, top_offset, title):
                 pygame.draw.rect(screen, GRAY, rect.inflate(-4, -4))
 
 def envoyer_coup(move):
-    try:
-        r = requests.get(f"{SERVER_URL}/players")
-        if r.status_code == 200:
-            players = r.json()
-            opponent_info = next((p for p in players if p["username"] == conn.opponent), None)
-            if opponent_info:
-                ip = opponent_info["ip"]
-                port = opponent_info["port"]
-                s = socket.socket()
-                s.connect((ip, port))
-                s.send(json.dumps({"move": list(move)}).encode())  # list() car JSON n’aime pas les tuples
-                s.close()
-                print(f"🧨 Coup envoyé en {move}")
-            else:
-                print("⚠️ Adversaire non trouvé sur le serveur.")
-    except Exception as e:
-        print(f"❌ Erreur lors de l'envoi du coup : {e}")
+    # Relais du serveur s'il est actif, sinon adresse de l'adversaire gardée pour tout le match :
+    # aucune requête au serveur de matchmaking à chaque coup
+    if conn.send_move(move):
+        print(f"🧨 Coup envoyé en {move}")
+    else:
+        print("⚠️ Coup non envoyé : adversaire injoignable.")
 
 def game_loop():
     placing = True
     ships_placed = 0
-    opponent_board = {}
 
     while True:
         screen.fill(WHITE)
         draw_board(conn.game_board, MARGIN, f"🛡 Votre plateau ({USERNAME})")
-        draw_board(opponent_board, HEIGHT // 2 + MARGIN // 2, f"🎯 Plateau adverse ({conn.opponent or 'inconnu'})")
+        # Nos tirs, touchés ou manqués d'après les résultats renvoyés par l'adversaire
+        draw_board(conn.shots, HEIGHT // 2 + MARGIN // 2, f"🎯 Plateau adverse ({conn.opponent or 'inconnu'})")
         pygame.display.flip()
 
         for event in pygame.event.get():
@@ -133,9 +121,11 @@ if not conn.join_match(MATCH_CODE):
     opponent = input("➕ Nom de l'adversaire : ")
     if conn.propose_match(opponent, MATCH_CODE):
         print("⏳ En attente de l'adversaire...")
-        time.sleep(5)
+        conn.wait_for_match(MATCH_CODE, timeout=120)
 
 if conn.is_match_active:
+    if USE_RELAY:
+        conn.connect_relay()
     game_loop()
 else:
     print("❌ Impossible de lancer le match.")
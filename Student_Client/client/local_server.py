@@ -101,26 +101,76 @@ def match_result():
     except Exception as e:
         print("❌ Impossible de soumettre le résultat du match :", e)
 
+# === ÉVÉNEMENTS POUSSÉS PAR LE SERVEUR (long-poll) ===
+def poll_evenements(since, timeout=25):
+    params = {"username": USERNAME, "timeout": timeout}
+    if since is not None:
+        params["since"] = since
+    r = requests.get(f"{SERVER_URL}/events/poll", params=params, timeout=timeout + 10)
+    if r.status_code == 404:
+        return None  # Serveur sans canal d'événements
+    data = r.json()
+    return data["last_seq"], data["events"]
+
+def position_evenements():
+    try:
+        result = poll_evenements(None, timeout=0)
+        return result[0] if result else None
+    except Exception:
+        return None
+
+def attendre_debut_match(code, since):
+    """Attend l'annonce du match par le serveur, ou interroge /match_status s'il ne pousse pas d'événements"""
+    while True:
+        result = poll_evenements(since)
+        if result is None:
+            break
+        since, events = result
+        for event in events:
+            if event["type"] == "match_start" and event["data"]["code"] == code:
+                data = event["data"]
+                return data["player2"] if data["player1"] == USERNAME else data["player1"]
+
+    while True:
+        status = requests.get(f"{SERVER_URL}/match_status", params={"code": code})
+        if status.status_code == 200:
+            data = status.json()
+            if data.get("status") == "active":
+                return data.get("opponent")
+        time.sleep(5)
+
+def ecouter_demandes():
+    """Reçoit les demandes de match poussées par le serveur et les traite comme celles du socket"""
+    since = position_evenements()
+    while True:
+        try:
+            result = poll_evenements(since)
+            if result is None:
+                return
+            since, events = result
+            for event in events:
+                if event["type"] == "match_request":
+                    data = event["data"]
+                    handle_match_request(f"MATCH_REQUEST:{data['from']}:{data.get('code') or ''}")
+        except Exception as e:
+            print("⚠️ Canal d'événements indisponible :", e)
+            time.sleep(5)
+
 def create_match():
     code = input("Entrez un code de match (par exemple, ABC123) : ").strip()
     if not code:
         print("⚠️ Code requis.")
         return
     try:
+        since = position_evenements()
         r = requests.post(f"{SERVER_URL}/create_match", json={
             "player_id": USERNAME,
             "code": code
         })
         if r.status_code == 200:
             print(f"📡 En attente qu'un adversaire rejoigne le match '{code}'...")
-            while True:
-                status = requests.get(f"{SERVER_URL}/match_status", params={"code": code})
-                if status.status_code == 200:
-                    data = status.json()
-                    if data.get("status") == "active":
-                        print(f"🎮 Match '{code}' commencé avec {data.get('opponent')}.")
-                        break
-                time.sleep(5)
+            opponent = attendre_debut_match(code, since)
+            print(f"🎮 Match '{code}' commencé avec {opponent}.")
         else:
             print("⚠️ Impossible de créer le match :", r.text)
     except Exception as e:
@@ -186,4 +236,5 @@ if __name__ == "__main__":
 
     threading.Thread(target=auto_register).start()
     threading.Thread(target=socket_listener, daemon=True).start()
+    threading.Thread(target=ecouter_demandes, daemon=True).start()
     main_menu()
@@ -0,0 +1,429 @@
+"""Version asyncio de BattleshipConnection, pour faire tourner des milliers de parties dans un seul processus.
+
+Mêmes possibilités que la version à threads : inscription, propositions et
+parties, événements du serveur (long-poll), canal persistant avec
+l'adversaire (mêmes trames, acquittements et messages de core/protocol.py,
+donc les deux versions jouent l'une contre l'autre) et envoi du résultat.
+Rien ne bloque : les requêtes HTTP passent par une HttpSession partagée
+(connexions gardées ouvertes et réutilisées) et chaque connexion est une
+coroutine, pas un thread.
+"""
+import asyncio
+import json
+import random
+from collections import OrderedDict
+from urllib.parse import quote, urlencode, urlparse
+
+from Student_Client.core import protocol
+from Student_Client.core.BattleshipConnection import FRAME_HEADER
+
+SHIPS = 3  # Navires par joueur, comme BattleshipConnection.check_victory()
+
+
+class HttpError(Exception):
+    pass
+
+
+class HttpSession:
+    """Small HTTP/1.1 client on asyncio streams, meant to be shared by every connection of a process.
+
+    Connections to the server are kept open and reused. At most ``limit``
+    requests are in flight at once (the others wait for a free slot), so
+    thousands of bots do not open thousands of sockets to the server;
+    long polls skip the limit since they mostly wait. A 429 is retried after
+    the server's Retry-After.
+    """
+
+    def __init__(self, base_url, limit=64, retries=5):
+        url = urlparse(base_url)
+        self.host = url.hostname
+        self.ssl = url.scheme == "https"
+        self.port = url.port or (443 if self.ssl else 80)
+        self.prefix = url.path.rstrip("/")
+        self.retries = retries
+        self.requests = 0
+        self.connections = 0  # Connexions ouvertes depuis le début
+        self._idle = []  # (reader, writer) prêts pour une autre requête
+        self._slots = asyncio.Semaphore(limit)
+
+    async def get(self, path, params=None, **options):
+        return await self.request("GET", path, params=params, **options)
+
+    async def post(self, path, body, **options):
+        return await self.request("POST", path, body=body, **options)
+
+    async def request(self, method, path, body=None, params=None, timeout=30, limited=True):
+        """(status, JSON body) of the response; raises HttpError or OSError if the server cannot be reached"""
+        target = self.prefix + path + ("?" + urlencode(params) if params else "")
+        payload = json.dumps(body).encode() if body is not None else b""
+        head = (f"{method} {target} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(payload)}\r\n"
+                + ("Content-Type: application/json\r\n" if body is not None else "") + "\r\n").encode()
+        for _ in range(self.retries):
+            if limited:
+                async with self._slots:
+                    status, data = await self._exchange(head + payload, timeout)
+            else:
+                status, data = await self._exchange(head + payload, timeout)
+            if status != 429:
+                return status, data
+            await asyncio.sleep((data or {}).get("retry_after", 1))
+        return status, data
+
+    async def _exchange(self, request, timeout):
+        self.requests += 1
+        while True:
+            reused = bool(self._idle)
+            reader, writer = self._idle.pop() if reused else await self._connect()
+            try:
+                writer.write(request)
+                status, keep_alive, body = await asyncio.wait_for(self._read_response(reader), timeout)
+            except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError) as e:
+                writer.close()
+                if reused and not isinstance(e, asyncio.TimeoutError):
+                    continue  # Le serveur a fermé la connexion inactive entre-temps : on en ouvre une autre
+                raise HttpError(f"{type(e).__name__}: {e}") from None
+            if keep_alive:
+                self._idle.append((reader, writer))
+            else:
+                writer.close()
+            try:
+                return status, json.loads(body) if body else None
+            except ValueError:
+                return status, None
+
+    async def _connect(self):
+        self.connections += 1
+        return await asyncio.open_connection(self.host, self.port, ssl=self.ssl or None)
+
+    @staticmethod
+    async def _read_response(reader):
+        version, status, _ = (await reader.readuntil(b"\r\n")).decode("latin-1").split(" ", 2)
+        headers = {}
+        while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        elif headers.get("transfer-encoding", "").lower() == "chunked":
+            body = b""
+            while size := int((await reader.readuntil(b"\r\n")).split(b";")[0], 16):
+                body += await reader.readexactly(size)
+                await reader.readexactly(2)
+            while await reader.readuntil(b"\r\n") != b"\r\n":
+                pass  # En-têtes de fin (trailers), ignorés
+        else:
+            body, keep_alive = await reader.read(), False
+        return int(status), keep_alive, body
+
+    async def close(self):
+        for _, writer in self._idle:
+            writer.close()
+        self._idle.clear()
+
+
+class AsyncBattleshipConnection:
+    def __init__(self, username, port, matchmaking_url, session=None):
+        self.username = username
+        self.port = port  # 0 : choisi par le système au lancement de start_listener()
+        self.matchmaking_url = matchmaking_url
+        self.session = session or HttpSession(matchmaking_url)
+        self.opponent = None
+        self.match_code = None
+        self.is_match_active = False
+        self.game_board = {}
+        self.shots = {}  # {(x, y): "HIT" / "MISS"} : résultats de nos tirs
+        self.moves = []
+        self.winner = None
+
+        self.last_event_seq = None
+        self.opponent_address = None
+        self.binary = True
+        self.peer_binary = False
+        self.inbox = asyncio.Queue()  # Messages reçus de l'adversaire, voir receive()
+        self._server = None
+        self._writer = None  # Connexion persistante avec l'adversaire
+        self._reader_task = None  # Lecture de la connexion ouverte par connect_peer()
+        self._unacked = OrderedDict()
+        self._sent_seq = 0
+        self._received_seq = 0
+
+    # === SERVEUR DE MATCHMAKING ===
+
+    async def register(self):
+        """Register with the server (start_listener() first when ``port`` is 0)"""
+        try:
+            status, _ = await self.session.post("/auto_join", {"username": self.username, "port": self.port})
+            if status != 200:
+                print(f"[ERROR] {self.username} could not register ({status}).")
+                return False
+            await self.poll_events(timeout=0)  # Position actuelle : rien de ce qui suit ne sera manqué
+            return True
+        except (HttpError, OSError) as e:
+            print(f"[ERROR] Failed to connect to server: {e}")
+            return False
+
+    async def propose_match(self, target_username, match_code=None):
+        status, _ = await self.session.post("/propose_match", {"from": self.username, "to": target_username,
+                                                               "code": match_code})
+        return status == 200
+
+    async def create_match(self, match_code):
+        """Open a match that another player joins with the same code"""
+        status, _ = await self.session.post("/create_match", {"player_id": self.username, "code": match_code})
+        return status == 200
+
+    async def join_match(self, match_code):
+        status, data = await self.session.post("/join_match", {"player_id": self.username, "code": match_code})
+        if status != 200:
+            return False
+        creator, joiner = data["players"]
+        self._start_match(match_code, joiner if creator == self.username else creator, data.get("addresses"))
+        return True
+
+    async def poll_events(self, timeout=25):
+        params = {"username": self.username, "timeout": timeout}
+        if self.last_event_seq is not None:
+            params["since"] = self.last_event_seq
+        status, data = await self.session.get("/events/poll", params, timeout=timeout + 10, limited=False)
+        if status != 200:
+            raise HttpError(f"/events/poll answered {status}")
+        self.last_event_seq = data["last_seq"]
+        return data
+
+    async def wait_for_match(self, match_code=None, timeout=60):
+        """Wait for the server to announce the start of a match (optionally with a given code)"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            data = await self.poll_events(timeout=min(25, max(deadline - loop.time(), 0)))
+            for event in data["events"]:
+                match = event["data"]
+                if event["type"] == "match_start" and (not match_code or match["code"] == match_code):
+                    opponent = match["player2"] if match["player1"] == self.username else match["player1"]
+                    self._start_match(match["code"], opponent, match.get("addresses"))
+                    return True
+            if data["reset"] and match_code:
+                # Le serveur n'avait plus tous les événements demandés : on demande l'état du match
+                status, state = await self.session.get("/match_status", {"code": match_code})
+                if status == 200 and state["status"] == "active":
+                    self._start_match(match_code, state["opponent"], None)
+                    return True
+        return False
+
+    async def report_result(self, winner, loser):
+        status, _ = await self.session.post("/match_result", {"winner": winner, "loser": loser})
+        return status == 200
+
+    def _start_match(self, code, opponent, addresses):
+        if self._writer is not None and opponent != self.opponent:
+            # Adoptée sur un hello avant l'annonce du serveur, mais ce n'est pas l'adversaire
+            self._writer.close()
+            self._writer = None
+            self._unacked.clear()
+            self._sent_seq = self._received_seq = 0
+        self.match_code = code
+        self.opponent = opponent
+        self.is_match_active = True
+        self.winner = None
+        self.shots = {}
+        address = (addresses or {}).get(opponent)
+        self.opponent_address = (address["ip"], address["port"]) if address else None
+
+    async def resolve_opponent(self):
+        if not self.opponent_address and self.opponent:
+            status, data = await self.session.get(f"/players/{quote(self.opponent)}")
+            if status == 200:
+                self.opponent_address = (data["ip"], data["port"])
+        return self.opponent_address
+
+    # === CANAL AVEC L'ADVERSAIRE ===
+    # Même protocole que BattleshipConnection. Pas de reconnexion en tâche de
+    # fond : send_message() rouvre la connexion si elle est tombée, et ce qui
+    # n'était pas acquitté repart dessus.
+
+    async def start_listener(self):
+        self._server = await asyncio.start_server(self._accept_peer, "0.0.0.0", self.port, backlog=64)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def _accept_peer(self, reader, writer):
+        try:
+            first = await reader.readexactly(1)
+            if first == b"{":  # Ancien format : un JSON sans trame par connexion
+                await self._on_frame(first + await reader.read())
+                writer.close()
+                return
+            (size,) = FRAME_HEADER.unpack(first + await reader.readexactly(FRAME_HEADER.size - 1))
+            hello = json.loads(await reader.readexactly(size))
+        except (OSError, asyncio.IncompleteReadError, ValueError):
+            writer.close()
+            return
+        if not self._welcome(hello):
+            writer.close()
+            return
+        self.peer_binary = hello.get("protocol", 0) >= protocol.VERSION
+        self._adopt(writer)
+        await self._read_peer(reader, writer)
+
+    def _welcome(self, hello):
+        """True if ``hello`` comes from the opponent; with no match underway its sender becomes the opponent"""
+        username = hello.get("username")
+        if hello.get("type") != "hello" or not username:
+            return False
+        if username == self.opponent:
+            return True
+        if self.opponent and self.is_match_active and not self.winner:
+            return False  # Quelqu'un d'autre pendant une partie
+        self.opponent = username
+        self.match_code = hello.get("code") or self.match_code
+        self.opponent_address = None
+        return True
+
+    async def connect_peer(self):
+        address = await self.resolve_opponent()
+        if not address:
+            return False
+        try:
+            reader, writer = await asyncio.open_connection(*address)
+        except OSError as e:
+            self.opponent_address = None
+            print(f"[ERROR] Could not connect to {self.opponent}: {e}")
+            return False
+        hello = json.dumps({"type": "hello", "username": self.username, "code": self.match_code,
+                            "protocol": protocol.VERSION}).encode()
+        writer.write(FRAME_HEADER.pack(len(hello)) + hello)
+        self._adopt(writer)
+        # Référence gardée : asyncio ne garde les tâches que par des références faibles
+        self._reader_task = asyncio.ensure_future(self._read_peer(reader, writer))
+        return True
+
+    def _adopt(self, writer):
+        previous, self._writer = self._writer, writer
+        for payload in self._unacked.values():
+            writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        if previous is not None:
+            previous.close()
+
+    async def _read_peer(self, reader, writer):
+        try:
+            while True:
+                (size,) = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+                await self._on_frame(await reader.readexactly(size))
+        except (OSError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if self._writer is writer:
+                self._writer = None
+            writer.close()
+
+    def _write(self, payload):
+        if self._writer is None or self._writer.is_closing():
+            return False
+        self._writer.write(FRAME_HEADER.pack(len(payload)) + payload)
+        return True
+
+    def _encode(self, message):
+        return protocol.encode(message, binary=self.binary and self.peer_binary)
+
+    async def send_message(self, message):
+        """Send ``message`` (a dict) without waiting for its acknowledgement; its sequence number, None if unreachable"""
+        self._sent_seq += 1
+        seq = self._sent_seq
+        payload = self._encode({**message, "seq": seq})
+        self._unacked[seq] = payload
+        if self._write(payload) or await self.connect_peer():  # connect_peer() renvoie tout ce qui n'est pas acquitté
+            return seq
+        return None
+
+    async def send_move(self, move):
+        self.moves.append(tuple(move))
+        return await self.send_message({"type": "move", "move": list(move)}) is not None
+
+    async def receive(self, timeout=None):
+        """Next message from the opponent (acknowledgements excluded); None after ``timeout`` seconds"""
+        if not self.inbox.empty():
+            return self.inbox.get_nowait()  # Sans wait_for(), qui crée une tâche à chaque appel
+        try:
+            return await asyncio.wait_for(self.inbox.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def pending_acks(self):
+        return len(self._unacked)
+
+    async def _on_frame(self, payload):
+        try:
+            message = protocol.decode(payload)
+        except ValueError:
+            return
+        if protocol.is_binary(payload):
+            self.peer_binary = True
+        kind = message.get("type", "move")
+        if kind == "ack":
+            while self._unacked and next(iter(self._unacked)) <= message["seq"]:
+                self._unacked.popitem(last=False)
+            return
+        if kind == "hello":
+            self.peer_binary = message.get("protocol", 0) >= protocol.VERSION
+            return
+        if kind == "heartbeat":
+            return
+
+        seq = message.get("seq")
+        if seq is not None:
+            duplicate = seq <= self._received_seq
+            self._received_seq = max(seq, self._received_seq)
+            self._write(self._encode({"type": "ack", "seq": self._received_seq}))
+            if duplicate:
+                return
+
+        # L'état de la partie change avant de rendre la main (les envois plus bas attendent)
+        replies = []
+        if kind == "move":
+            move = tuple(message["move"])
+            hit = self.game_board.get(move) == "SHIP"
+            self.game_board[move] = "HIT" if hit else "MISS"
+            replies.append({"type": "result", "move": list(move), "result": "HIT" if hit else "MISS"})
+            if hit:
+                replies.append({"type": "sunk", "move": list(move)})
+            if sum(1 for v in self.game_board.values() if v == "HIT") >= SHIPS and not self.winner:
+                self.winner = self.opponent
+                replies.append({"type": "game_over", "winner": self.winner})
+        elif kind == "result":
+            self.shots[tuple(message["move"])] = message["result"]
+        elif kind == "game_over" and not self.winner:
+            self.winner = message["winner"]
+        self.inbox.put_nowait(message)
+        if "type" in message:
+            for reply in replies:
+                await self.send_message(reply)
+
+    # === PARTIE ===
+
+    def place_ships(self, rng=random):
+        cells = rng.sample([(x, y) for x in range(5) for y in range(5)], SHIPS)
+        self.game_board = {cell: "SHIP" for cell in cells}
+        return cells
+
+    async def end_game(self, timeout=2):
+        """Wait (up to ``timeout`` s) for the last messages to be acknowledged, then close the channel"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self._unacked and loop.time() < deadline:
+            await asyncio.sleep(0.01)
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            self._reader_task = None
+        self._unacked.clear()
+        self._sent_seq = self._received_seq = 0
+        self.peer_binary = False
+        self.is_match_active = False
+
+    async def close(self):
+        await self.end_game(timeout=0)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
@@ -1,17 +1,55 @@
+import queue
 import socket
+import struct
 import threading
 import requests
 import json
 import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from Student_Client.core import protocol
+
+FRAME_HEADER = struct.Struct(">I")  # Relais et canal pair à pair : chaque trame = longueur sur 4 octets (big-endian) + contenu
+
+
+def send_frame(sock, payload):
+    sock.sendall(FRAME_HEADER.pack(len(payload)) + payload)
+
+
+def recv_frame(sock):
+    """Contenu de la trame suivante, None si la connexion est fermée"""
+    header = _recv_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    return _recv_exact(sock, FRAME_HEADER.unpack(header)[0])
+
+
+def _recv_exact(sock, size):
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return data
+
+
+def _close_socket(sock):
+    try:
+        sock.shutdown(socket.SHUT_RDWR)  # Réveille le thread bloqué dans recv()
+    except OSError:
+        pass
+    sock.close()
+
 
 class BattleshipConnection:
-    def __init__(self, username, port, matchmaking_url):
+    def __init__(self, username, port, matchmaking_url, register=True):
         self.username = username
         self.port = port
         self.matchmaking_url = matchmaking_url
         self.opponent = None
         self.match_code = None
-        self.socket = None
         self.is_match_active = False
         self.my_turn = False  # Indicateur pour savoir si c'est le tour du joueur
         self.game_board = {}  # Pour suivre les positions des navires et les tirs
@@ -20,9 +58,25 @@ class BattleshipConnection:
 
         self.server_ip = None
         self.server_port = None
+        self.last_event_seq = None  # Dernier événement reçu du serveur (long-poll)
+        self.heartbeat_thread = None
+        self.relay_socket = None  # Connexion persistante au relais du serveur, voir connect_relay()
+        self.opponent_address = None  # (ip, port) de l'adversaire, gardé pour tout le match
+        self.listener_socket = None
+        self.peer_socket = None  # Connexion persistante avec l'adversaire, voir connect_peer()
+        self.peer_lock = threading.Lock()
+        self.inbox = queue.Queue()  # Messages reçus de l'adversaire, voir receive()
+        self._unacked = OrderedDict()  # {seq: trame} envoyées mais pas encore acquittées
+        self._sent_seq = 0
+        self._received_seq = 0
+        self.binary = True  # False : toujours du JSON sur le canal
+        self.peer_binary = False  # L'adversaire a montré qu'il lit le binaire (voir protocol.py)
+        self.peer_seen = None  # time.monotonic() du dernier message reçu de l'adversaire
+        self.shots = {}  # {(x, y): "HIT" / "MISS"} : résultats de nos tirs, renvoyés par l'adversaire
 
         # Automatically register with the server
-        self.auto_register()
+        if register:
+            self.auto_register()
 
     def auto_register(self):
         """Auto-register the player with the server and get the IP/port of the opponent"""
@@ -31,6 +85,8 @@ class BattleshipConnection:
             data = response.json()
             if response.status_code == 200:
                 print(f"[INFO] {self.username} successfully registered.")
+                self.sync_events()
+                self.start_heartbeat()
                 self.server_ip = data["ip"]
                 self.server_port = data["port"]
             else:
@@ -38,6 +94,33 @@ class BattleshipConnection:
         except Exception as e:
             print(f"[ERROR] Failed to connect to server: {e}")
 
+    def heartbeat(self):
+        """Tell the server this player is still alive; False if the server no longer knows the player"""
+        response = requests.post(f"{self.matchmaking_url}/heartbeat", json={"username": self.username}, timeout=10)
+        if response.status_code == 404:
+            return False
+        response.raise_for_status()
+        return True
+
+    def start_heartbeat(self, interval=30):
+        """Send a heartbeat every ``interval`` seconds in a background thread, re-registering if the server dropped the player"""
+        if self.heartbeat_thread:
+            return self.heartbeat_thread
+
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    if not self.heartbeat():
+                        print("[WARN] Server dropped this player, registering again.")
+                        requests.post(f"{self.matchmaking_url}/auto_join", json={"username": self.username, "port": self.port})
+                except Exception as e:
+                    print(f"[ERROR] Heartbeat failed: {e}")
+
+        self.heartbeat_thread = threading.Thread(target=loop, daemon=True)
+        self.heartbeat_thread.start()
+        return self.heartbeat_thread
+
     def propose_match(self, target_username, match_code=None):
         """Propose a match to another player"""
         data = {
@@ -64,10 +147,9 @@ class BattleshipConnection:
             response = requests.post(f"{self.matchmaking_url}/join_match", json={"player_id": self.username, "code": match_code})
             if response.status_code == 200:
                 data = response.json()
-                self.opponent = data['players'][1] if data['players'][0] == self.username else data['players'][0]
+                opponent = data['players'][1] if data['players'][0] == self.username else data['players'][0]
+                self._start_match(match_code, opponent, data.get("addresses"))
                 print(f"[INFO] Joined match with code {match_code}. Playing against {self.opponent}.")
-                self.match_code = match_code
-                self.is_match_active = True
                 self.my_turn = True  # Player 1 always starts first
                 return True
             else:
@@ -77,34 +159,443 @@ class BattleshipConnection:
             print(f"[ERROR] Error joining match: {e}")
             return False
 
+    @staticmethod
+    def _post_batch(matchmaking_url, route, items):
+        """POST an array to a /batch route; returns the per-item results (same order as ``items``)"""
+        response = requests.post(f"{matchmaking_url}{route}/batch", json=list(items))
+        response.raise_for_status()
+        data = response.json()
+        if data["failed"]:
+            print(f"[WARN] {data['failed']} of {len(data['results'])} items rejected by {route}.")
+        return data["results"]
+
+    @staticmethod
+    def register_players(matchmaking_url, players):
+        """Register many players ({"username", "port"} dicts) in a single request"""
+        return BattleshipConnection._post_batch(matchmaking_url, "/auto_join", players)
+
+    @staticmethod
+    def report_results(matchmaking_url, results):
+        """Report many results ({"winner", "loser"[, "duration"]} dicts, applied in order) in a single request"""
+        return BattleshipConnection._post_batch(matchmaking_url, "/match_result", results)
+
+    @staticmethod
+    def start_tournament_matches(matchmaking_url, matches):
+        """Start many bracket matches ({"player1", "player2", "match_id"} dicts) in a single request"""
+        return BattleshipConnection._post_batch(matchmaking_url, "/start_tournament_match", matches)
+
+    def poll_events(self, timeout=25):
+        """Long-poll the server for events addressed to this player (match requests, match start, results)"""
+        params = {"username": self.username, "timeout": timeout}
+        if self.last_event_seq is not None:
+            params["since"] = self.last_event_seq
+        response = requests.get(f"{self.matchmaking_url}/events/poll", params=params, timeout=timeout + 10)
+        response.raise_for_status()
+        data = response.json()
+        self.last_event_seq = data["last_seq"]
+        return data["events"]
+
+    def sync_events(self):
+        """Remember the current event position so nothing sent afterwards is missed"""
+        try:
+            self.poll_events(timeout=0)
+        except Exception as e:
+            print(f"[WARN] Event channel unavailable: {e}")
+
+    def wait_for_match(self, match_code=None, timeout=60):
+        """Wait for the server to announce the start of a match (optionally with a given code)"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                received = self.poll_events(timeout=min(25, max(deadline - time.time(), 0)))
+            except Exception as e:
+                print(f"[ERROR] Error waiting for match: {e}")
+                return False
+            for event in received:
+                data = event["data"]
+                if event["type"] != "match_start" or (match_code and data["code"] != match_code):
+                    continue
+                opponent = data["player2"] if data["player1"] == self.username else data["player1"]
+                self._start_match(data["code"], opponent, data.get("addresses"))
+                print(f"[INFO] Match {self.match_code} started against {self.opponent}.")
+                return True
+        return False
+
+    def _start_match(self, code, opponent, addresses):
+        # On garde seulement le canal adopté sur un hello de cet adversaire avant l'annonce du serveur
+        if not (self.peer_socket and opponent == self.opponent and not self.winner):
+            self._reset_match()
+        self.opponent = opponent
+        self.remember_opponent_address(addresses)
+        self.match_code = code
+        self.is_match_active = True
+
+    def _reset_match(self):
+        """Forget the previous match: its peer connection, messages, board and winner"""
+        self.close_peer()
+        self.winner = None
+        self.my_turn = False
+        self.game_board = {}
+        self.moves = []
+        self.shots = {}
+        while True:
+            try:
+                self.inbox.get_nowait()
+            except queue.Empty:
+                break
+
+    def listen_events(self, callback):
+        """Call ``callback(event)`` for every server event, in a background thread"""
+        def loop():
+            while True:
+                try:
+                    for event in self.poll_events():
+                        callback(event)
+                except Exception as e:
+                    print(f"[ERROR] Event channel error: {e}")
+                    time.sleep(5)
+
+        thread = threading.Thread(target=loop, daemon=True)
+        thread.start()
+        return thread
+
+    # === CANAL PAIR À PAIR ===
+    # Une seule connexion TCP par match, découpée en trames (voir send_frame) :
+    # chaque message porte un numéro (seq) et l'adversaire l'acquitte
+    # ({"type": "ack", "seq": n}, cumulatif) sans que l'envoyeur attende. Les
+    # messages non acquittés sont renvoyés après une reconnexion, et les
+    # doublons sont ignorés à la réception. Les messages sont codés par
+    # protocol.py : en binaire dès que l'adversaire a montré qu'il le lit
+    # (hello avec "protocol", ou message binaire reçu), en JSON sinon.
+
     def start_socket_listener(self):
-        """Start listening for game messages from the opponent"""
+        """Accept the opponent's peer connection (and one-shot JSON moves from older clients) on ``self.port``"""
         s = socket.socket()
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         s.bind(("0.0.0.0", self.port))
-        s.listen(1)
+        s.listen(8)
+        self.listener_socket = s
 
         print(f"[INFO] Listening on port {self.port} for game moves...")
 
-        while self.is_match_active:
-            conn, addr = s.accept()
-            data = conn.recv(1024).decode()
-            if data:
-                print(f"[INFO] Received message: {data}")
-                self.handle_opponent_move(data)
+        while True:
+            try:
+                conn, addr = s.accept()
+            except OSError:
+                return  # Listener closed
+            threading.Thread(target=self._accept_peer, args=(conn,), daemon=True).start()
+
+    def _accept_peer(self, conn):
+        try:
+            conn.settimeout(10)
+            if conn.recv(1, socket.MSG_PEEK) == b"{":
+                # Ancien format : un JSON sans trame, puis la connexion est fermée
+                data = b""
+                while chunk := conn.recv(4096):
+                    data += chunk
+                conn.close()
+                self._on_frame(data)
+                return
+            hello = json.loads(recv_frame(conn) or b"{}")
+            conn.settimeout(None)
+        except (OSError, ValueError):
             conn.close()
+            return
+        if not self._welcome(hello):
+            print(f"[WARN] Refused peer connection from {hello.get('username')}.")
+            conn.close()
+            return
+        self.peer_binary = hello.get("protocol", 0) >= protocol.VERSION
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if self._adopt(conn):
+            self._read_peer(conn)
 
-    def send_move(self, move):
-        """Send a move to the opponent"""
-        if not self.socket:
-            print("[ERROR] No connection to opponent.")
+    def _welcome(self, hello):
+        """True if ``hello`` comes from the opponent.
+
+        The creator of a match often hears from the joiner before the
+        server's match_start reaches it: with no match underway, the sender
+        becomes the opponent of the next match (and _start_match() drops it
+        if the server announces someone else).
+        """
+        username = hello.get("username")
+        if hello.get("type") != "hello" or not username:
+            return False
+        if self.is_match_active and not self.winner:
+            return username == self.opponent  # Personne d'autre pendant une partie
+        if self.winner:
+            self._reset_match()  # Le match précédent est fini : ce hello ouvre le suivant
+        if username != self.opponent:
+            self.opponent = username
+            self.forget_opponent_address()
+        self.match_code = hello.get("code") or self.match_code
+        return True
+
+    def connect_peer(self):
+        """Open the persistent connection to the opponent; False if they cannot be reached"""
+        address = self.resolve_opponent()
+        if not address:
+            return False
+        try:
+            sock = socket.create_connection(address, timeout=10)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            send_frame(sock, self._hello())
+            sock.settimeout(None)
+        except OSError as e:
+            self.forget_opponent_address()
+            print(f"[ERROR] Could not connect to {self.opponent}: {e}")
+            return False
+        if not self._adopt(sock):
+            return False
+        threading.Thread(target=self._read_peer, args=(sock,), daemon=True).start()
+        return True
+
+    def _adopt(self, sock):
+        """Send from now on through ``sock``, starting with every message not acknowledged yet"""
+        with self.peer_lock:
+            previous, self.peer_socket = self.peer_socket, sock
+            try:
+                for payload in self._unacked.values():
+                    send_frame(sock, payload)
+            except OSError:
+                self.peer_socket = None
+                sock.close()
+                return False
+        if previous is not None:
+            _close_socket(previous)
+        return True
+
+    def _read_peer(self, sock):
+        while True:
+            try:
+                payload = recv_frame(sock)
+            except OSError:
+                payload = None
+            if payload is None:
+                break
+            self._on_frame(payload)
+
+        with self.peer_lock:
+            lost = self.peer_socket is sock  # False if replaced or closed on purpose
+            if lost:
+                self.peer_socket = None
+        sock.close()
+        # Les deux joueurs rappellent l'autre, celui dont le nom vient en second plus tard pour
+        # qu'ils ne se croisent pas : il n'a rien à faire si l'autre l'a rappelé entre-temps.
+        # Celui qui a été refusé (adversaire pas encore connu de l'autre) réessaie donc toujours.
+        if lost and self.is_match_active and not self.winner:
+            self._reconnect(delay=0.1 if self.username < (self.opponent or "") else 1.0)
+
+    def _reconnect(self, attempts=5, delay=0.1):
+        for _ in range(attempts):
+            time.sleep(delay)
+            if self.peer_socket or not self.is_match_active:
+                return True
+            if self.connect_peer():
+                print(f"[INFO] Reconnected to {self.opponent}.")
+                return True
+            delay *= 2
+        print(f"[ERROR] Lost the connection to {self.opponent}.")
+        return False
+
+    def _hello(self):
+        return json.dumps({"type": "hello", "username": self.username, "code": self.match_code,
+                           "protocol": protocol.VERSION}).encode()
+
+    def _on_frame(self, payload):
+        try:
+            message = protocol.decode(payload)
+        except ValueError:
+            print(f"[ERROR] Unreadable message: {payload[:80]!r}")
+            return
+        self.peer_seen = time.monotonic()
+        if protocol.is_binary(payload):
+            self.peer_binary = True
+        kind = message.get("type", "move")  # Les anciens clients n'envoient que {"move": [x, y]}
+        if kind == "ack":
+            with self.peer_lock:
+                while self._unacked and next(iter(self._unacked)) <= message["seq"]:
+                    self._unacked.popitem(last=False)
+            return
+        if kind == "hello":  # Via le relais
+            self.peer_binary = message.get("protocol", 0) >= protocol.VERSION
+            return
+        if kind == "heartbeat":
             return
 
-        message = json.dumps({"move": move})
+        seq = message.get("seq")
+        if seq is not None:
+            duplicate = seq <= self._received_seq
+            self._received_seq = max(seq, self._received_seq)
+            self._send_raw(self._encode({"type": "ack", "seq": self._received_seq}))
+            if duplicate:
+                return  # Déjà reçu avant une reconnexion
+        self.inbox.put(message)
+
+        if kind == "move":
+            move = tuple(message["move"])
+            if "type" in message:
+                # Le tireur apprend le résultat avant que le coup ne soit joué ici
+                # (le coup gagnant termine la partie et ferme le canal)
+                hit = self.game_board.get(move) == "SHIP"
+                self.send_message({"type": "result", "move": list(move), "result": "HIT" if hit else "MISS"})
+                if hit:
+                    self.send_message({"type": "sunk", "move": list(move)})  # Un navire = une case
+            self.handle_opponent_move(json.dumps({"move": list(move)}))
+        elif kind == "result":
+            self.handle_shot_result(tuple(message["move"]), message["result"])
+        elif kind == "sunk":
+            print(f"[INFO] Sunk a ship at {tuple(message['move'])}.")
+        elif kind == "game_over" and not self.winner:
+            self.winner = message["winner"]
+            print(f"[INFO] Game over: {self.winner} won.")
+            self.end_game()
+
+    def _encode(self, message):
+        return protocol.encode(message, binary=self.binary and self.peer_binary)
+
+    def _send_raw(self, payload):
+        with self.peer_lock:
+            sock = self.relay_socket or self.peer_socket
+            if sock is None:
+                return False
+            try:
+                send_frame(sock, payload)
+                return True
+            except OSError:
+                return False
+
+    def send_message(self, message):
+        """Send ``message`` (a dict) to the opponent without waiting for it to be acknowledged.
+
+        Goes through the relay if connected to it, else the peer connection,
+        opened (or opened again) as needed. Returns the message's sequence
+        number, or None if the opponent cannot be reached right now; the
+        message is then sent on the next connection.
+        """
+        with self.peer_lock:
+            self._sent_seq += 1
+            seq = self._sent_seq
+            payload = self._encode({**message, "seq": seq})
+            self._unacked[seq] = payload
+        if self._send_raw(payload) or self.connect_peer():  # connect_peer() sends everything unacknowledged
+            return seq
+        return None
+
+    def receive(self, timeout=None):
+        """Next message from the opponent (a dict, acknowledgements excluded); None after ``timeout`` seconds"""
+        try:
+            return self.inbox.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def send_heartbeat(self):
+        """Tell the opponent we are still there; not numbered nor acknowledged"""
+        return self._send_raw(self._encode({"type": "heartbeat"}))
+
+    def pending_acks(self):
+        """Number of sent messages the opponent has not acknowledged yet"""
+        return len(self._unacked)
+
+    def close_peer(self):
+        """Close the peer connection and forget the match's messages"""
+        with self.peer_lock:
+            sock, self.peer_socket = self.peer_socket, None
+            self._unacked.clear()
+            self._sent_seq = self._received_seq = 0
+            self.peer_binary = False
+        if sock is not None:
+            _close_socket(sock)
+
+    def connect_relay(self, port=None):
+        """Open one persistent connection to the server's move relay for the current match.
+
+        Messages sent with send_message() then go through the server, which
+        forwards them by match code; the opponent's arrive on the same
+        connection, like on the peer channel. Returns False if the server has no relay.
+        """
         try:
-            self.socket.send(message.encode())
-            print(f"[INFO] Sent move: {move}")
+            if port is None:
+                info = requests.get(f"{self.matchmaking_url}/relay", timeout=10).json()
+                if not info.get("enabled"):
+                    print("[WARN] The server has no move relay.")
+                    return False
+                port = info["port"]
+            sock = socket.create_connection((urlparse(self.matchmaking_url).hostname, port), timeout=10)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            send_frame(sock, json.dumps({"username": self.username, "code": self.match_code}).encode())
+            reply = json.loads(recv_frame(sock) or b"{}")
         except Exception as e:
-            print(f"[ERROR] Failed to send move: {e}")
+            print(f"[ERROR] Could not connect to the move relay: {e}")
+            return False
+        if reply.get("type") != "welcome":
+            print(f"[ERROR] Move relay refused the connection: {reply.get('error')}")
+            sock.close()
+            return False
+
+        sock.settimeout(None)
+        self.relay_socket = sock
+        self._send_raw(self._hello())  # Transmis à l'adversaire par le relais
+        threading.Thread(target=self._relay_listener, args=(sock,), daemon=True).start()
+        print(f"[INFO] Connected to the move relay for match {self.match_code}.")
+        return True
+
+    def _relay_listener(self, sock):
+        while True:
+            try:
+                payload = recv_frame(sock)
+            except OSError:
+                payload = None
+            if payload is None:
+                break
+            self._on_frame(payload)
+        if self.relay_socket is sock:
+            self.relay_socket = None
+
+    def close_relay(self):
+        if self.relay_socket:
+            _close_socket(self.relay_socket)
+            self.relay_socket = None
+
+    def remember_opponent_address(self, addresses):
+        """Keep the opponent's address from a match start ({username: {"ip", "port"}}) for the whole match"""
+        address = (addresses or {}).get(self.opponent)
+        self.opponent_address = (address["ip"], address["port"]) if address else None
+
+    def resolve_opponent(self):
+        """(ip, port) of the opponent: the cached address, else a single /players/<username> lookup"""
+        if self.opponent_address:
+            return self.opponent_address
+        if not self.opponent:
+            return None
+        try:
+            response = requests.get(f"{self.matchmaking_url}/players/{self.opponent}", timeout=10)
+        except Exception as e:
+            print(f"[ERROR] Could not look up {self.opponent}: {e}")
+            return None
+        if response.status_code != 200:
+            print(f"[ERROR] {self.opponent} is not registered on the server.")
+            return None
+        data = response.json()
+        self.opponent_address = (data["ip"], data["port"])
+        return self.opponent_address
+
+    def forget_opponent_address(self):
+        """Drop the cached address, e.g. after the opponent re-registered from elsewhere"""
+        self.opponent_address = None
+
+    def send_move(self, move):
+        """Send a move to the opponent on the persistent channel (relay or peer connection)"""
+        if self.send_message({"type": "move", "move": list(move)}) is None:
+            print(f"[ERROR] Failed to send move: {move}")
+            return False
+        print(f"[INFO] Sent move: {move}")
+        return True
+
+    def handle_shot_result(self, move, result):
+        """Record the outcome ("HIT" or "MISS") of one of our shots, as reported by the opponent"""
+        self.shots[move] = result
+        print(f"[INFO] Shot at {move}: {result}")
 
     def handle_opponent_move(self, data):
         """Handle the opponent's move"""
@@ -138,16 +629,37 @@ class BattleshipConnection:
             self.end_game()
 
 
+    def _close_channels(self, timeout=2):
+        peer, relay = self.peer_socket, self.relay_socket
+        deadline = time.monotonic() + timeout
+        while self.pending_acks() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # Sauf si le match suivant a déjà ses propres connexions
+        if self.relay_socket is relay:
+            self.close_relay()
+        if self.peer_socket is peer:
+            self.close_peer()
+
     def start_game(self):
         """Start the game after both players agree"""
         print(f"[INFO] Game started with {self.opponent}.")
         # Now that the match has started, start the socket listener in a separate thread
+        # (once: it stays open for the following matches)
+        if self.listener_socket:
+            return
         listener_thread = threading.Thread(target=self.start_socket_listener)
         listener_thread.daemon = True
         listener_thread.start()
 
     def end_game(self):
         """End the game and record the result"""
+        if self.winner == self.opponent:
+            self.send_message({"type": "game_over", "winner": self.winner})
+        # Fermeture une fois les derniers messages (résultat, fin de partie) acquittés :
+        # end_game() peut être appelé depuis le thread qui lit les acquittements
+        threading.Thread(target=self._close_channels, daemon=True).start()
+        self.forget_opponent_address()
+        self.is_match_active = False
         if self.winner == self.opponent:
             loser = self.username
         else:
@@ -0,0 +1,88 @@
+"""Messages échangés entre deux joueurs, en binaire compact ou en JSON.
+
+Un message est un dict : {"type": ..., "seq": n, ...champs}. Types connus :
+
+    move       {"move": [x, y]}                     tir
+    result     {"move": [x, y], "result": "HIT"}    réponse au tireur ("HIT" ou "MISS")
+    sunk       {"move": [x, y]}                     navire coulé
+    game_over  {"winner": username}
+    heartbeat  {}
+    ack        {"seq": n}                           acquittement cumulatif
+
+Format binaire (version 1) : version (1 octet), type (1 octet), seq (4 octets,
+0 = non numéroté), puis les champs du type. Un message JSON commence par "{",
+jamais un message binaire : decode() lit les deux. encode() se replie sur le
+JSON pour ce que le binaire ne sait pas porter (autres types, coordonnées
+au-delà de 255), et pour les pairs qui ne connaissent que le JSON.
+"""
+import json
+import struct
+
+VERSION = 1
+
+MOVE, RESULT, SUNK, GAME_OVER, HEARTBEAT, ACK = range(1, 7)
+TYPE_CODES = {"move": MOVE, "result": RESULT, "sunk": SUNK, "game_over": GAME_OVER, "heartbeat": HEARTBEAT, "ack": ACK}
+TYPE_NAMES = {code: name for name, code in TYPE_CODES.items()}
+
+HEADER = struct.Struct(">BBI")  # version, type, seq
+CELL = struct.Struct(">BBIBB")  # move, sunk : + x, y
+SHOT_RESULT = struct.Struct(">BBIBBB")  # result : + x, y, touché (0/1)
+NAME_LENGTH = struct.Struct(">B")  # game_over : + longueur du nom, puis le nom en UTF-8
+
+
+def encode(message, binary=True):
+    """Frame payload for ``message``: binary when asked for and possible, else compact JSON"""
+    if binary:
+        try:
+            return _encode_binary(message)
+        except (KeyError, struct.error, UnicodeEncodeError):
+            pass  # Repli sur le JSON
+    return json.dumps(message, separators=(",", ":")).encode()
+
+
+def _encode_binary(message):
+    code = TYPE_CODES[message["type"]]
+    seq = message.get("seq", 0)
+    if code == MOVE or code == SUNK:
+        x, y = message["move"]
+        return CELL.pack(VERSION, code, seq, x, y)
+    if code == RESULT:
+        x, y = message["move"]
+        return SHOT_RESULT.pack(VERSION, code, seq, x, y, message["result"] == "HIT")
+    if code == GAME_OVER:
+        name = message["winner"].encode()
+        return HEADER.pack(VERSION, code, seq) + NAME_LENGTH.pack(len(name)) + name
+    return HEADER.pack(VERSION, code, seq)
+
+
+def is_binary(payload):
+    return payload[:1] != b"{"
+
+
+def decode(payload):
+    """The message dict in a frame payload, binary or JSON; ValueError if it is neither"""
+    if not is_binary(payload):
+        message = json.loads(payload)
+        if not isinstance(message, dict):
+            raise ValueError("Expected a JSON object")
+        return message
+    try:
+        version, code, seq = HEADER.unpack_from(payload)
+        if version != VERSION:
+            raise ValueError(f"Unsupported protocol version {version}")
+        message = {"type": TYPE_NAMES[code]}
+        if seq:
+            message["seq"] = seq
+        if code == MOVE or code == SUNK:
+            message["move"] = list(CELL.unpack(payload)[3:])
+        elif code == RESULT:
+            *_, x, y, hit = SHOT_RESULT.unpack(payload)
+            message["move"] = [x, y]
+            message["result"] = "HIT" if hit else "MISS"
+        elif code == GAME_OVER:
+            (length,) = NAME_LENGTH.unpack_from(payload, HEADER.size)
+            start = HEADER.size + NAME_LENGTH.size
+            message["winner"] = payload[start:start + length].decode()
+        return message
+    except (struct.error, KeyError, UnicodeDecodeError) as e:
+        raise ValueError(f"Malformed binary message: {e!r}") from None
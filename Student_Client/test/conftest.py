@@ -0,0 +1,41 @@
+import os
+import socket
+import sys
+import time
+
+import pytest
+
+# Client modules are imported as Student_Client.*, from the repository root
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from Student_Client.core.BattleshipConnection import BattleshipConnection, _close_socket  # noqa: E402
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def player(username):
+    conn = BattleshipConnection(username, free_port(), "", register=False)
+    conn.handle_opponent_move = lambda data: None  # Pas de plateau : on ne regarde que les messages
+    conn.start_game()
+    while not conn.listener_socket:
+        time.sleep(0.01)
+    return conn
+
+
+@pytest.fixture
+def players():
+    created = []
+
+    def make(*usernames):
+        created.extend(player(username) for username in usernames)
+        return created[-len(usernames):]
+
+    yield make
+    for conn in created:
+        conn.is_match_active = False  # Pas de reconnexion pendant la fermeture
+        conn.close_peer()
+        _close_socket(conn.listener_socket)
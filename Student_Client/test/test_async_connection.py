@@ -0,0 +1,170 @@
+import asyncio
+import importlib
+import os
+import random
+import threading
+
+import pytest
+from werkzeug.serving import make_server
+
+from Student_Client.core.AsyncBattleshipConnection import AsyncBattleshipConnection, HttpSession
+from Student_Client.tools.async_bots import bot
+
+MATCHMAKING_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Matchmaking_Server")
+
+
+@pytest.fixture
+def matchmaking_url(monkeypatch):
+    """A fresh matchmaking server (memory store) served over HTTP on a free port"""
+    monkeypatch.syspath_prepend(MATCHMAKING_DIR)
+    monkeypatch.setenv("BATTLESHIP_DATA_DIR", "")
+    monkeypatch.setenv("BATTLESHIP_RATE_LIMITS", "off")
+    monkeypatch.delenv("BATTLESHIP_STORE", raising=False)
+    server = importlib.reload(importlib.import_module("server"))
+    http = make_server("127.0.0.1", 0, server.app, threaded=True)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{http.server_port}"
+    http.shutdown()
+
+
+async def open_match(session, code, *usernames):
+    """Register two players; the first creates ``code``, the second joins it"""
+    creator, joiner = (AsyncBattleshipConnection(name, 0, "", session) for name in usernames)
+    for conn in (creator, joiner):
+        await conn.start_listener()
+        assert await conn.register()
+    assert await creator.create_match(code)
+    return creator, joiner
+
+
+def test_full_game_against_the_server(matchmaking_url):
+    async def scenario():
+        session = HttpSession(matchmaking_url, limit=2)
+        creator, joiner = await open_match(session, "G1", "Alice", "Bob")
+        started = asyncio.ensure_future(creator.wait_for_match("G1", timeout=10))
+        assert await joiner.join_match("G1") and await started
+        assert (creator.opponent, joiner.opponent) == ("Bob", "Alice")
+
+        rng = random.Random(3)
+        for conn in (creator, joiner):
+            conn.place_ships(rng)
+        assert all(await asyncio.gather(bot(creator, False, rng, 5), bot(joiner, True, rng, 5)))
+        assert creator.winner == joiner.winner
+        loser = creator if creator.winner == creator.opponent else joiner
+        assert await loser.report_result(loser.opponent, loser.username)
+        await asyncio.gather(creator.end_game(), joiner.end_game())
+
+        _, board = await session.get("/leaderboard")
+        await asyncio.gather(creator.close(), joiner.close(), session.close())
+        return creator, joiner, loser, board, session
+
+    creator, joiner, loser, board, session = asyncio.run(scenario())
+    assert board["scores"][0] == [loser.opponent, 1]
+    shooter = joiner if loser is creator else creator
+    assert sum(result == "HIT" for result in shooter.shots.values()) == 3
+
+
+def test_joiner_hello_before_match_start(matchmaking_url):
+    async def scenario():
+        session = HttpSession(matchmaking_url)
+        creator, joiner = await open_match(session, "G2", "Zoe", "Bob")
+        assert await joiner.join_match("G2")
+        # Le créateur n'a pas encore lu match_start : le coup arrive quand même
+        assert await joiner.send_move((2, 2))
+        first = await creator.receive(timeout=5)
+        adopted = (creator.opponent, creator.match_code)
+        assert await creator.wait_for_match("G2", timeout=5)
+        result = await joiner.receive(timeout=5)
+        await asyncio.gather(creator.close(), joiner.close(), session.close())
+        return first, adopted, result
+
+    first, adopted, result = asyncio.run(scenario())
+    assert first["move"] == [2, 2]
+    assert adopted == ("Bob", "G2")
+    assert result["type"] == "result"
+
+
+async def parse(raw):
+    reader = asyncio.StreamReader()
+    reader.feed_data(raw)
+    reader.feed_eof()
+    return await HttpSession._read_response(reader)
+
+
+@pytest.mark.parametrize("raw, expected", [
+    (b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}", (200, True, b"{}")),
+    (b"HTTP/1.1 404 NOT FOUND\r\nConnection: close\r\nContent-Length: 2\r\n\r\n{}", (404, False, b"{}")),
+    (b"HTTP/1.0 200 OK\r\nContent-Length: 2\r\n\r\n{}", (200, False, b"{}")),
+    (b"HTTP/1.1 200 OK\r\n\r\n{\"a\": 1}", (200, False, b'{"a": 1}')),  # Sans longueur : jusqu'à la fermeture
+    (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n"
+     b"3;ext=1\r\n{\"a\r\n5\r\n\": 1}\r\n0\r\n\r\n", (200, True, b'{"a": 1}')),
+    (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: Chunked\r\n\r\n"
+     b"2\r\n{}\r\n0\r\nX-Trailer: 1\r\n\r\n", (200, True, b"{}")),
+], ids=["length", "close", "http10", "until-eof", "chunked", "trailer"])
+def test_read_response(raw, expected):
+    assert asyncio.run(parse(raw)) == expected
+
+
+def test_chunked_response_leaves_the_next_one_readable():
+    async def scenario():
+        reader = asyncio.StreamReader()
+        reader.feed_data(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n2\r\n{}\r\n0\r\nX-Trailer: 1\r\n\r\n"
+                         b"HTTP/1.1 201 CREATED\r\nContent-Length: 0\r\n\r\n")
+        return [await HttpSession._read_response(reader) for _ in range(2)]
+
+    assert asyncio.run(scenario()) == [(200, True, b"{}"), (201, True, b"")]
+
+
+async def keep_alive(reader, writer):
+    """Scripted server: answers every request on the same connection"""
+    try:
+        while True:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\n{}')
+    except asyncio.IncompleteReadError:
+        writer.close()
+
+
+def test_session_reuses_connections_within_its_limit():
+    async def scenario():
+        server = await asyncio.start_server(keep_alive, "127.0.0.1", 0)
+        session = HttpSession(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}", limit=2)
+        for _ in range(3):
+            assert await session.get("/one") == (200, {})
+        sequential = session.connections
+        answers = await asyncio.gather(*(session.post("/many", {"i": i}) for i in range(10)))
+        await session.close()
+        server.close()
+        return sequential, answers, session
+
+    sequential, answers, session = asyncio.run(scenario())
+    assert sequential == 1
+    assert answers == [(200, {})] * 10
+    assert session.connections == 2 and session.requests == 13
+
+
+def test_session_reconnects_and_retries_429():
+    """Scripted server: closes each connection after one answer, and answers 429 once"""
+    responses = [b'HTTP/1.1 200 OK\r\nContent-Length: 9\r\n\r\n{"n": 1}\n',
+                 b'HTTP/1.1 429 TOO MANY REQUESTS\r\nContent-Length: 19\r\n\r\n{"retry_after": 0}\n',
+                 b'HTTP/1.1 200 OK\r\nContent-Length: 9\r\n\r\n{"n": 2}\n']
+
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(responses.pop(0))
+        await writer.drain()
+        writer.close()  # Le client croit la connexion réutilisable : elle ne l'est plus
+
+    async def scenario():
+        server = await asyncio.start_server(handle, "127.0.0.1", 0)
+        session = HttpSession(f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}")
+        first = await session.get("/a")
+        await asyncio.sleep(0.05)  # Laisse la fermeture arriver côté client
+        second = await session.get("/b")
+        await session.close()
+        server.close()
+        return first, second, session
+
+    first, second, session = asyncio.run(scenario())
+    assert first == (200, {"n": 1}) and second == (200, {"n": 2})
+    assert session.connections == 3 and session.requests == 3
@@ -0,0 +1,131 @@
+import json
+import socket
+import time
+
+from Student_Client.core.BattleshipConnection import _close_socket, recv_frame, send_frame
+
+
+def meet(me, other):
+    me.opponent = other.username
+    me.opponent_address = ("127.0.0.1", other.port)
+    me.is_match_active = True
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def messages(conn, kind):
+    """Everything of type ``kind`` in ``conn``'s inbox right now"""
+    found = []
+    while (message := conn.receive(timeout=0.2)) is not None:
+        if message.get("type") == kind:
+            found.append(message)
+    return found
+
+
+def test_moves_and_results_over_one_connection(players):
+    alice, bob = players("Alice", "Bob")
+    meet(alice, bob)
+    meet(bob, alice)
+    bob.game_board = {(1, 1): "SHIP"}
+
+    assert alice.send_move((1, 1))
+    assert bob.receive(timeout=5) == {"type": "move", "move": [1, 1], "seq": 1}
+    assert bob.send_move((4, 4))
+
+    assert [m["move"] for m in messages(alice, "move")] == [[4, 4]]
+    assert alice.shots == {(1, 1): "HIT"}
+    wait_until(lambda: not alice.pending_acks() and not bob.pending_acks())
+    assert alice.peer_binary and bob.peer_binary  # Les deux hellos annoncent la version 1
+
+
+def test_resend_after_connection_loss_is_delivered_once(players):
+    alice, bob = players("Alice", "Bob")
+    meet(alice, bob)
+    meet(bob, alice)
+    alice.send_move((0, 0))
+    wait_until(lambda: not alice.pending_acks())
+    messages(bob, "move")
+
+    # L'acquittement du coup 1 est « perdu » et la connexion tombe : il repart avec le coup 2
+    payload = alice._encode({"type": "move", "move": [0, 0], "seq": 1})
+    with alice.peer_lock:
+        alice._unacked[1] = payload
+    _close_socket(bob.peer_socket)
+    alice.send_move((2, 2))
+
+    wait_until(lambda: not alice.pending_acks())
+    assert [m["move"] for m in messages(bob, "move")] == [[2, 2]]
+    assert bob.peer_socket is not None
+
+
+def test_joiner_hello_before_match_start_is_adopted(players):
+    creator, joiner = players("Zoe", "Bob")
+    meet(joiner, creator)
+    joiner.match_code = "M1"
+
+    assert joiner.send_move((3, 3))
+    assert creator.receive(timeout=5)["move"] == [3, 3]
+    assert (creator.opponent, creator.match_code) == ("Bob", "M1")
+
+    creator._start_match("M1", "Bob", None)  # L'annonce du serveur arrive ensuite
+    assert creator.peer_socket is not None
+    wait_until(lambda: not joiner.pending_acks())
+
+
+def test_stranger_is_refused_during_a_match(players):
+    (bob,) = players("Bob")
+    bob.opponent, bob.is_match_active = "Alice", True
+
+    with socket.create_connection(("127.0.0.1", bob.port), timeout=5) as s:
+        send_frame(s, json.dumps({"type": "hello", "username": "Mallory"}).encode())
+        assert recv_frame(s) is None  # Connexion fermée sans réponse
+    assert bob.peer_socket is None and bob.opponent == "Alice"
+
+
+def test_refused_side_retries_until_the_opponent_is_known(players):
+    # Zoe vient après Bob dans l'ordre alphabétique : elle réessaie quand même
+    bob, zoe = players("Bob", "Zoe")
+    meet(zoe, bob)
+    bob.opponent, bob.is_match_active = "Carol", True  # Partie précédente pas encore terminée
+
+    assert zoe.send_move((1, 2)) == 1
+    time.sleep(0.3)
+    assert bob.receive(timeout=0) is None
+    bob._start_match("M2", "Zoe", None)
+
+    message = bob.receive(timeout=10)
+    assert message["move"] == [1, 2]
+    wait_until(lambda: not zoe.pending_acks())
+
+
+def start(me, other, code):
+    me._start_match(code, other.username, {other.username: {"ip": "127.0.0.1", "port": other.port}})
+
+
+def test_second_match_starts_afresh(players):
+    alice, bob = players("Alice", "Bob")
+    del bob.handle_opponent_move  # Le vrai plateau : trois navires touchés terminent le match
+    for conn, other in ((alice, bob), (bob, alice)):
+        start(conn, other, "M1")
+    bob.game_board = {(0, y): "SHIP" for y in range(3)}
+    for y in range(3):
+        assert alice.send_move((0, y))
+    wait_until(lambda: alice.winner and not alice.is_match_active and not bob.is_match_active)
+    assert bob.winner == "Alice"
+
+    for conn, other in ((alice, bob), (bob, alice)):
+        start(conn, other, "M2")
+        assert (conn.winner, conn.game_board, conn.shots, conn.receive(timeout=0)) == (None, {}, {}, None)
+    with socket.create_connection(("127.0.0.1", bob.port), timeout=5) as s:
+        send_frame(s, json.dumps({"type": "hello", "username": "Mallory", "code": "M2"}).encode())
+        assert recv_frame(s) is None
+    assert (bob.opponent, bob.match_code) == ("Alice", "M2")
+
+    assert alice.send_move((4, 4)) == 1  # Numérotation repartie de zéro
+    assert bob.receive(timeout=5) == {"type": "move", "move": [4, 4], "seq": 1}
+    wait_until(lambda: alice.shots == {(4, 4): "MISS"})
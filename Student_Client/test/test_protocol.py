@@ -0,0 +1,103 @@
+import json
+import socket
+
+import pytest
+
+from Student_Client.core import protocol
+from Student_Client.core.BattleshipConnection import recv_frame, send_frame
+
+MESSAGES = [
+    {"type": "move", "move": [3, 4], "seq": 12},
+    {"type": "result", "move": [3, 4], "result": "HIT", "seq": 13},
+    {"type": "result", "move": [0, 0], "result": "MISS", "seq": 14},
+    {"type": "sunk", "move": [3, 4], "seq": 15},
+    {"type": "game_over", "winner": "Alice", "seq": 16},
+    {"type": "game_over", "winner": "Zoé", "seq": 17},  # UTF-8 dans le binaire
+    {"type": "heartbeat"},
+    {"type": "ack", "seq": 2 ** 32 - 1},
+]
+
+
+@pytest.mark.parametrize("message", MESSAGES, ids=lambda m: m["type"])
+@pytest.mark.parametrize("binary", [True, False], ids=["binary", "json"])
+def test_round_trip(message, binary):
+    payload = protocol.encode(message, binary)
+    assert protocol.is_binary(payload) == binary
+    assert protocol.decode(payload) == message
+
+
+def test_binary_is_smaller():
+    move = MESSAGES[0]
+    assert len(protocol.encode(move)) == protocol.CELL.size < len(protocol.encode(move, binary=False))
+
+
+@pytest.mark.parametrize("message", [
+    {"type": "chat", "text": "gg", "seq": 3},  # Type inconnu : KeyError
+    {"type": "move", "move": [300, 1], "seq": 3},  # Coordonnée sur plus d'un octet : struct.error
+    {"type": "move", "move": [1, 1], "seq": 2 ** 32},  # Numéro sur plus de 4 octets : struct.error
+    {"type": "game_over", "winner": "x" * 256, "seq": 3},  # Nom de plus de 255 octets : struct.error
+    {"type": "game_over", "winner": "\ud800", "seq": 3},  # Pas encodable en UTF-8 : UnicodeEncodeError
+], ids=["unknown-type", "large-cell", "large-seq", "long-name", "surrogate"])
+def test_falls_back_to_json(message):
+    payload = protocol.encode(message, binary=True)
+    assert not protocol.is_binary(payload)
+    assert protocol.decode(payload) == message
+
+
+def test_legacy_move_without_type():
+    assert protocol.decode(b'{"move": [1, 2]}') == {"move": [1, 2]}
+
+
+@pytest.mark.parametrize("payload", [
+    protocol.HEADER.pack(2, protocol.MOVE, 1) + b"\x01\x02",  # Version inconnue
+    protocol.HEADER.pack(protocol.VERSION, 99, 1),  # Type inconnu
+    protocol.HEADER.pack(protocol.VERSION, protocol.MOVE, 1),  # Coordonnées manquantes
+    b"\x01",
+    b"[1, 2]",
+    b"{not json",
+], ids=["version", "type", "truncated", "short", "array", "bad-json"])
+def test_decode_rejects(payload):
+    with pytest.raises(ValueError):
+        protocol.decode(payload)
+
+
+def hello_from(port, hello):
+    s = socket.create_connection(("127.0.0.1", port), timeout=5)
+    send_frame(s, json.dumps(hello).encode())
+    return s
+
+
+def test_json_only_peer_gets_json(players):
+    (bob,) = players("Bob")
+    bob.opponent, bob.is_match_active = "Old", True
+
+    # Client d'avant le binaire : hello sans "protocol" (version 0)
+    with hello_from(bob.port, {"type": "hello", "username": "Old"}) as s:
+        send_frame(s, b'{"type": "move", "move": [1, 1], "seq": 1}')
+        replies = [recv_frame(s) for _ in range(2)]  # Acquittement, puis résultat
+    assert all(not protocol.is_binary(reply) for reply in replies)
+    assert [protocol.decode(reply)["type"] for reply in replies] == ["ack", "result"]
+    assert bob.peer_binary is False
+
+
+def test_v1_peer_gets_binary(players):
+    (bob,) = players("Bob")
+    bob.opponent, bob.is_match_active = "New", True
+
+    with hello_from(bob.port, {"type": "hello", "username": "New", "protocol": protocol.VERSION}) as s:
+        send_frame(s, protocol.encode({"type": "move", "move": [1, 1], "seq": 1}))
+        replies = [recv_frame(s) for _ in range(2)]
+    assert all(protocol.is_binary(reply) for reply in replies)
+    assert protocol.decode(replies[0]) == {"type": "ack", "seq": 1}
+    assert protocol.decode(replies[1]) == {"type": "result", "move": [1, 1], "result": "MISS", "seq": 1}
+
+
+def test_binary_frame_upgrades_a_silent_peer(players):
+    # Hello sans "protocol", mais le pair envoie du binaire : il sait donc le lire
+    (bob,) = players("Bob")
+    bob.opponent, bob.is_match_active = "Quiet", True
+
+    with hello_from(bob.port, {"type": "hello", "username": "Quiet"}) as s:
+        send_frame(s, protocol.encode({"type": "move", "move": [2, 2], "seq": 1}))
+        assert protocol.is_binary(recv_frame(s))
+    assert bob.peer_binary is True
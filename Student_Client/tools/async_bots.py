@@ -0,0 +1,102 @@
+"""Démo : des centaines ou milliers de parties entre bots, toutes en même temps dans un seul processus.
+
+Chaque partie oppose deux AsyncBattleshipConnection : l'un crée le match,
+l'autre le rejoint, ils jouent au hasard sur le canal pair à pair (le
+second commence) et le perdant envoie le résultat au serveur. Toutes les
+requêtes HTTP passent par une seule HttpSession.
+
+Lancer d'abord un serveur local, de préférence l'ASGI (long-polls sans threads),
+sans limite de débit puisque tous les bots partagent une adresse IP :
+
+    cd Matchmaking_Server && BATTLESHIP_RATE_LIMITS=off uvicorn asgi_server:app --port 5000 --backlog 4096
+
+puis, depuis la racine du dépôt :
+
+    python -m Student_Client.tools.async_bots [--games 1000] [--url http://127.0.0.1:5000]
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from Student_Client.core.AsyncBattleshipConnection import AsyncBattleshipConnection, HttpError, HttpSession
+
+
+async def bot(conn, my_turn, rng, timeout):
+    """Play until someone wins; False if the opponent went silent"""
+    targets = rng.sample([(x, y) for x in range(5) for y in range(5)], 25)
+    while not conn.winner:
+        if my_turn:
+            await conn.send_move(targets.pop())
+            my_turn = False
+        message = await conn.receive(timeout)
+        if message is None:
+            return False
+        if message["type"] == "move":
+            my_turn = True
+    return True
+
+
+async def play_game(index, prefix, session, rng, timeout, stats):
+    creator = AsyncBattleshipConnection(f"{prefix}-{index}a", 0, "", session)
+    joiner = AsyncBattleshipConnection(f"{prefix}-{index}b", 0, "", session)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(creator.start_listener(), joiner.start_listener())
+        if not all(await asyncio.gather(creator.register(), joiner.register())):
+            raise HttpError("registration failed")
+        code = f"{prefix}-{index}"
+        await creator.create_match(code)
+        started = asyncio.ensure_future(creator.wait_for_match(code, timeout))
+        if not await joiner.join_match(code) or not await started:
+            raise HttpError("match did not start")
+        stats["running"] += 1
+        stats["peak"] = max(stats["peak"], stats["running"])
+        for conn in (creator, joiner):
+            conn.place_ships(rng)
+        finished = await asyncio.gather(bot(creator, False, rng, timeout), bot(joiner, True, rng, timeout))
+        stats["running"] -= 1
+        if not all(finished):
+            raise HttpError("opponent went silent")
+        loser = creator if creator.winner == creator.opponent else joiner
+        if not await loser.report_result(loser.opponent, loser.username):
+            raise HttpError("result refused")
+        stats["moves"] += len(creator.moves) + len(joiner.moves)
+        stats["durations"].append(time.perf_counter() - start)
+    except (HttpError, OSError) as e:
+        stats["errors"].append(f"{type(e).__name__}: {e}")
+    finally:
+        await asyncio.gather(creator.close(), joiner.close())
+
+
+async def main(args):
+    session = HttpSession(args.url, limit=args.connections)
+    rng = random.Random(args.seed)
+    prefix = f"bot{int(time.time()) % 100000}"
+    stats = {"moves": 0, "durations": [], "errors": [], "running": 0, "peak": 0}
+
+    start = time.perf_counter()
+    await asyncio.gather(*(play_game(i, prefix, session, rng, args.timeout, stats) for i in range(args.games)))
+    elapsed = time.perf_counter() - start
+    await session.close()
+
+    durations = sorted(stats["durations"])
+    print(f"{len(durations)}/{args.games} parties terminées en {elapsed:.1f} s, "
+          f"au plus {stats['peak']} en cours en même temps")
+    if durations:
+        print(f"durée d'une partie : médiane {durations[len(durations) // 2]:.2f} s, "
+              f"p99 {durations[int(len(durations) * 0.99)]:.2f} s")
+    print(f"{stats['moves']} coups ({stats['moves'] / elapsed:.0f} coups/s), "
+          f"{session.requests} requêtes HTTP sur {session.connections} connexions")
+    for error in sorted(set(stats["errors"]))[:10]:
+        print(f"erreur ({stats['errors'].count(error)}x) : {error}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parties simultanées entre bots asyncio")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--connections", type=int, default=64, help="requêtes HTTP en cours au plus")
+    parser.add_argument("--timeout", type=float, default=60)
+    parser.add_argument("--seed", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,107 @@
+"""Banc d'essai ping-pong du canal pair à pair : coups par seconde entre deux joueurs locaux.
+
+- ping-pong : Alice envoie un coup, Bob répond par un coup dès qu'il l'a reçu,
+  Alice attend la réponse avant le coup suivant (un aller-retour par coup)
+- en rafale : Alice envoie tous ses coups sans attendre (pipeline), jusqu'à
+  ce que Bob les ait tous acquittés
+
+Sur le canal, chaque coup reçu est acquitté et renvoie son résultat au tireur
+(lui aussi acquitté) : ces messages sont compris dans les mesures.
+- ancien mode : une connexion TCP et un JSON sans trame par coup, en attendant
+  que Bob l'ait reçu avant le suivant
+
+Pas besoin du serveur de matchmaking : les adresses sont données directement.
+
+Lancer depuis la racine du dépôt :  python -m Student_Client.tools.bench_peer [--moves 5000] [--json]
+"""
+import argparse
+import json
+import socket
+import time
+
+from Student_Client.core.BattleshipConnection import BattleshipConnection
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def make_pair():
+    alice = BattleshipConnection("Alice", free_port(), "", register=False)
+    bob = BattleshipConnection("Bob", free_port(), "", register=False)
+    for me, other in ((alice, bob), (bob, alice)):
+        me.opponent = other.username
+        me.opponent_address = ("127.0.0.1", other.port)
+        me.is_match_active = True
+        me.handle_opponent_move = lambda data: None  # Pas d'affichage ni de plateau pendant la mesure
+        me.start_game()
+    while not (alice.listener_socket and bob.listener_socket):
+        time.sleep(0.01)
+    return alice, bob
+
+
+def drain(conn):
+    while conn.receive(timeout=0) is not None:
+        pass
+
+
+def ping_pong(alice, bob, moves):
+    """Deux coups par aller-retour : celui d'Alice et la réponse de Bob"""
+    drain(alice)
+
+    def answer(data):
+        bob.send_message({"type": "move", "move": json.loads(data)["move"]})
+
+    bob.handle_opponent_move = answer
+    start = time.perf_counter()
+    for i in range(moves // 2):
+        alice.send_message({"type": "move", "move": [i % 5, i // 5 % 5]})
+        while alice.receive(timeout=5)["type"] != "move":
+            pass  # Le résultat du tir arrive avant la réponse de Bob
+    elapsed = time.perf_counter() - start
+    bob.handle_opponent_move = lambda data: None
+    return elapsed
+
+
+def burst(alice, bob, moves):
+    start = time.perf_counter()
+    for i in range(moves):
+        alice.send_message({"type": "move", "move": [i % 5, i // 5 % 5]})
+    while alice.pending_acks():
+        time.sleep(0.0005)
+    return time.perf_counter() - start
+
+
+def one_shot(alice, bob, moves):
+    drain(bob)
+    start = time.perf_counter()
+    for i in range(moves):
+        with socket.create_connection(alice.opponent_address) as s:
+            s.sendall(json.dumps({"move": [i % 5, i // 5 % 5]}).encode())
+        bob.receive(timeout=5)  # Un coup à la fois, comme en partie
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Débit du canal pair à pair")
+    parser.add_argument("--moves", type=int, default=5000)
+    parser.add_argument("--json", action="store_true", help="messages en JSON plutôt qu'en binaire")
+    args = parser.parse_args()
+
+    alice, bob = make_pair()
+    alice.binary = bob.binary = not args.json
+    alice.send_message({"type": "move", "move": [0, 0]})  # Ouvre la connexion avant de mesurer
+    alice.receive(timeout=0.2)
+    burst(alice, bob, 1)
+
+    print(f"{args.moves} coups par mode, messages en {'JSON' if args.json else 'binaire'}")
+    for name, run in (("ping-pong", ping_pong), ("en rafale", burst), ("ancien mode", one_shot)):
+        elapsed = run(alice, bob, args.moves)
+        print(f"{name:<12} {args.moves / elapsed:>9.0f} coups/s  ({elapsed / args.moves * 1e6:7.1f} µs/coup)")
+    print(f"connexions pair à pair ouvertes : 1, trames non acquittées : {alice.pending_acks()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Codage et décodage des messages : taille et temps, JSON contre binaire.
+
+Pour chaque type de message de core/protocol.py : taille du contenu d'une
+trame (sans les 4 octets de longueur) et temps de encode() / decode(), en
+JSON compact et en binaire, plus le JSON d'avant ({"move": [x, y]} avec
+espaces) pour les coups.
+
+Lancer depuis la racine du dépôt :  python -m Student_Client.tools.bench_protocol [--number 200000]
+"""
+import argparse
+import json
+import timeit
+
+from Student_Client.core import protocol
+
+MESSAGES = {
+    "move": {"type": "move", "move": [3, 4], "seq": 12},
+    "result": {"type": "result", "move": [3, 4], "result": "HIT", "seq": 13},
+    "sunk": {"type": "sunk", "move": [3, 4], "seq": 14},
+    "game_over": {"type": "game_over", "winner": "Alice", "seq": 15},
+    "heartbeat": {"type": "heartbeat"},
+    "ack": {"type": "ack", "seq": 15},
+}
+
+
+def per_call(func, number):
+    """Best of 5 runs, in nanoseconds per call"""
+    return min(timeit.repeat(func, number=number, repeat=5)) / number * 1e9
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Codec des messages : JSON contre binaire")
+    parser.add_argument("--number", type=int, default=200000, help="appels par mesure")
+    args = parser.parse_args()
+
+    print(f"{'message':<16} {'octets':>7} {'encode ns':>10} {'decode ns':>10}")
+    legacy = json.dumps({"move": [3, 4]}).encode()
+    print(f"{'move (ancien)':<16} {len(legacy):>7} "
+          f"{per_call(lambda: json.dumps({'move': [3, 4]}).encode(), args.number):>10.0f} "
+          f"{per_call(lambda: json.loads(legacy), args.number):>10.0f}")
+    for name, message in MESSAGES.items():
+        for binary in (False, True):
+            payload = protocol.encode(message, binary)
+            assert protocol.decode(payload) == message
+            encode = per_call(lambda: protocol.encode(message, binary), args.number)
+            decode = per_call(lambda: protocol.decode(payload), args.number)
+            label = f"{name} ({'bin' if binary else 'json'})"
+            print(f"{label:<16} {len(payload):>7} {encode:>10.0f} {decode:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
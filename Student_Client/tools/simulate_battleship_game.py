@@ -1,6 +1,4 @@
 import threading
-import socket
-import json
 import time
 import random
 from Student_Client.core.BattleshipConnection import BattleshipConnection
@@ -23,12 +21,6 @@ def print_board(board, title):
         print(row)
     print()
 
-def send_message(ip, port, move):
-    s = socket.socket()
-    s.connect((ip, port))
-    s.send(json.dumps({"move": tuple(move)}).encode())
-    s.close()
-
 def random_coordinates(count):
     return random.sample([(x, y) for x in range(5) for y in range(5)], count)
 
@@ -52,6 +44,12 @@ def simulate_game(player1, player2):
     time.sleep(1)
     conn2.join_match(match_code)
 
+    # Les deux joueurs tournent sur cette machine : une connexion persistante
+    # entre eux, messages codés par core/protocol.py comme pour le client et l'IA
+    for conn, other in ((conn1, player2), (conn2, player1)):
+        conn.opponent = other["username"]
+        conn.opponent_address = ("127.0.0.1", other["port"])
+
     # Placement des navires aléatoires
     ships1 = random_coordinates(3)
     ships2 = random_coordinates(3)
@@ -74,15 +72,19 @@ def simulate_game(player1, player2):
         move2 = moves2[i]
 
         print(f"[{player1['username']}] Tire en {move1}")
-        send_message("127.0.0.1", player2["port"], move1)
+        conn1.send_move(move1)
         time.sleep(1)
+        if conn1.winner or conn2.winner:
+            break
 
         print(f"[{player2['username']}] Tire en {move2}")
-        send_message("127.0.0.1", player1["port"], move2)
+        conn2.send_move(move2)
         time.sleep(1)
 
         print_board(conn1.game_board, f"{player1['username']} (défense)")
+        print_board(conn1.shots, f"{player1['username']} (attaque)")
         print_board(conn2.game_board, f"{player2['username']} (défense)")
+        print_board(conn2.shots, f"{player2['username']} (attaque)")
 
     # Résultat
     print("\n🎉 Fin de la partie !")